@@ -0,0 +1,83 @@
+"""Background ingestion, upload deduplication and the analysis cache
+
+Revision ID: 0002_ingestion_dedup_cache
+Revises: 0001_baseline
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_ingestion_dedup_cache'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('resumes') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('processing_status', sa.String(), nullable=False, server_default='completed'))
+        batch_op.create_index('ix_resumes_content_hash', ['content_hash'])
+
+    with op.batch_alter_table('job_descriptions') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('processing_status', sa.String(), nullable=False, server_default='completed'))
+        batch_op.create_index('ix_job_descriptions_content_hash', ['content_hash'])
+
+    with op.batch_alter_table('jade_templates') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_jade_templates_content_hash', ['content_hash'])
+
+    op.create_table(
+        'ingestion_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ingestion_jobs_id', 'ingestion_jobs', ['id'])
+    op.create_index('ix_ingestion_jobs_status', 'ingestion_jobs', ['status'])
+
+    op.create_table(
+        'analysis_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.Float(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_analysis_cache_id', 'analysis_cache', ['id'])
+    op.create_index('ix_analysis_cache_cache_key', 'analysis_cache', ['cache_key'], unique=True)
+    op.create_index('ix_analysis_cache_created_at', 'analysis_cache', ['created_at'])
+    op.create_index('ix_analysis_cache_expires_at', 'analysis_cache', ['expires_at'])
+
+
+def downgrade():
+    op.drop_table('analysis_cache')
+    op.drop_table('ingestion_jobs')
+
+    with op.batch_alter_table('jade_templates') as batch_op:
+        batch_op.drop_index('ix_jade_templates_content_hash')
+        batch_op.drop_column('content_hash')
+
+    with op.batch_alter_table('job_descriptions') as batch_op:
+        batch_op.drop_index('ix_job_descriptions_content_hash')
+        batch_op.drop_column('processing_status')
+        batch_op.drop_column('content_hash')
+
+    with op.batch_alter_table('resumes') as batch_op:
+        batch_op.drop_index('ix_resumes_content_hash')
+        batch_op.drop_column('processing_status')
+        batch_op.drop_column('content_hash')
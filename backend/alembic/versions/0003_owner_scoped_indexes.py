@@ -0,0 +1,38 @@
+"""Composite indexes for owner-scoped queries
+
+Revision ID: 0003_owner_scoped_indexes
+Revises: 0002_ingestion_dedup_cache
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_owner_scoped_indexes'
+down_revision = '0002_ingestion_dedup_cache'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_resumes_owner_id_created_at', 'resumes', ['owner_id', 'created_at']),
+    ('ix_resumes_owner_id_id', 'resumes', ['owner_id', 'id']),
+    ('ix_job_descriptions_owner_id_created_at', 'job_descriptions', ['owner_id', 'created_at']),
+    ('ix_job_descriptions_owner_id_id', 'job_descriptions', ['owner_id', 'id']),
+    ('ix_matches_owner_id_created_at', 'matches', ['owner_id', 'created_at']),
+    ('ix_matches_owner_id_id', 'matches', ['owner_id', 'id']),
+    ('ix_matches_resume_id', 'matches', ['resume_id']),
+    ('ix_matches_jd_id_match_percentage', 'matches', ['jd_id', 'match_percentage']),
+    ('ix_jade_templates_owner_id_created_at', 'jade_templates', ['owner_id', 'created_at']),
+    ('ix_jade_templates_owner_id_id', 'jade_templates', ['owner_id', 'id']),
+    ('ix_jade_templates_owner_id_is_active', 'jade_templates', ['owner_id', 'is_active']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,30 @@
+"""Memoization key and unique constraint for match analyses
+
+Revision ID: 0004_memoized_matches
+Revises: 0003_owner_scoped_indexes
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_memoized_matches'
+down_revision = '0003_owner_scoped_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing matches keep a NULL key: they are not reused and never conflict
+    with op.batch_alter_table('matches') as batch_op:
+        batch_op.add_column(sa.Column('analysis_key', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint(
+            'uq_matches_resume_id_jd_id_analysis_key', ['resume_id', 'jd_id', 'analysis_key']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('matches') as batch_op:
+        batch_op.drop_constraint('uq_matches_resume_id_jd_id_analysis_key', type_='unique')
+        batch_op.drop_column('analysis_key')
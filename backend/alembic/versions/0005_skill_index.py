@@ -0,0 +1,130 @@
+"""Normalized skill tables, backfilled from the JSON skill columns
+
+Revision ID: 0005_skill_index
+Revises: 0004_memoized_matches
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.skills import normalize_skills, parse_skill_list
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_skill_index'
+down_revision = '0004_memoized_matches'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade():
+    op.create_table(
+        'skills',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_skills_id', 'skills', ['id'])
+    op.create_index('ix_skills_name', 'skills', ['name'], unique=True)
+
+    op.create_table(
+        'resume_skills',
+        sa.Column('resume_id', sa.Integer(), nullable=False),
+        sa.Column('skill_id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['resume_id'], ['resumes.id']),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id']),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('resume_id', 'skill_id'),
+    )
+    op.create_index(
+        'ix_resume_skills_owner_id_skill_id_resume_id', 'resume_skills', ['owner_id', 'skill_id', 'resume_id']
+    )
+
+    op.create_table(
+        'job_description_skills',
+        sa.Column('jd_id', sa.Integer(), nullable=False),
+        sa.Column('skill_id', sa.Integer(), nullable=False),
+        sa.Column('required', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['jd_id'], ['job_descriptions.id']),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id']),
+        sa.PrimaryKeyConstraint('jd_id', 'skill_id'),
+    )
+    op.create_index('ix_job_description_skills_skill_id', 'job_description_skills', ['skill_id'])
+
+    op.create_index('ix_resumes_owner_id_experience_years', 'resumes', ['owner_id', 'experience_years'])
+
+    _backfill(op.get_bind())
+
+
+def downgrade():
+    op.drop_index('ix_resumes_owner_id_experience_years', table_name='resumes')
+    op.drop_table('job_description_skills')
+    op.drop_table('resume_skills')
+    op.drop_table('skills')
+
+
+def _backfill(connection):
+    """Index the skills of every existing resume and job description"""
+    skills = sa.table('skills', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    resume_skills = sa.table(
+        'resume_skills', sa.column('resume_id'), sa.column('skill_id'), sa.column('owner_id')
+    )
+    jd_skills = sa.table('job_description_skills', sa.column('jd_id'), sa.column('skill_id'), sa.column('required'))
+    resumes = sa.table('resumes', sa.column('id'), sa.column('owner_id'), sa.column('skills'))
+    jds = sa.table(
+        'job_descriptions', sa.column('id'), sa.column('required_skills'), sa.column('preferred_skills')
+    )
+    skill_ids = {}
+
+    def ids_for(names):
+        missing = [name for name in names if name not in skill_ids]
+        if missing:
+            connection.execute(skills.insert(), [{'name': name} for name in missing])
+            skill_ids.update(connection.execute(
+                sa.select(skills.c.name, skills.c.id).where(skills.c.name.in_(missing))
+            ).all())
+        return skill_ids
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(resumes.c.id, resumes.c.owner_id, resumes.c.skills)
+            .where(resumes.c.id > last_id).order_by(resumes.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        parsed = [(row.id, row.owner_id, normalize_skills(parse_skill_list(row.skills))) for row in rows]
+        ids = ids_for(list(dict.fromkeys(name for _, _, names in parsed for name in names)))
+        links = [
+            {'resume_id': resume_id, 'skill_id': ids[name], 'owner_id': owner_id}
+            for resume_id, owner_id, names in parsed for name in names
+        ]
+        if links:
+            connection.execute(resume_skills.insert(), links)
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(jds.c.id, jds.c.required_skills, jds.c.preferred_skills)
+            .where(jds.c.id > last_id).order_by(jds.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        links = []
+        for row in rows:
+            required = normalize_skills(parse_skill_list(row.required_skills))
+            preferred = [
+                name for name in normalize_skills(parse_skill_list(row.preferred_skills)) if name not in required
+            ]
+            ids = ids_for(required + preferred)
+            links.extend(
+                {'jd_id': row.id, 'skill_id': ids[name], 'required': name in required}
+                for name in required + preferred
+            )
+        if links:
+            connection.execute(jd_skills.insert(), links)
@@ -0,0 +1,126 @@
+"""Move large text columns into the compressed text_bodies side table
+
+Revision ID: 0006_compressed_text_bodies
+Revises: 0005_skill_index
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.compression import compress_text, decompress_text
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_compressed_text_bodies'
+down_revision = '0005_skill_index'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 500
+
+# table: [(text column, body id column, nullable)]
+TEXT_COLUMNS = {
+    'resumes': [('content', 'content_body_id', False), ('jade_format', 'jade_format_body_id', True)],
+    'job_descriptions': [('content', 'content_body_id', False)],
+    'jade_templates': [('content', 'content_body_id', False)],
+}
+
+# A full Table: returning ids in parameter order needs to know the primary key
+text_bodies = sa.Table(
+    'text_bodies', sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('text', sa.LargeBinary, nullable=False),
+)
+
+
+def upgrade():
+    op.create_table(
+        'text_bodies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_text_bodies_id', 'text_bodies', ['id'])
+
+    connection = op.get_bind()
+    for table, columns in TEXT_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for _, body_column, _ in columns:
+                batch_op.add_column(sa.Column(body_column, sa.Integer(), nullable=True))
+
+        for text_column, body_column, _ in columns:
+            _move_to_bodies(connection, table, text_column, body_column)
+
+        with op.batch_alter_table(table) as batch_op:
+            for text_column, body_column, nullable in columns:
+                batch_op.alter_column(body_column, existing_type=sa.Integer(), nullable=nullable)
+                batch_op.create_foreign_key(
+                    f'fk_{table}_{body_column}_text_bodies', 'text_bodies', [body_column], ['id']
+                )
+                batch_op.drop_column(text_column)
+
+
+def downgrade():
+    connection = op.get_bind()
+    for table, columns in TEXT_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for text_column, _, _ in columns:
+                batch_op.add_column(sa.Column(text_column, sa.Text(), nullable=True))
+
+        for text_column, body_column, _ in columns:
+            _move_from_bodies(connection, table, text_column, body_column)
+
+        with op.batch_alter_table(table) as batch_op:
+            for text_column, body_column, nullable in columns:
+                batch_op.alter_column(text_column, existing_type=sa.Text(), nullable=nullable)
+                batch_op.drop_constraint(f'fk_{table}_{body_column}_text_bodies', type_='foreignkey')
+                batch_op.drop_column(body_column)
+
+    op.drop_index('ix_text_bodies_id', table_name='text_bodies')
+    op.drop_table('text_bodies')
+
+
+def _move_to_bodies(connection, table, text_column, body_column):
+    """Compress every non-null value of table.text_column into a text_bodies row and link it"""
+    rows_table = sa.table(table, sa.column('id'), sa.column(text_column), sa.column(body_column))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(rows_table.c.id, rows_table.c[text_column])
+            .where(rows_table.c.id > last_id).order_by(rows_table.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        rows = [row for row in rows if row[1] is not None]
+        if not rows:
+            continue
+        body_ids = connection.execute(
+            text_bodies.insert().returning(text_bodies.c.id, sort_by_parameter_order=True),
+            [{'text': compress_text(row[1])} for row in rows]
+        ).scalars().all()
+        connection.execute(
+            rows_table.update().where(rows_table.c.id == sa.bindparam('row_id'))
+            .values({body_column: sa.bindparam('body_id')}),
+            [{'row_id': row.id, 'body_id': body_id} for row, body_id in zip(rows, body_ids)]
+        )
+
+
+def _move_from_bodies(connection, table, text_column, body_column):
+    """Inverse of _move_to_bodies"""
+    rows_table = sa.table(table, sa.column('id'), sa.column(text_column), sa.column(body_column))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(rows_table.c.id, text_bodies.c.text)
+            .join(text_bodies, text_bodies.c.id == rows_table.c[body_column])
+            .where(rows_table.c.id > last_id).order_by(rows_table.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        connection.execute(
+            rows_table.update().where(rows_table.c.id == sa.bindparam('row_id'))
+            .values({text_column: sa.bindparam('text')}),
+            [{'row_id': row.id, 'text': decompress_text(bytes(row.text))} for row in rows]
+        )
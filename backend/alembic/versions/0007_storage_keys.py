@@ -0,0 +1,41 @@
+"""Store file storage keys instead of paths below the working directory
+
+Revision ID: 0007_storage_keys
+Revises: 0006_compressed_text_bodies
+Create Date: 2026-10-17
+
+Rows written before pluggable storage hold "uploads/<namespace>/<file>". Dropping the
+"uploads/" prefix turns them into keys of the local backend (root "uploads"), where the
+files already are; migrate_uploads.py then moves them into the sharded layout or to S3.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_storage_keys'
+down_revision = '0006_compressed_text_bodies'
+branch_labels = None
+depends_on = None
+
+LEGACY_PREFIX = 'uploads/'
+TABLES = ('resumes', 'job_descriptions', 'jade_templates')
+
+
+def upgrade():
+    for table in TABLES:
+        rows_table = sa.table(table, sa.column('file_path', sa.String))
+        op.execute(
+            rows_table.update()
+            .where(rows_table.c.file_path.like(f'{LEGACY_PREFIX}%'))
+            .values(file_path=sa.func.substr(rows_table.c.file_path, len(LEGACY_PREFIX) + 1))
+        )
+
+
+def downgrade():
+    # Keys of the local backend are paths below "uploads", which is what earlier versions expect
+    for table in TABLES:
+        rows_table = sa.table(table, sa.column('file_path', sa.String))
+        op.execute(
+            rows_table.update().values(file_path=sa.literal(LEGACY_PREFIX) + rows_table.c.file_path)
+        )
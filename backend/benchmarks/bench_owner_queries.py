@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Owner-scoped query benchmark
+Times the hot service queries on a synthetic database before and after
+the 0003_owner_scoped_indexes migration.
+
+    python benchmarks/bench_owner_queries.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in resumes and in matches")
+    parser.add_argument("--owners", type=int, default=1000, help="number of distinct owners")
+    parser.add_argument("--repeat", type=int, default=50, help="timed runs per query")
+    parser.add_argument("--database-url", default=None, help="defaults to a throwaway SQLite file")
+    return parser.parse_args()
+
+args = parse_args()
+if args.database_url is None:
+    args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+# database.py reads DATABASE_URL at import time
+os.environ["DATABASE_URL"] = args.database_url
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import MetaData, text
+from database import engine, run_migrations
+
+BATCH = 50_000
+
+QUERIES = {
+    "list resumes (owner, newest 100)":
+        "SELECT id, original_filename, summary FROM resumes WHERE owner_id = :owner ORDER BY id DESC LIMIT 100",
+    "resumes created in last 30 days (owner)":
+        "SELECT count(*) FROM resumes WHERE owner_id = :owner AND created_at >= :since",
+    "list matches (owner, newest 100)":
+        "SELECT id, match_percentage FROM matches WHERE owner_id = :owner ORDER BY id DESC LIMIT 100",
+    "top matches for a JD":
+        "SELECT id, resume_id, match_percentage FROM matches WHERE jd_id = :jd ORDER BY match_percentage DESC LIMIT 50",
+    "matches for a resume":
+        "SELECT id FROM matches WHERE resume_id = :resume",
+    "active Jade template (owner)":
+        "SELECT id FROM jade_templates WHERE owner_id = :owner AND is_active = 1 LIMIT 1",
+}
+
+def insert_in_batches(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+
+def populate(rows, owners):
+    random.seed(42)
+    jds = max(rows // 100, 1)
+    templates = max(rows // 10, 1)
+    now = datetime.utcnow()
+    # Tables as they are at this revision (the models describe the latest schema)
+    metadata = MetaData()
+    metadata.reflect(engine, only=["users", "resumes", "job_descriptions", "matches", "jade_templates"])
+    tables = metadata.tables
+
+    def created_at(i):
+        # Spread rows over the last year
+        return now - timedelta(days=365 * (1 - i / rows))
+
+    with engine.begin() as conn:
+        insert_in_batches(conn, tables["users"], (
+            {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x", "is_active": True}
+            for i in range(1, owners + 1)
+        ))
+        insert_in_batches(conn, tables["resumes"], (
+            {"id": i, "filename": f"{i}.pdf", "original_filename": f"{i}.pdf", "file_path": f"uploads/resumes/{i}.pdf",
+             "file_size": 1024, "content": "resume", "summary": "summary", "skills": "[]", "experience_years": i % 15,
+             "processing_status": "completed", "owner_id": random.randint(1, owners), "created_at": created_at(i)}
+            for i in range(1, rows + 1)
+        ))
+        insert_in_batches(conn, tables["job_descriptions"], (
+            {"id": i, "filename": f"{i}.txt", "original_filename": f"{i}.txt", "file_path": f"uploads/jds/{i}.txt",
+             "file_size": 1024, "content": "jd", "processing_status": "completed", "owner_id": random.randint(1, owners),
+             "created_at": created_at(i * 100)}
+            for i in range(1, jds + 1)
+        ))
+        insert_in_batches(conn, tables["matches"], (
+            {"id": i, "match_percentage": random.uniform(0, 100), "resume_id": random.randint(1, rows),
+             "jd_id": random.randint(1, jds), "owner_id": random.randint(1, owners), "created_at": created_at(i)}
+            for i in range(1, rows + 1)
+        ))
+        insert_in_batches(conn, tables["jade_templates"], (
+            {"id": i, "name": f"t{i}", "filename": f"{i}.txt", "file_path": f"uploads/jade_templates/{i}.txt",
+             "content": "template", "is_active": i % 10 == 0, "owner_id": random.randint(1, owners),
+             "created_at": created_at(i * 10)}
+            for i in range(1, templates + 1)
+        ))
+    return jds
+
+def time_queries(owners, jds, rows, repeat):
+    since = datetime.utcnow() - timedelta(days=30)
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            statement = text(sql)
+            samples = []
+            for _ in range(repeat):
+                params = {
+                    "owner": random.randint(1, owners),
+                    "jd": random.randint(1, jds),
+                    "resume": random.randint(1, rows),
+                    "since": since,
+                }
+                start = time.perf_counter()
+                conn.execute(statement, params).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(samples)
+    return results
+
+def main():
+    print(f"Database: {args.database_url}")
+    run_migrations("0002_ingestion_dedup_cache")
+
+    start = time.perf_counter()
+    jds = populate(args.rows, args.owners)
+    print(f"Inserted {args.rows:,} resumes and matches in {time.perf_counter() - start:.1f}s")
+
+    before = time_queries(args.owners, jds, args.rows, args.repeat)
+
+    start = time.perf_counter()
+    run_migrations("head")
+    print(f"Built owner-scoped indexes in {time.perf_counter() - start:.1f}s")
+
+    after = time_queries(args.owners, jds, args.rows, args.repeat)
+
+    print()
+    print(f"{'query (median of ' + str(args.repeat) + ' runs)':<45}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in QUERIES:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<45}{before[name]:>12.2f}{after[name]:>12.3f}{speedup:>9.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Text storage benchmark
+Measures database size and query latency on a synthetic database before and after
+the 0006_compressed_text_bodies migration moves document text into compressed side rows.
+
+    python benchmarks/bench_text_storage.py --rows 100000
+
+Synthetic text is built from resume vocabulary; real documents compress a little less.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows in resumes")
+    parser.add_argument("--owners", type=int, default=100, help="number of distinct owners")
+    parser.add_argument("--text-size", type=int, default=6000, help="average characters of resume text")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--database-url", default=None, help="defaults to a throwaway SQLite file")
+    return parser.parse_args()
+
+args = parse_args()
+if args.database_url is None:
+    args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+# database.py reads DATABASE_URL at import time
+os.environ["DATABASE_URL"] = args.database_url
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import MetaData, text
+from database import engine, run_migrations
+from utils.compression import TEXT_COMPRESSION, decompress_text
+
+BATCH = 5_000
+
+WORDS = (
+    "experience senior engineer developer python java go rust aws docker kubernetes terraform sql postgresql "
+    "led team designed built migrated scalable services api microservices platform data pipeline analytics "
+    "managed delivered improved reduced latency cost performance reliability customers product stakeholders "
+    "university bachelor master science computer engineering degree certified responsible for the and of to "
+    "with in on a an across multiple projects including mentoring junior hiring agile scrum ci cd testing"
+).split()
+
+# (name, SQL before the migration, SQL after it, decompress the fetched text)
+QUERIES = [
+    ("list resumes (owner, newest 100)",
+     "SELECT id, original_filename, summary FROM resumes WHERE owner_id = :owner ORDER BY id DESC LIMIT 100",
+     "SELECT id, original_filename, summary FROM resumes WHERE owner_id = :owner ORDER BY id DESC LIMIT 100",
+     False),
+    ("table scan (summary search, all owners)",
+     "SELECT count(*) FROM resumes WHERE summary LIKE '%kubernetes%'",
+     "SELECT count(*) FROM resumes WHERE summary LIKE '%kubernetes%'",
+     False),
+    ("fetch one resume with text",
+     "SELECT id, content FROM resumes WHERE id = :resume",
+     "SELECT resumes.id, text_bodies.text FROM resumes "
+     "JOIN text_bodies ON text_bodies.id = resumes.content_body_id WHERE resumes.id = :resume",
+     True),
+    ("fetch owner's resumes with text (ranking)",
+     "SELECT id, content FROM resumes WHERE owner_id = :owner",
+     "SELECT resumes.id, text_bodies.text FROM resumes "
+     "JOIN text_bodies ON text_bodies.id = resumes.content_body_id WHERE resumes.owner_id = :owner",
+     True),
+]
+
+def document(size: int) -> str:
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(random.choice(WORDS) for _ in range(random.randint(6, 14)))
+        line = f"{line} {random.randint(2005, 2024)} {random.randint(1, 40)}%"
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+def insert_in_batches(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+
+def populate(rows, owners, text_size):
+    random.seed(42)
+    # Tables as they are before the migration (the models describe the schema after it)
+    metadata = MetaData()
+    metadata.reflect(engine, only=["users", "resumes"])
+    with engine.begin() as conn:
+        insert_in_batches(conn, metadata.tables["users"], (
+            {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x", "is_active": True}
+            for i in range(1, owners + 1)
+        ))
+        insert_in_batches(conn, metadata.tables["resumes"], (
+            {"id": i, "filename": f"{i}.pdf", "original_filename": f"{i}.pdf", "file_path": f"uploads/resumes/{i}.pdf",
+             "file_size": 1024, "content": document(random.randint(text_size // 2, text_size * 3 // 2)),
+             "jade_format": document(text_size // 2) if i % 4 == 0 else None,
+             "summary": " ".join(random.choice(WORDS) for _ in range(30)), "skills": "[]",
+             "experience_years": i % 15, "processing_status": "completed", "owner_id": random.randint(1, owners)}
+            for i in range(1, rows + 1)
+        ))
+
+def database_size():
+    """Bytes used by the database (after compacting it, as a backup would copy it)"""
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
+            return conn.execute(text("PRAGMA page_count")).scalar() * conn.execute(text("PRAGMA page_size")).scalar()
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+
+def resumes_table_size():
+    """Bytes of the resumes table alone (what a scan of it reads)"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            try:
+                return conn.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name = 'resumes'")).scalar()
+            except Exception:
+                return None
+        return conn.execute(text("SELECT pg_table_size('resumes')")).scalar()
+
+def time_queries(owners, rows, repeat, after):
+    results = {}
+    with engine.connect() as conn:
+        for name, before_sql, after_sql, decompress in QUERIES:
+            statement = text(after_sql if after else before_sql)
+            samples = []
+            for _ in range(repeat):
+                params = {"owner": random.randint(1, owners), "resume": random.randint(1, rows)}
+                start = time.perf_counter()
+                fetched = conn.execute(statement, params).fetchall()
+                if decompress and after:
+                    for row in fetched:
+                        decompress_text(bytes(row[1]))
+                samples.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(samples)
+    return results
+
+def format_size(size):
+    return "n/a" if size is None else f"{size / 1024 / 1024:,.1f} MB"
+
+def main():
+    print(f"Database: {args.database_url}")
+    print(f"Compression: {TEXT_COMPRESSION}")
+    run_migrations("0005_skill_index")
+
+    start = time.perf_counter()
+    populate(args.rows, args.owners, args.text_size)
+    print(f"Inserted {args.rows:,} resumes in {time.perf_counter() - start:.1f}s")
+
+    sizes_before = database_size(), resumes_table_size()
+    before = time_queries(args.owners, args.rows, args.repeat, after=False)
+
+    start = time.perf_counter()
+    run_migrations("head")
+    print(f"Moved text into compressed bodies in {time.perf_counter() - start:.1f}s")
+
+    sizes_after = database_size(), resumes_table_size()
+    after = time_queries(args.owners, args.rows, args.repeat, after=True)
+
+    print()
+    print(f"{'size':<45}{'before':>12}{'after':>12}{'ratio':>10}")
+    for name, size_before, size_after in zip(("database", "resumes table"), sizes_before, sizes_after):
+        ratio = f"{size_before / size_after:>9.1f}x" if size_before and size_after else f"{'n/a':>10}"
+        print(f"{name:<45}{format_size(size_before):>12}{format_size(size_after):>12}{ratio}")
+
+    print()
+    print(f"{'query (median of ' + str(args.repeat) + ' runs)':<45}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name, _, _, _ in QUERIES:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<45}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
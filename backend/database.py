@@ -1,28 +1,308 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Any, Dict
+import asyncio
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from utils.metrics import observe_stage, stage_in_flight
 
 load_dotenv()
 
 # Database URL - using SQLite for development, can be changed to PostgreSQL for production
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./jade_ai.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+# Use the native async drivers (aiosqlite / asyncpg) for request handling
+DB_ASYNC = os.getenv("DB_ASYNC", "False").lower() == "true"
+
+# Async driver for each sync dialect, used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (_async_url(DATABASE_URL) if DB_ASYNC else None)
+
+# Apply pending Alembic migrations on startup (disable when running several app processes)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "True").lower() == "true"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Revision matching the schema that Base.metadata.create_all used to build
+BASELINE_REVISION = "0001_baseline"
+
+# Connection pool sizing (pool_size + max_overflow connections at most per engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+
+# SQLite tuning: WAL lets readers proceed during a write, busy_timeout makes writers wait instead of failing
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "True").lower() == "true"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+
+class PoolMetrics:
+    """Checkout wait time and utilization of one connection pool"""
+
+    def __init__(self):
+        self.pool = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "peak_checked_out": 0,
+        }
+
+    def record_checkout(self, waited: float, checked_out: int):
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            self._stats["peak_checked_out"] = max(self._stats["peak_checked_out"], checked_out)
+
+    def record_timeout(self):
+        with self._lock:
+            self._stats["timeouts"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        if self.pool is not None:
+            capacity = self.pool.size() + max(self.pool._max_overflow, 0)
+            stats["pool_size"] = self.pool.size()
+            stats["max_overflow"] = self.pool._max_overflow
+            stats["checked_out"] = self.pool.checkedout()
+            stats["idle"] = self.pool.checkedin()
+            stats["utilization"] = stats["checked_out"] / capacity if capacity else 0.0
+        return stats
+
+def _instrumented_pool(pool_class, metrics: PoolMetrics):
+    """Subclass a queue pool so every checkout reports how long it waited for a connection"""
+    class InstrumentedPool(pool_class):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # Also re-pointed when the engine recreates its pool
+            metrics.pool = self
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.record_timeout()
+                raise
+            metrics.record_checkout(time.perf_counter() - start, self.checkedout())
+            return connection
+
+    return InstrumentedPool
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+def _engine_options(url: str, pool_class, metrics: PoolMetrics) -> Dict[str, Any]:
+    options: Dict[str, Any] = {}
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            # Each in-memory connection is its own database; keep the default single-connection pool
+            return options
+    options.update(
+        poolclass=_instrumented_pool(pool_class, metrics),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+def _tune_sqlite(sync_engine):
+    """Apply the tuning pragmas to every new SQLite connection"""
+    if not SQLITE_TUNED or sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not _is_memory_sqlite(str(sync_engine.url)):
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.close()
+
+def _time_commits():
+    """Report every commit (including its flush) as the pipeline's persist stage"""
+    in_flight = stage_in_flight.labels("persist")
+
+    def finish(session, record: bool):
+        started = session.info.pop("commit_started", None)
+        if started is not None:
+            in_flight.dec()
+            if record:
+                observe_stage("persist", time.perf_counter() - started)
+
+    @event.listens_for(Session, "before_commit")
+    def start_commit(session):
+        # AsyncSession and ThreadedSession both commit through a sync Session
+        finish(session, record=False)
+        session.info["commit_started"] = time.perf_counter()
+        in_flight.inc()
+
+    @event.listens_for(Session, "after_commit")
+    def end_commit(session):
+        finish(session, record=True)
+
+    @event.listens_for(Session, "after_soft_rollback")
+    def abandon_commit(session, previous_transaction):
+        finish(session, record=False)
+
+_time_commits()
+
+pool_metrics = {"sync": PoolMetrics(), "async": PoolMetrics()}
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, QueuePool, pool_metrics["sync"]))
+_tune_sqlite(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Request sessions keep loaded attributes after commit: reloading them lazily is not possible
+# on an AsyncSession and would block the event loop on a threaded one
+RequestSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+async_engine = (
+    create_async_engine(
+        ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, pool_metrics["async"])
+    ) if DB_ASYNC else None
+)
+if async_engine is not None:
+    _tune_sqlite(async_engine.sync_engine)
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if DB_ASYNC else None
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+class ThreadedSession:
+    """AsyncSession-compatible wrapper that runs a synchronous Session in worker threads"""
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    def _run(self, fn, *args, **kwargs):
+        return asyncio.to_thread(fn, *args, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        # Buffer rows in the worker thread, like AsyncSession.execute does
+        def run():
+            result = self.sync_session.execute(statement, params, **kwargs)
+            try:
+                return result.freeze()
+            except NotImplementedError:
+                # DML without RETURNING has no rows to buffer (only rowcount)
+                return result
+
+        result = await self._run(run)
+        return result() if callable(result) else result
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalar()
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    async def flush(self, objects=None):
+        await self._run(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        await self._run(self.sync_session.refresh, instance, attribute_names)
+
+    async def delete(self, instance):
+        await self._run(self.sync_session.delete, instance)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        await self._run(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._run(fn, self.sync_session, *args, **kwargs)
+
+def open_session():
+    """Open a request session: a native AsyncSession when DB_ASYNC is set, otherwise a threaded sync Session"""
+    if DB_ASYNC:
+        return AsyncSessionLocal()
+    return ThreadedSession(RequestSessionLocal())
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Checkout wait and utilization metrics for the sync and (if enabled) async pools"""
+    stats = {"sync": pool_metrics["sync"].get_stats()}
+    if async_engine is not None:
+        stats["async"] = pool_metrics["async"].get_stats()
+    return stats
+
+async def close_db():
+    """Close pooled connections (aiosqlite connections each hold a worker thread)"""
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+
+async def get_db():
+    db = open_session()
     try:
         yield db
     finally:
-        db.close()
-
+        await db.close()
 
+def run_migrations(revision: str = "head"):
+    """Upgrade the schema to the given (default: latest) Alembic revision"""
+    from alembic import command
+    from alembic.config import Config
+    
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "alembic"))
+    config.attributes["configure_logger"] = False
+    
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        
+        # Databases created before migrations existed: adopt them at the baseline revision
+        inspector = inspect(connection)
+        if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+            command.stamp(config, BASELINE_REVISION)
+        
+        command.upgrade(config, revision)
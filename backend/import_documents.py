@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Jade AI Bulk Importer
+Imports a directory tree of resumes (or job descriptions) straight into the database,
+bypassing the HTTP API. Files are parsed in a process pool, analyzed concurrently and
+inserted in batches. Progress is checkpointed after every batch, so running the same
+command again resumes where an interrupted run stopped.
+
+    python import_documents.py /data/resumes --owner-email hr@example.com
+    python import_documents.py /data/jds --kind jd --owner-email hr@example.com --batch-size 500
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from utils.file_parser import PARSER_WORKERS, parse_jd_file, parse_resume_file
+from utils.storage import file_storage
+from utils.upload_handler import MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE
+
+KINDS = {
+    "resume": {"extensions": (".pdf", ".doc", ".docx"), "parser": parse_resume_file},
+    "jd": {"extensions": (".pdf", ".doc", ".docx", ".txt"), "parser": parse_jd_file},
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory to import (walked recursively)")
+    parser.add_argument("--kind", choices=KINDS, default="resume")
+    parser.add_argument("--owner-email", required=True, help="user that will own the imported documents")
+    parser.add_argument("--workers", type=int, default=max(PARSER_WORKERS, 1), help="parse processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="documents analyzed at once")
+    parser.add_argument("--batch-size", type=int, default=200, help="rows per insert transaction")
+    parser.add_argument("--checkpoint", default=None, help="defaults to import-<kind>-<source name>.checkpoint.jsonl")
+    parser.add_argument("--retry-failed", action="store_true", help="process files that failed in earlier runs again")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="import files whose content the owner already has (default: skip them)")
+    parser.add_argument("--progress-interval", type=float, default=5, help="seconds between progress lines")
+    return parser.parse_args()
+
+def prepare_file(kind: str, source_path: str, file_path: str) -> Dict[str, Any]:
+    """Parse stage (runs in a worker process): copy to the staging file file_path, hash and extract text"""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(source_path, "rb") as source, open(file_path, "wb") as buffer:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise ValueError(f"File exceeds the maximum size of {MAX_UPLOAD_SIZE} bytes")
+                digest.update(chunk)
+                buffer.write(chunk)
+        content = KINDS[kind]["parser"](file_path)
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return {"error": str(e)}
+    return {"size": size, "sha256": digest.hexdigest(), "content": content}
+
+class Checkpoint:
+    """Append-only JSON lines of finished files (relative path and outcome), written after each commit"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; that file is simply processed again
+                        continue
+                    self.done[entry["path"]] = entry["status"]
+
+    def record(self, entries: List[Dict[str, Any]]):
+        with open(self.path, "a") as file:
+            for entry in entries:
+                file.write(json.dumps(entry) + "\n")
+                self.done[entry["path"]] = entry["status"]
+            file.flush()
+            os.fsync(file.fileno())
+
+class Progress:
+    """Counts outcomes and prints throughput and ETA for the files of this run"""
+
+    def __init__(self, total: int, already_done: int, interval: float):
+        self.total = total
+        self.already_done = already_done
+        self.interval = interval
+        self.counts = {"imported": 0, "duplicate": 0, "failed": 0}
+        self.parse_seconds = 0.0
+        self.analysis_seconds = 0.0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, status: str):
+        self.counts[status] += 1
+        if time.perf_counter() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False):
+        self._last_report = time.perf_counter()
+        elapsed = self._last_report - self.start
+        rate = self.processed / elapsed if elapsed else 0.0
+        remaining = self.total - self.processed
+        eta = remaining / rate if rate else float("inf")
+        done = self.already_done + self.processed
+        overall = self.already_done + self.total
+        parts = [
+            f"{done:,}/{overall:,} ({100 * done / overall if overall else 100:.1f}%)",
+            f"{rate:.1f} files/s",
+            f"elapsed {format_duration(elapsed)}" if final else f"ETA {format_duration(eta)}",
+            " ".join(f"{status} {count:,}" for status, count in self.counts.items()),
+        ]
+        if self.processed:
+            parts.append(
+                f"parse {1000 * self.parse_seconds / self.processed:.0f} ms/file, "
+                f"analysis {1000 * self.analysis_seconds / self.processed:.0f} ms/file"
+            )
+        print(" | ".join(parts), flush=True)
+
+def format_duration(seconds: float) -> str:
+    if seconds == float("inf"):
+        return "--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+def find_files(source: str, extensions) -> List[str]:
+    """Importable files below source as sorted relative paths (a stable order makes progress comparable)"""
+    paths = []
+    for root, dirs, files in os.walk(source):
+        dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+        for name in sorted(files):
+            if not name.startswith(".") and os.path.splitext(name)[1].lower() in extensions:
+                paths.append(os.path.relpath(os.path.join(root, name), source))
+    return paths
+
+async def run_import(args) -> int:
+    from sqlalchemy import select
+    from database import AUTO_MIGRATE, close_db, open_session, run_migrations
+    from models import JobDescription, Resume, User
+    from services.jd_service import jd_service
+    from services.resume_service import resume_service
+    from utils.ai_analyzer import analyze_jd_content, analyze_resume_content, close_ai_analyzer
+    from utils.deduplication import remove_file, remove_stored_file
+    from utils.skills import index_new_jds_skills, index_new_resumes_skills
+
+    if args.kind == "resume":
+        model, service, analyze, index_skills = Resume, resume_service, analyze_resume_content, index_new_resumes_skills
+    else:
+        model, service, analyze, index_skills = JobDescription, jd_service, analyze_jd_content, index_new_jds_skills
+
+    if AUTO_MIGRATE:
+        run_migrations()
+
+    source = os.path.abspath(args.source)
+    checkpoint = Checkpoint(args.checkpoint or f"import-{args.kind}-{os.path.basename(source)}.checkpoint.jsonl")
+    all_paths = find_files(source, KINDS[args.kind]["extensions"])
+    pending_paths = [
+        path for path in all_paths
+        if path not in checkpoint.done or (args.retry_failed and checkpoint.done[path] == "failed")
+    ]
+    print(f"Found {len(all_paths):,} files in {source}; {len(all_paths) - len(pending_paths):,} already done "
+          f"(checkpoint {checkpoint.path})", flush=True)
+
+    db = open_session()
+    try:
+        owner = await db.scalar(select(User).where(User.email == args.owner_email))
+        if owner is None:
+            print(f"No user with email {args.owner_email}", file=sys.stderr)
+            return 1
+        owner_id = owner.id
+        # Content the owner already has; also covers files committed just before a crash but not checkpointed
+        known_hashes = set() if args.keep_duplicates else set((await db.scalars(
+            select(model.content_hash).where(model.owner_id == owner_id, model.content_hash.is_not(None))
+        )).all())
+        await db.commit()
+
+        progress = Progress(len(pending_paths), len(all_paths) - len(pending_paths), args.progress_interval)
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+        loop = asyncio.get_running_loop()
+        analysis_slots = asyncio.Semaphore(args.concurrency)
+        write_lock = asyncio.Lock()
+        batch: List[tuple] = []
+        # Staged copies not yet in file storage, and stored files without a committed row;
+        # both are removed if the run stops early
+        staged = set()
+        uncommitted = set()
+        # Checkpoint entries of files that produced no row (failed or duplicate)
+        outcomes: List[Dict[str, Any]] = []
+        path_iterator = iter(pending_paths)
+
+        async def write(rows: List[tuple], finished: List[Dict[str, Any]]):
+            """Insert a batch in one transaction, then checkpoint it"""
+            async with write_lock:
+                entries = list(finished)
+                if rows:
+                    try:
+                        db.add_all([row for _, row in rows])
+                        await db.flush()
+                        await index_skills(db, [row for _, row in rows])
+                        await db.commit()
+                    except Exception as e:
+                        await db.rollback()
+                        print(f"Batch insert failed: {e}", file=sys.stderr, flush=True)
+                        for path, row in rows:
+                            await remove_stored_file(row.file_path)
+                            entries.append({"path": path, "status": "failed", "error": f"Insert failed: {e}"})
+                    else:
+                        entries.extend({"path": path, "status": "imported", "id": row.id} for path, row in rows)
+                    uncommitted.difference_update(row.file_path for _, row in rows)
+                checkpoint.record(entries)
+
+        async def worker():
+            nonlocal batch, outcomes
+            for path in path_iterator:
+                started = time.perf_counter()
+                file_path = file_storage.staging_path(os.path.splitext(path)[1])
+                staged.add(file_path)
+                prepared = await loop.run_in_executor(
+                    executor, prepare_file, args.kind, os.path.join(source, path), file_path
+                )
+                progress.parse_seconds += time.perf_counter() - started
+
+                if "error" in prepared:
+                    staged.discard(file_path)
+                    outcomes.append({"path": path, "status": "failed", "error": prepared["error"]})
+                    progress.add("failed")
+                elif prepared["sha256"] in known_hashes:
+                    remove_file(file_path)
+                    staged.discard(file_path)
+                    outcomes.append({"path": path, "status": "duplicate"})
+                    progress.add("duplicate")
+                else:
+                    if not args.keep_duplicates:
+                        known_hashes.add(prepared["sha256"])
+                    started = time.perf_counter()
+                    async with analysis_slots:
+                        analysis = await analyze(prepared["content"])
+                    progress.analysis_seconds += time.perf_counter() - started
+
+                    key = file_storage.new_key(service.storage_namespace, os.path.splitext(path)[1])
+                    uncommitted.add(key)
+                    await file_storage.put_file(file_path, key)
+                    staged.discard(file_path)
+
+                    row = model(
+                        filename=os.path.basename(key),
+                        original_filename=os.path.basename(path),
+                        file_path=key,
+                        file_size=prepared["size"],
+                        content_hash=prepared["sha256"],
+                        owner_id=owner_id
+                    )
+                    service._apply_analysis(row, prepared["content"], analysis)
+                    batch.append((path, row))
+                    progress.add("imported")
+
+                if len(batch) + len(outcomes) >= args.batch_size:
+                    rows, finished = batch, outcomes
+                    batch, outcomes = [], []
+                    await write(rows, finished)
+
+        # Enough workers to keep every parse process and analysis slot busy
+        workers = [asyncio.create_task(worker()) for _ in range(args.workers * 2 + args.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            await write(batch, outcomes)
+            batch, outcomes = [], []
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            # Let copies already running finish so their files can be removed as well
+            executor.shutdown(wait=True, cancel_futures=True)
+            for file_path in staged:
+                remove_file(file_path)
+            for key in uncommitted:
+                await remove_stored_file(key)
+
+        progress.report(final=True)
+        return 0
+    finally:
+        await db.close()
+        await close_ai_analyzer()
+        await file_storage.aclose()
+        await close_db()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.path.isdir(args.source):
+        print(f"Not a directory: {args.source}", file=sys.stderr)
+        sys.exit(2)
+    try:
+        sys.exit(asyncio.run(run_import(args)))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
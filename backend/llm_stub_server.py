@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Jade AI LLM Stub Server
+An OpenAI-compatible chat completions endpoint with simulated latency and failures,
+for load testing the backend without calling a real model:
+
+    python llm_stub_server.py --port 9100
+    LLM_BASE_URL=http://localhost:9100/v1 python run.py
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Optional
+import uvicorn
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from utils.llm_backends import OPERATION_HEADER
+from utils.llm_stub import StubLLM
+from utils.sse import SSE_HEADERS
+
+# Simulated timeouts hold the request this long (longer than any client timeout)
+STUB_TIMEOUT_SECONDS = 600
+
+app = FastAPI(title="Jade AI LLM Stub")
+stub = StubLLM()
+
+def _error(status: int, message: str, error_type: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type, "code": None}},
+        headers=headers
+    )
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "jade-ai"}]}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request, operation: Optional[str] = Header(None, alias=OPERATION_HEADER)):
+    body = await request.json()
+    model = body.get("model", "stub")
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+
+    error = stub.sample_error()
+    if error == "timeout":
+        await asyncio.sleep(STUB_TIMEOUT_SECONDS)
+    await asyncio.sleep(stub.sample_latency())
+    if error == "rate_limit":
+        return _error(429, "LLM stub simulated rate limit", "rate_limit_error", {"Retry-After": "1"})
+    if error == "server_error":
+        return _error(500, "LLM stub simulated server error", "server_error")
+
+    content = stub.respond(prompt, operation, error)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    if body.get("stream"):
+        async def stream():
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for delta in stub.stream_chunks(content):
+                await asyncio.sleep(stub.stream_chunk_ms / 1000)
+                yield _chunk(completion_id, model, {"content": delta})
+            yield _chunk(completion_id, model, {}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    prompt_tokens = len(prompt.split())
+    completion_tokens = len(content.split())
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+
+    print(f"Starting LLM stub server on http://{args.host}:{args.port}/v1")
+    print(f"Latency: median {stub.latency_median_ms}ms, p95 {stub.latency_p95_ms}ms")
+    print(f"Error rate: {stub.error_rate} {stub.error_mix}")
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
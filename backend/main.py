@@ -1,27 +1,47 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import uvicorn
 import os
+import re
+import logging
+import secrets
+from typing import Optional
 from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from database import get_db, engine, Base
+from database import get_db, get_pool_stats, close_db, run_migrations, AUTO_MIGRATE
 from models import Resume, JobDescription, Match, User
 from schemas import (
     ResumeCreate, ResumeResponse, JDCreate, JDResponse, 
-    MatchResponse, UserCreate, UserResponse, LoginRequest
+    MatchResponse, UserCreate, UserResponse, LoginRequest, BatchMatchRequest,
+    RankedResume, IngestionJobResponse, ResumeSummary, JDSummary, MatchSummary, ArchiveUploadResponse
 )
-from services import (
-    resume_service, jd_service, matching_service, 
-    auth_service, jade_service
+from services.resume_service import resume_service
+from services.jd_service import jd_service
+from services.matching_service import matching_service
+from services.auth_service import auth_service, EVENTS_TOKEN_EXPIRE_SECONDS
+from services.jade_service import jade_service
+from services.ingestion_service import ingestion_service, INGESTION_BACKGROUND_DEFAULT
+from utils.ai_analyzer import ai_analyzer, close_ai_analyzer
+from utils.analysis_cache import analysis_cache
+from utils.auth_cache import auth_cache
+from utils.token_budget import token_metrics
+from utils.sse import SSE_HEADERS, with_keepalive
+from utils.events import event_broker, stream_user_events
+from utils.file_parser import shutdown_parser_executor
+from utils.storage import file_storage
+from utils.pagination import LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT, parse_fields
+from utils.profiling import ProfilingMiddleware, request_profiler
+from utils.metrics import (
+    METRICS_ENABLED, METRICS_TOKEN, MetricsMiddleware, db_pool_checked_out, event_streams_open
 )
 
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="Jade AI Resume Matching API", version="1.0.0")
 
 # CORS middleware
@@ -31,123 +51,366 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-route latency, status and in-flight metrics for /metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Sampled (PROFILING_ENABLED) or header-requested (PROFILING_TOKEN) cProfile dumps, see /admin/profiles
+app.add_middleware(ProfilingMiddleware)
+
 security = HTTPBearer()
+# The event stream also accepts ?stream_token=, since browsers' EventSource cannot send headers
+optional_security = HTTPBearer(auto_error=False)
+
+class RedactStreamTokens(logging.Filter):
+    """Keep event stream tokens out of the access log"""
+
+    pattern = re.compile(r"(stream_token=)[^&\s]+")
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple):
+            record.args = tuple(
+                self.pattern.sub(r"\1<redacted>", arg) if isinstance(arg, str) else arg for arg in record.args
+            )
+        return True
+
+logging.getLogger("uvicorn.access").addFilter(RedactStreamTokens())
+
+@app.on_event("startup")
+async def startup():
+    # Schema is managed by Alembic (alembic/versions)
+    if AUTO_MIGRATE:
+        run_migrations()
+    
+    # Start background ingestion workers
+    await ingestion_service.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await ingestion_service.stop()
+    # Release pooled keep-alive connections to the LLM API
+    await close_ai_analyzer()
+    shutdown_parser_executor()
+    await file_storage.aclose()
+    await close_db()
 
 # Dependency to get current user
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await auth_service.get_current_user(credentials.credentials, db)
 
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    return auth_service.require_admin(current_user)
+
 # Authentication endpoints
 @app.post("/auth/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     return await auth_service.register_user(user_data, db)
 
 @app.post("/auth/login")
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     return await auth_service.login_user(login_data, db)
 
 # Resume endpoints
-@app.post("/resumes/upload", response_model=ResumeResponse)
+@app.post(
+    "/resumes/upload",
+    response_model=ResumeResponse,
+    responses={202: {"model": IngestionJobResponse}}
+)
 async def upload_resume(
     file: UploadFile = File(...),
+    background: bool = Query(INGESTION_BACKGROUND_DEFAULT),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    if background:
+        job = await resume_service.queue_resume_upload(file, current_user.id, db)
+        return JSONResponse(status_code=202, content=job.model_dump(mode="json"))
     return await resume_service.upload_resume(file, current_user.id, db)
 
-@app.get("/resumes", response_model=list[ResumeResponse])
+@app.post("/resumes/upload-archive", response_model=ArchiveUploadResponse)
+async def upload_resume_archive(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await resume_service.upload_archive(file, current_user.id, db)
+
+@app.get("/resumes", response_model=list[ResumeSummary], response_model_exclude_unset=True)
 async def get_resumes(
+    response: Response,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[int] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return await resume_service.get_user_resumes(current_user.id, db)
+    items, next_cursor = await resume_service.get_user_resumes(
+        current_user.id, db, limit, cursor, parse_fields(fields, ResumeSummary)
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return items
+
+# Registered before /resumes/{resume_id} so "search" is not parsed as an id
+@app.get("/resumes/search", response_model=list[ResumeSummary], response_model_exclude_unset=True)
+async def search_resumes(
+    response: Response,
+    skills: Optional[str] = Query(None, description="Comma-separated skills, e.g. python,aws"),
+    match: str = Query("all", pattern="^(all|any)$", description="Require all of the skills or any of them"),
+    min_experience: Optional[float] = Query(None, ge=0),
+    max_experience: Optional[float] = Query(None, ge=0),
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[int] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    items, next_cursor = await resume_service.search_resumes(
+        current_user.id, db, skills.split(",") if skills else [], match == "all",
+        min_experience, max_experience, limit, cursor, parse_fields(fields, ResumeSummary)
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return items
 
 @app.get("/resumes/{resume_id}", response_model=ResumeResponse)
 async def get_resume(
     resume_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await resume_service.get_resume(resume_id, current_user.id, db)
 
 # Job Description endpoints
-@app.post("/jds/upload", response_model=JDResponse)
+@app.post(
+    "/jds/upload",
+    response_model=JDResponse,
+    responses={202: {"model": IngestionJobResponse}}
+)
 async def upload_jd(
     file: UploadFile = File(...),
+    background: bool = Query(INGESTION_BACKGROUND_DEFAULT),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    if background:
+        job = await jd_service.queue_jd_upload(file, current_user.id, db)
+        return JSONResponse(status_code=202, content=job.model_dump(mode="json"))
     return await jd_service.upload_jd(file, current_user.id, db)
 
-@app.get("/jds", response_model=list[JDResponse])
+@app.get("/jds", response_model=list[JDSummary], response_model_exclude_unset=True)
 async def get_jds(
+    response: Response,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[int] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return await jd_service.get_user_jds(current_user.id, db)
+    items, next_cursor = await jd_service.get_user_jds(
+        current_user.id, db, limit, cursor, parse_fields(fields, JDSummary)
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return items
 
 @app.get("/jds/{jd_id}", response_model=JDResponse)
 async def get_jd(
     jd_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await jd_service.get_jd(jd_id, current_user.id, db)
 
+@app.get("/jds/{jd_id}/rank", response_model=list[RankedResume])
+async def rank_resumes_for_jd(
+    jd_id: int,
+    top_k: int = Query(20, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await matching_service.rank_resumes(jd_id, current_user.id, db, top_k)
+
 # Matching endpoints
 @app.post("/matches", response_model=MatchResponse)
 async def create_match(
     resume_id: int = Form(...),
     jd_id: int = Form(...),
+    force: bool = Query(False, description="Recompute even if a memoized analysis exists, overwriting it"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await matching_service.create_match(resume_id, jd_id, current_user.id, db, force)
+
+@app.post("/matches/batch")
+async def create_matches_batch(
+    batch: BatchMatchRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return await matching_service.create_match(resume_id, jd_id, current_user.id, db)
+    jd, resumes, missing_ids = await matching_service.prepare_batch_match(batch, current_user.id, db)
+    return StreamingResponse(
+        matching_service.stream_batch_matches(jd, resumes, missing_ids, current_user.id, db, batch.force),
+        media_type="application/x-ndjson"
+    )
 
-@app.get("/matches", response_model=list[MatchResponse])
+@app.get("/matches", response_model=list[MatchSummary], response_model_exclude_unset=True)
 async def get_matches(
+    response: Response,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[int] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return await matching_service.get_user_matches(current_user.id, db)
+    items, next_cursor = await matching_service.get_user_matches(
+        current_user.id, db, limit, cursor, parse_fields(fields, MatchSummary)
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return items
 
 @app.get("/matches/{match_id}", response_model=MatchResponse)
 async def get_match(
     match_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await matching_service.get_match(match_id, current_user.id, db)
 
+# Ingestion job endpoints
+@app.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await ingestion_service.get_job(job_id, current_user.id, db)
+
 # Jade format endpoints
 @app.post("/jade/convert/{resume_id}")
 async def convert_to_jade(
     resume_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await jade_service.convert_resume_to_jade(resume_id, current_user.id, db)
 
+@app.post("/jade/convert/{resume_id}/stream")
+async def convert_to_jade_stream(
+    resume_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    resume, jade_template = await jade_service.prepare_jade_conversion(resume_id, current_user.id, db)
+    return StreamingResponse(
+        with_keepalive(jade_service.stream_resume_to_jade(resume, jade_template, db)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @app.post("/jade/upload")
 async def upload_jade_template(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await jade_service.upload_jade_template(file, current_user.id, db)
 
 @app.get("/jade/templates")
 async def get_jade_templates(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await jade_service.get_jade_templates(current_user.id, db)
 
+# Cache endpoints
+@app.get("/cache/stats")
+async def get_cache_stats(admin: User = Depends(get_admin_user)):
+    return {"analysis": analysis_cache.get_stats(), "auth": auth_cache.get_stats()}
+
+# LLM usage endpoints
+@app.get("/llm/stats")
+async def get_llm_stats(admin: User = Depends(get_admin_user)):
+    return {"backend": ai_analyzer.backend.describe(), "tokens": token_metrics.get_stats()}
+
+# Event stream endpoints
+@app.post("/events/token")
+async def create_event_stream_token(current_user: User = Depends(get_current_user)):
+    """Short-lived token for opening /events from clients that cannot set headers"""
+    return {"stream_token": auth_service.create_stream_token(current_user), "expires_in": EVENTS_TOKEN_EXPIRE_SECONDS}
+
+@app.get("/events")
+async def stream_events(
+    stream_token: Optional[str] = Query(None, description="Token from POST /events/token, for clients that cannot set headers"),
+    last_event_id: Optional[str] = Header(None, description="Sent by EventSource on reconnect to replay missed events"),
+    resume_after: Optional[str] = Query(
+        None, alias="last_event_id", description="Last-Event-ID for clients reconnecting with a new stream token"
+    ),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: AsyncSession = Depends(get_db)
+):
+    if credentials:
+        current_user = await auth_service.get_current_user(credentials.credentials, db)
+    elif stream_token:
+        current_user = await auth_service.get_stream_user(stream_token, db)
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    # The stream stays open indefinitely; do not hold a pooled connection for its lifetime
+    await db.close()
+    return StreamingResponse(
+        with_keepalive(stream_user_events(current_user.id, last_event_id or resume_after)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@app.get("/events/stats")
+async def get_event_stats(admin: User = Depends(get_admin_user)):
+    return {"events": event_broker.get_stats()}
+
+# Database endpoints
+@app.get("/db/stats")
+async def get_db_stats(admin: User = Depends(get_admin_user)):
+    return {"pools": get_pool_stats()}
+
+# Profiling endpoints
+@app.get("/admin/profiles")
+async def list_profiles(
+    limit: int = Query(20, ge=1, le=200),
+    route: Optional[str] = Query(None, description="Only profiles of this route template, e.g. /resumes/upload"),
+    admin: User = Depends(get_admin_user)
+):
+    offenders = await asyncio.to_thread(request_profiler.worst_offenders, limit, route)
+    return {"profiler": request_profiler.get_stats(), "profiles": offenders}
+
+@app.get("/admin/profiles/{profile_id}/{kind}")
+async def download_profile(profile_id: str, kind: str, admin: User = Depends(get_admin_user)):
+    path = request_profiler.dump_path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
+
+# Prometheus endpoint
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if METRICS_TOKEN and (credentials is None or not secrets.compare_digest(credentials.credentials, METRICS_TOKEN)):
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    
+    # Point-in-time gauges are read at scrape time
+    for pool, stats in get_pool_stats().items():
+        if "checked_out" in stats:
+            db_pool_checked_out.labels(pool).set(stats["checked_out"])
+    event_streams_open.set(event_broker.get_stats()["open_streams"])
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
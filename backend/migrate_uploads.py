@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Jade AI Upload Migration
+Moves stored uploads into the configured file storage layout: files from before sharding
+("resumes/<file>") are moved below their shard directories, and with STORAGE_BACKEND=s3 the
+files of a local upload directory are copied into the bucket. Rows are repointed in batches,
+so an interrupted run continues where it stopped when started again.
+
+    python migrate_uploads.py
+    STORAGE_BACKEND=s3 python migrate_uploads.py --source-root uploads --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from utils.storage import STORAGE_LOCAL_ROOT, LocalFileStorage, file_storage, shard_key
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source-root", default=STORAGE_LOCAL_ROOT, help="local directory the files are in now")
+    parser.add_argument("--batch-size", type=int, default=200, help="files per database transaction")
+    parser.add_argument("--concurrency", type=int, default=8, help="files copied at once")
+    parser.add_argument("--keep-source", action="store_true", help="leave the local files in place after copying")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be moved")
+    return parser.parse_args()
+
+async def migrate_key(source: LocalFileStorage, key: str, in_place: bool, dry_run: bool) -> Optional[str]:
+    """Put the file stored under key in place; returns its new key, or None when there is nothing to do"""
+    namespace, filename = key.split("/")[0], key.split("/")[-1]
+    new_key = key if file_storage.is_sharded(key) else shard_key(namespace, filename, file_storage.shard_depth)
+    if new_key == key and (in_place or await file_storage.exists(key)):
+        return None
+
+    if not await source.exists(key):
+        # Moved by an earlier run that stopped before its rows were committed
+        if new_key != key and await file_storage.exists(new_key):
+            return new_key
+        raise FileNotFoundError(f"Missing file {key!r}")
+
+    if not dry_run:
+        if in_place:
+            await file_storage.put_file(source.path(key), new_key)
+        else:
+            await file_storage.write(new_key, source.read(key))
+    return new_key
+
+async def run_migration(args) -> int:
+    from sqlalchemy import select, update
+    from database import AUTO_MIGRATE, close_db, open_session, run_migrations
+    from models import JadeTemplate, JobDescription, Resume
+
+    if AUTO_MIGRATE:
+        run_migrations()
+
+    source = LocalFileStorage(root=args.source_root)
+    in_place = isinstance(file_storage, LocalFileStorage) and (
+        os.path.abspath(file_storage.root) == os.path.abspath(source.root)
+    )
+    print(f"Migrating files from {os.path.abspath(source.root)} into {file_storage.describe()}", flush=True)
+
+    slots = asyncio.Semaphore(args.concurrency)
+    failures = 0
+
+    async def migrate(key: str):
+        async with slots:
+            return await migrate_key(source, key, in_place, args.dry_run)
+
+    db = open_session()
+    try:
+        for model in (Resume, JobDescription, JadeTemplate):
+            counts = {"moved": 0, "unchanged": 0, "failed": 0}
+            # New keys sort after the old ones and come up again; they need no second look
+            new_keys = set()
+            last_key = ""
+            while True:
+                # Keys are visited in order; rows sharing a file (deduplicated uploads) move together
+                keys = (await db.scalars(
+                    select(model.file_path).where(model.file_path > last_key)
+                    .group_by(model.file_path).order_by(model.file_path).limit(args.batch_size)
+                )).all()
+                if not keys:
+                    break
+                last_key = keys[-1]
+                keys = [key for key in keys if key not in new_keys]
+
+                moves: Dict[str, str] = {}
+                for key, outcome in zip(keys, await asyncio.gather(
+                    *(migrate(key) for key in keys), return_exceptions=True
+                )):
+                    if isinstance(outcome, Exception):
+                        counts["failed"] += 1
+                        print(f"{model.__tablename__}: {key}: {outcome}", file=sys.stderr, flush=True)
+                    elif outcome is None:
+                        counts["unchanged"] += 1
+                    else:
+                        counts["moved"] += 1
+                        moves[key] = outcome
+                        new_keys.add(outcome)
+
+                if moves and not args.dry_run:
+                    for key, new_key in moves.items():
+                        await db.execute(
+                            update(model).where(model.file_path == key)
+                            .values(file_path=new_key, filename=os.path.basename(new_key))
+                        )
+                    await db.commit()
+                    if not in_place and not args.keep_source:
+                        for key in moves:
+                            await source.delete(key)
+                else:
+                    await db.commit()
+
+            failures += counts["failed"]
+            print(f"{model.__tablename__}: " + " ".join(f"{status} {count:,}" for status, count in counts.items()),
+                  flush=True)
+        return 1 if failures else 0
+    finally:
+        await db.close()
+        await file_storage.aclose()
+        await close_db()
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        sys.exit(asyncio.run(run_migration(args)))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to continue", file=sys.stderr)
+        sys.exit(130)
@@ -1,7 +1,25 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean, Index, UniqueConstraint
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from utils.compression import CompressedText
+
+class TextBody(Base):
+    """Large document text, compressed and kept out of the owning table so scans and list queries stay small"""
+    __tablename__ = "text_bodies"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    text = Column(CompressedText, nullable=False)
+
+def text_body(foreign_key: Column):
+    """Relationship to a TextBody created and deleted with the owning row; loaded on first access
+    (or with joinedload/selectinload), never by list queries"""
+    return relationship(TextBody, foreign_keys=[foreign_key], cascade="all, delete-orphan", single_parent=True)
+
+def text_body_proxy(relationship_name: str):
+    """Plain string attribute for a text_body relationship; assigning updates or creates the body"""
+    return association_proxy(relationship_name, "text", creator=lambda text: TextBody(text=text))
 
 class User(Base):
     __tablename__ = "users"
@@ -20,18 +38,26 @@ class User(Base):
 
 class Resume(Base):
     __tablename__ = "resumes"
+    __table_args__ = (
+        # Every list/lookup is scoped to the owner (also serves keyset pagination on id)
+        Index("ix_resumes_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_resumes_owner_id_id", "owner_id", "id"),
+        Index("ix_resumes_owner_id_experience_years", "owner_id", "experience_years"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
-    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the uploaded file
+    content_body_id = Column(Integer, ForeignKey("text_bodies.id"), nullable=False)
     summary = Column(Text, nullable=True)
     skills = Column(Text, nullable=True)  # JSON string of extracted skills
     experience_years = Column(Float, nullable=True)
     education = Column(Text, nullable=True)  # JSON string of education details
-    jade_format = Column(Text, nullable=True)  # Jade formatted version
+    jade_format_body_id = Column(Integer, ForeignKey("text_bodies.id"), nullable=True)  # Jade formatted version
+    processing_status = Column(String, nullable=False, default="completed", server_default="completed")  # pending / processing / completed / failed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -41,16 +67,26 @@ class Resume(Base):
     # Relationships
     owner = relationship("User", back_populates="resumes")
     matches = relationship("Match", back_populates="resume")
+    content_body = text_body(content_body_id)
+    jade_format_body = text_body(jade_format_body_id)
+    
+    content = text_body_proxy("content_body")
+    jade_format = text_body_proxy("jade_format_body")
 
 class JobDescription(Base):
     __tablename__ = "job_descriptions"
+    __table_args__ = (
+        Index("ix_job_descriptions_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_job_descriptions_owner_id_id", "owner_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
-    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the uploaded file
+    content_body_id = Column(Integer, ForeignKey("text_bodies.id"), nullable=False)
     title = Column(String, nullable=True)
     company = Column(String, nullable=True)
     location = Column(String, nullable=True)
@@ -58,6 +94,7 @@ class JobDescription(Base):
     preferred_skills = Column(Text, nullable=True)  # JSON string of preferred skills
     experience_required = Column(Float, nullable=True)
     education_required = Column(Text, nullable=True)
+    processing_status = Column(String, nullable=False, default="completed", server_default="completed")  # pending / processing / completed / failed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -67,9 +104,20 @@ class JobDescription(Base):
     # Relationships
     owner = relationship("User", back_populates="job_descriptions")
     matches = relationship("Match", back_populates="job_description")
+    content_body = text_body(content_body_id)
+    
+    content = text_body_proxy("content_body")
 
 class Match(Base):
     __tablename__ = "matches"
+    __table_args__ = (
+        Index("ix_matches_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_matches_owner_id_id", "owner_id", "id"),
+        Index("ix_matches_resume_id", "resume_id"),
+        Index("ix_matches_jd_id_match_percentage", "jd_id", "match_percentage"),
+        # One memoized analysis per pair and key; concurrent duplicates fail instead of piling up
+        UniqueConstraint("resume_id", "jd_id", "analysis_key", name="uq_matches_resume_id_jd_id_analysis_key"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     match_percentage = Column(Float, nullable=False)
@@ -80,6 +128,7 @@ class Match(Base):
     strengths = Column(Text, nullable=True)  # JSON string of strengths
     weaknesses = Column(Text, nullable=True)  # JSON string of weaknesses
     recommendations = Column(Text, nullable=True)  # JSON string of recommendations
+    analysis_key = Column(String(64), nullable=True)  # Memoization key; None for fallback analyses, which are never reused
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Foreign keys
@@ -94,12 +143,18 @@ class Match(Base):
 
 class JadeTemplate(Base):
     __tablename__ = "jade_templates"
+    __table_args__ = (
+        Index("ix_jade_templates_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_jade_templates_owner_id_id", "owner_id", "id"),
+        Index("ix_jade_templates_owner_id_is_active", "owner_id", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the uploaded file
+    content_body_id = Column(Integer, ForeignKey("text_bodies.id"), nullable=False)
     description = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -110,5 +165,62 @@ class JadeTemplate(Base):
     
     # Relationships
     owner = relationship("User")
+    content_body = text_body(content_body_id)
+    
+    content = text_body_proxy("content_body")
+
+class Skill(Base):
+    __tablename__ = "skills"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, index=True, nullable=False)  # Normalized (lowercase, aliases resolved)
+
+class ResumeSkill(Base):
+    __tablename__ = "resume_skills"
+    __table_args__ = (
+        # Serves skill search: owner and skill narrow to resume ids without touching resumes
+        Index("ix_resume_skills_owner_id_skill_id_resume_id", "owner_id", "skill_id", "resume_id"),
+    )
+    
+    resume_id = Column(Integer, ForeignKey("resumes.id"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id"), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Copied from the resume
 
+class JobDescriptionSkill(Base):
+    __tablename__ = "job_description_skills"
+    __table_args__ = (
+        Index("ix_job_description_skills_skill_id", "skill_id"),
+    )
+    
+    jd_id = Column(Integer, ForeignKey("job_descriptions.id"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id"), primary_key=True)
+    required = Column(Boolean, nullable=False)  # False for preferred skills
 
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # resume / jd
+    document_id = Column(Integer, nullable=False)  # Resume.id or JobDescription.id
+    status = Column(String, nullable=False, default="queued", index=True)  # queued / processing / completed / failed
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Foreign keys
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Relationships
+    owner = relationship("User")
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)
+    kind = Column(String, nullable=False)  # resume_analysis / jd_analysis
+    result = Column(Text, nullable=False)  # JSON string of the analysis result
+    created_at = Column(Float, nullable=False, index=True)  # Unix timestamp
+    expires_at = Column(Float, nullable=True, index=True)  # Unix timestamp, None = never
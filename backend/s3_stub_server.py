@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Jade AI S3 Stub Server
+A MinIO-style stand-in implementing the part of the S3 API that the s3 storage backend uses
+(path-style PUT/GET/HEAD/DELETE and multipart uploads), keeping objects in a local directory:
+
+    python s3_stub_server.py --port 9200 --data-dir /tmp/s3-stub
+    STORAGE_BACKEND=s3 STORAGE_S3_ENDPOINT_URL=http://localhost:9200 python run.py
+
+Buckets are created on first use and request signatures are not checked.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import uuid
+from xml.etree import ElementTree
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import FileResponse
+
+app = FastAPI(title="Jade AI S3 Stub")
+DATA_DIR = "s3-stub-data"
+
+def _error(status: int, code: str, message: str) -> Response:
+    body = f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><Error><Code>{code}</Code><Message>{message}</Message></Error>"
+    return Response(content=body, status_code=status, media_type="application/xml")
+
+def _object_path(bucket: str, key: str) -> str:
+    parts = key.split("/")
+    if any(part in ("", ".", "..") for part in parts) or ".." in bucket:
+        raise ValueError(key)
+    return os.path.join(DATA_DIR, bucket, *parts)
+
+def _upload_dir(upload_id: str) -> str:
+    return os.path.join(DATA_DIR, ".multipart", os.path.basename(upload_id))
+
+async def _receive(request: Request, path: str) -> str:
+    """Stream the request body to path (via a temporary name), returning the body's ETag"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = f"{path}.{uuid.uuid4().hex[:8]}.partial"
+    digest = hashlib.md5()
+    with open(partial_path, "wb") as buffer:
+        async for chunk in request.stream():
+            digest.update(chunk)
+            buffer.write(chunk)
+    os.replace(partial_path, path)
+    return f"\"{digest.hexdigest()}\""
+
+@app.put("/{bucket}/{key:path}")
+async def put_object(bucket: str, key: str, request: Request):
+    upload_id = request.query_params.get("uploadId")
+    if upload_id is not None:
+        if not os.path.isdir(_upload_dir(upload_id)):
+            return _error(404, "NoSuchUpload", "The specified upload does not exist")
+        part_number = int(request.query_params["partNumber"])
+        etag = await _receive(request, os.path.join(_upload_dir(upload_id), f"{part_number:05d}"))
+    else:
+        etag = await _receive(request, _object_path(bucket, key))
+    return Response(status_code=200, headers={"ETag": etag})
+
+@app.post("/{bucket}/{key:path}")
+async def post_object(bucket: str, key: str, request: Request):
+    if "uploads" in request.query_params:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(_upload_dir(upload_id))
+        body = (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
+            "<InitiateMultipartUploadResult xmlns=\"http://s3.amazonaws.com/doc/2006-03-01/\">"
+            f"<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>"
+            "</InitiateMultipartUploadResult>"
+        )
+        return Response(content=body, media_type="application/xml")
+
+    upload_id = request.query_params.get("uploadId")
+    if upload_id is None:
+        return _error(400, "InvalidRequest", "Unsupported POST")
+    upload_dir = _upload_dir(upload_id)
+    if not os.path.isdir(upload_dir):
+        return _error(404, "NoSuchUpload", "The specified upload does not exist")
+
+    # Concatenate the listed parts in order
+    numbers = [
+        int(element.text) for element in ElementTree.fromstring(await request.body()).iter()
+        if element.tag.endswith("PartNumber")
+    ]
+    path = _object_path(bucket, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as target:
+        for number in numbers:
+            part_path = os.path.join(upload_dir, f"{number:05d}")
+            if not os.path.exists(part_path):
+                return _error(400, "InvalidPart", f"Part {number} was not uploaded")
+            with open(part_path, "rb") as part:
+                shutil.copyfileobj(part, target)
+    shutil.rmtree(upload_dir)
+
+    body = (
+        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
+        "<CompleteMultipartUploadResult xmlns=\"http://s3.amazonaws.com/doc/2006-03-01/\">"
+        f"<Bucket>{bucket}</Bucket><Key>{key}</Key><ETag>\"{upload_id}-{len(numbers)}\"</ETag>"
+        "</CompleteMultipartUploadResult>"
+    )
+    return Response(content=body, media_type="application/xml")
+
+@app.get("/{bucket}/{key:path}")
+async def get_object(bucket: str, key: str):
+    path = _object_path(bucket, key)
+    if not os.path.isfile(path):
+        return _error(404, "NoSuchKey", "The specified key does not exist")
+    return FileResponse(path, media_type="application/octet-stream")
+
+@app.head("/{bucket}/{key:path}")
+async def head_object(bucket: str, key: str):
+    path = _object_path(bucket, key)
+    if not os.path.isfile(path):
+        return Response(status_code=404)
+    return Response(status_code=200, headers={"Content-Length": str(os.path.getsize(path))})
+
+@app.delete("/{bucket}/{key:path}")
+async def delete_object(bucket: str, key: str, request: Request):
+    upload_id = request.query_params.get("uploadId")
+    if upload_id is not None:
+        shutil.rmtree(_upload_dir(upload_id), ignore_errors=True)
+    else:
+        path = _object_path(bucket, key)
+        if os.path.isfile(path):
+            os.remove(path)
+    return Response(status_code=204)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="S3-compatible object storage stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory holding buckets and objects")
+    args = parser.parse_args()
+    DATA_DIR = args.data_dir
+
+    print(f"Starting S3 stub server on http://{args.host}:{args.port}")
+    print(f"Objects are stored in {os.path.abspath(DATA_DIR)}")
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -35,6 +35,7 @@ class ResumeResponse(ResumeBase):
     experience_years: Optional[float] = None
     education: Optional[str] = None
     jade_format: Optional[str] = None
+    processing_status: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     owner_id: int
@@ -42,6 +43,24 @@ class ResumeResponse(ResumeBase):
     class Config:
         from_attributes = True
 
+class ResumeSummary(BaseModel):
+    """List view of a resume without the large content/jade_format bodies"""
+    id: int
+    filename: Optional[str] = None
+    original_filename: Optional[str] = None
+    file_size: Optional[int] = None
+    summary: Optional[str] = None
+    skills: Optional[str] = None
+    experience_years: Optional[float] = None
+    education: Optional[str] = None
+    processing_status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    owner_id: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
 # Job Description schemas
 class JDBase(BaseModel):
     filename: str
@@ -61,6 +80,7 @@ class JDResponse(JDBase):
     preferred_skills: Optional[str] = None
     experience_required: Optional[float] = None
     education_required: Optional[str] = None
+    processing_status: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     owner_id: int
@@ -68,6 +88,27 @@ class JDResponse(JDBase):
     class Config:
         from_attributes = True
 
+class JDSummary(BaseModel):
+    """List view of a job description without the large content body"""
+    id: int
+    filename: Optional[str] = None
+    original_filename: Optional[str] = None
+    file_size: Optional[int] = None
+    title: Optional[str] = None
+    company: Optional[str] = None
+    location: Optional[str] = None
+    required_skills: Optional[str] = None
+    preferred_skills: Optional[str] = None
+    experience_required: Optional[float] = None
+    education_required: Optional[str] = None
+    processing_status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    owner_id: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
 # Match schemas
 class MatchBase(BaseModel):
     resume_id: int
@@ -92,6 +133,74 @@ class MatchResponse(MatchBase):
     class Config:
         from_attributes = True
 
+class MatchSummary(BaseModel):
+    """List view of a match; every field except id is optional so it can be projected"""
+    id: int
+    resume_id: Optional[int] = None
+    jd_id: Optional[int] = None
+    match_percentage: Optional[float] = None
+    skills_match: Optional[float] = None
+    experience_match: Optional[float] = None
+    education_match: Optional[float] = None
+    overall_feedback: Optional[str] = None
+    strengths: Optional[str] = None
+    weaknesses: Optional[str] = None
+    recommendations: Optional[str] = None
+    created_at: Optional[datetime] = None
+    owner_id: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
+class BatchMatchRequest(BaseModel):
+    jd_id: int
+    resume_ids: Optional[List[int]] = None
+    all_resumes: bool = False
+    shortlist_k: Optional[int] = None  # Only send the locally top-ranked K resumes to the LLM
+    force: bool = False  # Recompute pairs that already have a memoized analysis, overwriting the stored match
+
+class RankedResume(BaseModel):
+    resume_id: int
+    original_filename: str
+    score: float
+    skills_match: float
+    experience_match: float
+    education_match: float
+    text_similarity: float
+    matched_skills: List[str]
+
+# Archive upload schemas
+class ArchiveFileResult(BaseModel):
+    filename: str
+    status: str  # created / duplicate / failed / skipped
+    resume_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class ArchiveUploadResponse(BaseModel):
+    archive: str
+    total: int
+    created: int
+    duplicates: int
+    failed: int
+    skipped: int
+    files: List[ArchiveFileResult]
+
+# Ingestion job schemas
+class IngestionJobResponse(BaseModel):
+    id: int
+    kind: str
+    document_id: int
+    status: str
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    owner_id: int
+    
+    class Config:
+        from_attributes = True
+
 # Authentication schemas
 class LoginRequest(BaseModel):
     email: EmailStr
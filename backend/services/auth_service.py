@@ -2,11 +2,13 @@ from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from models import User
 from schemas import UserCreate, UserResponse, LoginRequest, Token
+from utils.auth_cache import auth_cache
 import os
 from dotenv import load_dotenv
 
@@ -17,9 +19,24 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# GET /events takes its token in the URL (EventSource cannot send headers), where access and proxy logs
+# see it; such tokens are short-lived and accepted by no other endpoint
+EVENTS_TOKEN_EXPIRE_SECONDS = int(os.getenv("EVENTS_TOKEN_EXPIRE_SECONDS", 60))
+EVENTS_TOKEN_SCOPE = "events"
+
+# Users allowed to call /admin endpoints (comma-separated emails)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+def _credentials_error() -> HTTPException:
+    return HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 class AuthService:
     def __init__(self):
         pass
@@ -43,12 +60,12 @@ class AuthService:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     
-    async def register_user(self, user_data: UserCreate, db: Session) -> UserResponse:
+    async def register_user(self, user_data: UserCreate, db: AsyncSession) -> UserResponse:
         """Register a new user"""
         # Check if user already exists
-        existing_user = db.query(User).filter(
+        existing_user = await db.scalar(select(User).where(
             (User.email == user_data.email) | (User.username == user_data.username)
-        ).first()
+        ).limit(1))
         
         if existing_user:
             raise HTTPException(
@@ -65,15 +82,15 @@ class AuthService:
         )
         
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         
         return UserResponse.from_orm(db_user)
     
-    async def login_user(self, login_data: LoginRequest, db: Session) -> Token:
+    async def login_user(self, login_data: LoginRequest, db: AsyncSession) -> Token:
         """Authenticate user and return access token"""
         # Find user by email
-        user = db.query(User).filter(User.email == login_data.email).first()
+        user = await db.scalar(select(User).where(User.email == login_data.email))
         
         if not user or not self.verify_password(login_data.password, user.hashed_password):
             raise HTTPException(
@@ -93,27 +110,69 @@ class AuthService:
         
         return Token(access_token=access_token, token_type="bearer")
     
-    async def get_current_user(self, token: str, db: Session) -> User:
+    async def get_current_user(self, token: str, db: AsyncSession) -> User:
         """Get current user from JWT token"""
-        credentials_exception = HTTPException(
-            status_code=401,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        # Tokens verified recently skip signature verification and the users lookup
+        cached_user = auth_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+        
+        payload = self._decode_token(token)
+        # Single-purpose tokens (event streams) are not API credentials
+        if payload.get("scope") is not None:
+            raise _credentials_error()
+        user = await self._load_user(payload, db)
         
+        auth_cache.set(token, user, payload.get("exp"))
+        return user
+    
+    def create_stream_token(self, user: User) -> str:
+        """Short-lived token that only opens the user's GET /events stream"""
+        return self.create_access_token(
+            {"sub": str(user.id), "scope": EVENTS_TOKEN_SCOPE}, timedelta(seconds=EVENTS_TOKEN_EXPIRE_SECONDS)
+        )
+    
+    async def get_stream_user(self, token: str, db: AsyncSession) -> User:
+        """Get the user of an event stream token (checked once per connection, so never cached)"""
+        payload = self._decode_token(token)
+        if payload.get("scope") != EVENTS_TOKEN_SCOPE:
+            raise _credentials_error()
+        return await self._load_user(payload, db)
+    
+    def _decode_token(self, token: str) -> dict:
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id: str = payload.get("sub")
-            if user_id is None:
-                raise credentials_exception
         except JWTError:
-            raise credentials_exception
-        
-        user = db.query(User).filter(User.id == int(user_id)).first()
+            payload = {}
+        if payload.get("sub") is None:
+            raise _credentials_error()
+        return payload
+    
+    async def _load_user(self, payload: dict, db: AsyncSession) -> User:
+        user = await db.get(User, int(payload["sub"]))
         if user is None:
-            raise credentials_exception
+            raise _credentials_error()
         
+        if not user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
         return user
+    
+    def require_admin(self, user: User) -> User:
+        """Reject users not listed in ADMIN_EMAILS"""
+        if user.email.lower() not in ADMIN_EMAILS:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        return user
+
+@event.listens_for(User, "after_update")
+def _invalidate_cached_user(mapper, connection, target):
+    """Forget cached tokens as soon as a user's password or active flag changes"""
+    state = inspect(target)
+    if state.attrs.hashed_password.history.has_changes() or state.attrs.is_active.history.has_changes():
+        auth_cache.invalidate_user(target.id)
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    auth_cache.invalidate_user(target.id)
 
 # Create service instance
 auth_service = AuthService()
@@ -0,0 +1,187 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+from dotenv import load_dotenv
+from database import SessionLocal, open_session
+from models import IngestionJob
+from schemas import IngestionJobResponse
+
+load_dotenv()
+
+# Ingestion worker configuration
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 4))
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", 2))
+INGESTION_STALE_SECONDS = int(os.getenv("INGESTION_STALE_SECONDS", 900))
+# How often idle workers look for jobs abandoned by a crashed process
+INGESTION_STALE_CHECK_INTERVAL = float(os.getenv("INGESTION_STALE_CHECK_INTERVAL", 60))
+INGESTION_BACKGROUND_DEFAULT = os.getenv("INGESTION_BACKGROUND_DEFAULT", "False").lower() == "true"
+
+# A processor parses, analyzes and persists one document: (document_id, db) -> None
+Processor = Callable[[int, AsyncSession], Awaitable[None]]
+
+class IngestionService:
+    """Database-backed job queue drained by an in-process pool of async workers"""
+
+    def __init__(self, workers: int = INGESTION_WORKERS):
+        self.workers = workers
+        self._processors: Dict[str, Processor] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # Jobs claimed by this process's workers, requeued when the workers are stopped
+        self._in_flight: Set[int] = set()
+        self._next_stale_check = 0.0
+
+    def register_processor(self, kind: str, processor: Processor):
+        """Register the coroutine that processes documents of the given kind"""
+        self._processors[kind] = processor
+
+    def enqueue(self, kind: str, document_id: int, user_id: int, db: AsyncSession) -> IngestionJob:
+        """Add a job to the session; it becomes visible to workers when the caller commits"""
+        if kind not in self._processors:
+            raise ValueError(f"No ingestion processor registered for '{kind}'")
+
+        job = IngestionJob(kind=kind, document_id=document_id, status="queued", owner_id=user_id)
+        db.add(job)
+        return job
+
+    def notify(self):
+        """Wake an idle worker after a job has been committed"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def get_job(self, job_id: int, user_id: int, db: AsyncSession) -> IngestionJobResponse:
+        """Get the status of an ingestion job"""
+        job = await db.scalar(select(IngestionJob).where(
+            IngestionJob.id == job_id,
+            IngestionJob.owner_id == user_id
+        ))
+
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        return IngestionJobResponse.from_orm(job)
+
+    async def start(self):
+        """Requeue abandoned jobs and start the worker pool"""
+        if self._tasks:
+            return
+
+        self._wakeup = asyncio.Event()
+        await self._check_stale_jobs()
+        self._tasks = [
+            asyncio.create_task(self._worker_loop()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel the worker pool and put the jobs it was processing back on the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._in_flight:
+            await asyncio.to_thread(self._requeue_jobs, list(self._in_flight))
+            self._in_flight.clear()
+
+    async def _check_stale_jobs(self):
+        """Requeue stale jobs, at most once per INGESTION_STALE_CHECK_INTERVAL across all workers"""
+        now = time.monotonic()
+        if now < self._next_stale_check:
+            return
+        self._next_stale_check = now + INGESTION_STALE_CHECK_INTERVAL
+        await asyncio.to_thread(self._requeue_stale_jobs)
+
+    def _requeue_jobs(self, job_ids: Iterable[int]):
+        """Put interrupted jobs of this process back on the queue"""
+        db = SessionLocal()
+        try:
+            db.query(IngestionJob).filter(
+                IngestionJob.id.in_(job_ids),
+                IngestionJob.status == "processing"
+            ).update({"status": "queued"}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _requeue_stale_jobs(self):
+        """Put jobs left in 'processing' by a crashed process back on the queue"""
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=INGESTION_STALE_SECONDS)
+            db.query(IngestionJob).filter(
+                IngestionJob.status == "processing",
+                IngestionJob.started_at < cutoff
+            ).update({"status": "queued"}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim_next_job(self) -> Optional[int]:
+        """Atomically move the oldest queued job to 'processing' and return its id"""
+        db = SessionLocal()
+        try:
+            while True:
+                job = db.query(IngestionJob.id).filter(
+                    IngestionJob.status == "queued"
+                ).order_by(IngestionJob.id).first()
+                if job is None:
+                    return None
+
+                # Compare-and-set so concurrent workers (or processes) never claim the same job
+                claimed = db.query(IngestionJob).filter(
+                    IngestionJob.id == job.id,
+                    IngestionJob.status == "queued"
+                ).update({
+                    "status": "processing",
+                    "started_at": func.now(),
+                    "attempts": IngestionJob.attempts + 1
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    return job.id
+        finally:
+            db.close()
+
+    async def _worker_loop(self):
+        while True:
+            job_id = await asyncio.to_thread(self._claim_next_job)
+            if job_id is None:
+                await self._check_stale_jobs()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=INGESTION_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run_job(job_id)
+
+    async def _run_job(self, job_id: int):
+        self._in_flight.add(job_id)
+        db = open_session()
+        try:
+            job = await db.get(IngestionJob, job_id)
+            try:
+                processor = self._processors[job.kind]
+                await processor(job.document_id, db)
+                job.status = "completed"
+                job.error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await db.rollback()
+                job.status = "failed"
+                job.error = str(e)
+            job.finished_at = func.now()
+            await db.commit()
+            self._in_flight.discard(job_id)
+        finally:
+            await db.close()
+
+# Create service instance
+ingestion_service = IngestionService()
@@ -1,45 +1,42 @@
 import os
 import json
-import uuid
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 from fastapi import HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from models import Resume, JadeTemplate
 from schemas import JadeTemplateResponse
-from utils.ai_analyzer import convert_to_jade_format
+from utils.ai_analyzer import convert_to_jade_format, stream_jade_format
+from utils.sse import format_event
+from utils.events import event_broker
+from utils.upload_handler import save_upload_file
+from utils.deduplication import find_duplicate, link_stored_file, is_file_shared, remove_stored_file
+from utils.storage import file_storage
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Templates are read into memory and stored inline, so keep them small
+JADE_TEMPLATE_MAX_SIZE = int(os.getenv("JADE_TEMPLATE_MAX_SIZE", 1024 * 1024))
 
 class JadeService:
     def __init__(self):
-        self.upload_dir = "uploads/jade_templates"
-        os.makedirs(self.upload_dir, exist_ok=True)
+        self.storage_namespace = "jade_templates"
     
-    async def convert_resume_to_jade(self, resume_id: int, user_id: int, db: Session) -> dict:
+    async def convert_resume_to_jade(self, resume_id: int, user_id: int, db: AsyncSession) -> dict:
         """Convert a resume to Jade format"""
         try:
-            # Get resume
-            resume = db.query(Resume).filter(
-                Resume.id == resume_id,
-                Resume.owner_id == user_id
-            ).first()
-            
-            if not resume:
-                raise HTTPException(status_code=404, detail="Resume not found")
-            
-            # Get active Jade template
-            jade_template = db.query(JadeTemplate).filter(
-                JadeTemplate.owner_id == user_id,
-                JadeTemplate.is_active == True
-            ).first()
-            
-            if not jade_template:
-                raise HTTPException(status_code=404, detail="No active Jade template found")
+            resume, jade_template = await self.prepare_jade_conversion(resume_id, user_id, db)
+            event_broker.publish(user_id, "jade.started", {"resume_id": resume_id, "template_used": jade_template.name})
             
             # Convert resume to Jade format using AI
             jade_formatted = await convert_to_jade_format(resume, jade_template)
             
             # Update resume with Jade format
             resume.jade_format = jade_formatted
-            db.commit()
+            await db.commit()
+            event_broker.publish(user_id, "jade.completed", {"resume_id": resume_id, "template_used": jade_template.name})
             
             return {
                 "resume_id": resume_id,
@@ -51,92 +48,160 @@ class JadeService:
         except HTTPException:
             raise
         except Exception as e:
+            event_broker.publish(user_id, "jade.failed", {"resume_id": resume_id, "detail": str(e)})
             raise HTTPException(status_code=500, detail=f"Error converting to Jade format: {str(e)}")
     
-    async def upload_jade_template(self, file: UploadFile, user_id: int, db: Session) -> JadeTemplateResponse:
+    async def prepare_jade_conversion(
+        self, resume_id: int, user_id: int, db: AsyncSession
+    ) -> Tuple[Resume, JadeTemplate]:
+        """Load the resume and the user's active Jade template, raising 404 if either is missing"""
+        # Get resume
+        resume = await db.scalar(select(Resume).options(
+            joinedload(Resume.content_body), joinedload(Resume.jade_format_body)
+        ).where(
+            Resume.id == resume_id,
+            Resume.owner_id == user_id
+        ))
+        
+        if not resume:
+            raise HTTPException(status_code=404, detail="Resume not found")
+        
+        # Get active Jade template
+        jade_template = await db.scalar(select(JadeTemplate).options(joinedload(JadeTemplate.content_body)).where(
+            JadeTemplate.owner_id == user_id,
+            JadeTemplate.is_active == True
+        ).limit(1))
+        
+        if not jade_template:
+            raise HTTPException(status_code=404, detail="No active Jade template found")
+        
+        return resume, jade_template
+    
+    async def stream_resume_to_jade(
+        self, resume: Resume, jade_template: JadeTemplate, db: AsyncSession
+    ) -> AsyncIterator[str]:
+        """Relay a Jade conversion as Server-Sent Events, saving the text once generation completes"""
+        resume_id, owner_id, template_name = resume.id, resume.owner_id, jade_template.name
+        yield format_event("start", {"resume_id": resume_id, "template_used": template_name})
+        event_broker.publish(owner_id, "jade.started", {"resume_id": resume_id, "template_used": template_name})
+        
+        parts = []
+        try:
+            async for delta in stream_jade_format(resume, jade_template):
+                parts.append(delta)
+                yield format_event("token", {"text": delta})
+            
+            # Only a complete conversion is saved; a disconnect cancels the stream before this point
+            resume.jade_format = "".join(parts)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            event_broker.publish(owner_id, "jade.failed", {"resume_id": resume_id, "detail": str(e)})
+            yield format_event("error", {"detail": f"Error converting to Jade format: {str(e)}"})
+            return
+        
+        event_broker.publish(owner_id, "jade.completed", {"resume_id": resume_id, "template_used": template_name})
+        yield format_event("done", {
+            "resume_id": resume_id,
+            "template_used": template_name,
+            "conversion_successful": True
+        })
+    
+    async def upload_jade_template(self, file: UploadFile, user_id: int, db: AsyncSession) -> JadeTemplateResponse:
         """Upload a Jade template"""
         try:
             # Validate file type
             if not file.filename.lower().endswith(('.txt', '.md', '.json')):
                 raise HTTPException(status_code=400, detail="Only TXT, MD, and JSON files are allowed for Jade templates")
             
-            # Generate unique filename
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(self.upload_dir, unique_filename)
-            
-            # Save file
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            
-            # Read content
-            with open(file_path, "r", encoding="utf-8") as f:
-                template_content = f.read()
+            # Stream file into storage
+            upload = await save_upload_file(file, self.storage_namespace, JADE_TEMPLATE_MAX_SIZE)
             
             # Create database record
             db_template = JadeTemplate(
                 name=file.filename,
-                filename=unique_filename,
-                file_path=file_path,
-                content=template_content,
+                filename=upload.filename,
+                file_path=upload.file_path,
+                content_hash=upload.sha256,
                 description=f"Jade template uploaded from {file.filename}",
                 owner_id=user_id
             )
             
+            # Reuse the content (and stored file) of an identical template
+            orphaned_path = None
+            duplicate = await find_duplicate(db, JadeTemplate, upload.sha256, user_id)
+            if duplicate is not None:
+                db_template.content = duplicate.content
+                orphaned_path = await link_stored_file(db_template, duplicate)
+            else:
+                # Read content from the stored file
+                chunks = [chunk async for chunk in file_storage.read(upload.file_path)]
+                db_template.content = b"".join(chunks).decode("utf-8")
+            
             db.add(db_template)
-            db.commit()
-            db.refresh(db_template)
+            await db.commit()
+            # Reload only the server-generated columns; a full refresh would drop the loaded content
+            await db.refresh(db_template, ["created_at", "updated_at"])
+            await remove_stored_file(orphaned_path)
             
             return JadeTemplateResponse.from_orm(db_template)
             
+        except HTTPException:
+            raise
         except Exception as e:
             # Clean up file if database operation fails
-            if 'file_path' in locals() and os.path.exists(file_path):
-                os.remove(file_path)
+            if 'upload' in locals():
+                await remove_stored_file(upload.file_path)
             raise HTTPException(status_code=500, detail=f"Error processing Jade template: {str(e)}")
     
-    async def get_jade_templates(self, user_id: int, db: Session) -> List[JadeTemplateResponse]:
+    async def get_jade_templates(self, user_id: int, db: AsyncSession) -> List[JadeTemplateResponse]:
         """Get all Jade templates for a user"""
-        templates = db.query(JadeTemplate).filter(JadeTemplate.owner_id == user_id).all()
+        templates = (await db.scalars(select(JadeTemplate).options(joinedload(JadeTemplate.content_body)).where(
+            JadeTemplate.owner_id == user_id
+        ))).all()
         return [JadeTemplateResponse.from_orm(template) for template in templates]
     
-    async def set_active_template(self, template_id: int, user_id: int, db: Session) -> bool:
+    async def set_active_template(self, template_id: int, user_id: int, db: AsyncSession) -> bool:
         """Set a Jade template as active"""
         # Deactivate all templates for user
-        db.query(JadeTemplate).filter(JadeTemplate.owner_id == user_id).update({"is_active": False})
+        await db.execute(
+            update(JadeTemplate).where(JadeTemplate.owner_id == user_id).values(is_active=False)
+        )
         
         # Activate selected template
-        template = db.query(JadeTemplate).filter(
+        template = await db.scalar(select(JadeTemplate).where(
             JadeTemplate.id == template_id,
             JadeTemplate.owner_id == user_id
-        ).first()
+        ))
         
         if not template:
             raise HTTPException(status_code=404, detail="Jade template not found")
         
         template.is_active = True
-        db.commit()
+        await db.commit()
         
         return True
     
-    async def delete_jade_template(self, template_id: int, user_id: int, db: Session) -> bool:
+    async def delete_jade_template(self, template_id: int, user_id: int, db: AsyncSession) -> bool:
         """Delete a Jade template"""
-        template = db.query(JadeTemplate).filter(
+        template = await db.scalar(select(JadeTemplate).where(
             JadeTemplate.id == template_id,
             JadeTemplate.owner_id == user_id
-        ).first()
+        ))
         
         if not template:
             raise HTTPException(status_code=404, detail="Jade template not found")
         
-        # Delete file
-        if os.path.exists(template.file_path):
-            os.remove(template.file_path)
+        # Delete file unless a deduplicated upload still points at it
+        file_path = template.file_path
+        shared = await is_file_shared(db, JadeTemplate, file_path, template.id)
         
         # Delete from database
-        db.delete(template)
-        db.commit()
+        await db.delete(template)
+        await db.commit()
+        
+        if not shared:
+            await remove_stored_file(file_path)
         
         return True
 
@@ -1,109 +1,216 @@
-import os
 import json
-import uuid
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from models import JobDescription
-from schemas import JDResponse, JDAnalysis
-from utils.file_parser import parse_jd_file
+from schemas import JDResponse, JDSummary, JDAnalysis, IngestionJobResponse
+from utils.file_parser import parse_stored_jd_file
 from utils.ai_analyzer import analyze_jd_content
+from utils.upload_handler import save_upload_file, SavedUpload
+from utils.pagination import LIST_DEFAULT_LIMIT, paginate, serialize
+from utils.deduplication import find_duplicate, link_stored_file, is_file_shared, remove_stored_file
+from utils.skills import index_jd_skills, remove_jd_skills
+from utils.events import event_broker
+from services.ingestion_service import ingestion_service
 
 class JDService:
     def __init__(self):
-        self.upload_dir = "uploads/jds"
-        os.makedirs(self.upload_dir, exist_ok=True)
+        self.storage_namespace = "jds"
     
-    async def upload_jd(self, file: UploadFile, user_id: int, db: Session) -> JDResponse:
+    async def upload_jd(self, file: UploadFile, user_id: int, db: AsyncSession) -> JDResponse:
         """Upload and process a job description file"""
         try:
-            # Validate file type
-            if not file.filename.lower().endswith(('.pdf', '.doc', '.docx', '.txt')):
-                raise HTTPException(status_code=400, detail="Only PDF, DOC, DOCX, and TXT files are allowed")
-            
-            # Generate unique filename
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(self.upload_dir, unique_filename)
-            
             # Save file
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            
-            # Parse file content
-            parsed_content = parse_jd_file(file_path)
-            
-            # Analyze content with AI
-            analysis = await analyze_jd_content(parsed_content)
+            upload = await self._save_upload(file)
             
             # Create database record
             db_jd = JobDescription(
-                filename=unique_filename,
+                filename=upload.filename,
                 original_filename=file.filename,
-                file_path=file_path,
-                file_size=len(content),
-                content=parsed_content,
-                title=analysis.title,
-                company=analysis.company,
-                location=analysis.location,
-                required_skills=json.dumps(analysis.required_skills),
-                preferred_skills=json.dumps(analysis.preferred_skills),
-                experience_required=analysis.experience_required,
-                education_required=analysis.education_required,
+                file_path=upload.file_path,
+                file_size=upload.size,
+                content_hash=upload.sha256,
                 owner_id=user_id
             )
             
+            # Reuse parsed content and analysis from an identical earlier upload
+            reused, orphaned_path = await self._reuse_duplicate(db_jd, user_id, db)
+            if not reused:
+                # Parse file content
+                parsed_content = await parse_stored_jd_file(upload.file_path)
+                
+                # Analyze content with AI
+                analysis = await analyze_jd_content(parsed_content)
+                self._apply_analysis(db_jd, parsed_content, analysis)
+            
             db.add(db_jd)
-            db.commit()
-            db.refresh(db_jd)
+            await db.flush()
+            await index_jd_skills(db, db_jd)
+            await db.commit()
+            # Reload only the server-generated columns; a full refresh would drop the loaded content
+            await db.refresh(db_jd, ["created_at", "updated_at"])
+            await remove_stored_file(orphaned_path)
+            event_broker.publish(user_id, "jd.completed", {"jd_id": db_jd.id, "status": "completed"})
             
             return JDResponse.from_orm(db_jd)
             
+        except HTTPException:
+            raise
         except Exception as e:
             # Clean up file if database operation fails
-            if 'file_path' in locals() and os.path.exists(file_path):
-                os.remove(file_path)
+            if 'upload' in locals():
+                await remove_stored_file(upload.file_path)
             raise HTTPException(status_code=500, detail=f"Error processing job description: {str(e)}")
     
-    async def get_user_jds(self, user_id: int, db: Session) -> List[JDResponse]:
-        """Get all job descriptions for a user"""
-        jds = db.query(JobDescription).filter(JobDescription.owner_id == user_id).all()
-        return [JDResponse.from_orm(jd) for jd in jds]
+    async def queue_jd_upload(self, file: UploadFile, user_id: int, db: AsyncSession) -> IngestionJobResponse:
+        """Save a job description and queue parsing/analysis for the background workers"""
+        try:
+            upload = await self._save_upload(file)
+            
+            # Placeholder record, filled in by process_pending_jd
+            db_jd = JobDescription(
+                filename=upload.filename,
+                original_filename=file.filename,
+                file_path=upload.file_path,
+                file_size=upload.size,
+                content_hash=upload.sha256,
+                content="",
+                processing_status="pending",
+                owner_id=user_id
+            )
+            db.add(db_jd)
+            await db.flush()
+            
+            job = ingestion_service.enqueue("jd", db_jd.id, user_id, db)
+            await db.commit()
+            await db.refresh(job)
+            ingestion_service.notify()
+            event_broker.publish(user_id, "jd.queued", {"jd_id": db_jd.id, "job_id": job.id, "status": "pending"})
+            
+            return IngestionJobResponse.from_orm(job)
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            await db.rollback()
+            if 'upload' in locals():
+                await remove_stored_file(upload.file_path)
+            raise HTTPException(status_code=500, detail=f"Error queueing job description: {str(e)}")
+    
+    async def process_pending_jd(self, jd_id: int, db: AsyncSession):
+        """Parse, analyze and persist a job description created by queue_jd_upload"""
+        jd = await db.get(JobDescription, jd_id, options=[joinedload(JobDescription.content_body)])
+        if not jd:
+            raise ValueError(f"Job description {jd_id} not found")
+        
+        owner_id = jd.owner_id
+        jd.processing_status = "processing"
+        await db.commit()
+        event_broker.publish(owner_id, "jd.processing", {"jd_id": jd_id, "status": "processing"})
+        
+        try:
+            reused, orphaned_path = await self._reuse_duplicate(jd, jd.owner_id, db)
+            if not reused:
+                parsed_content = await parse_stored_jd_file(jd.file_path)
+                analysis = await analyze_jd_content(parsed_content)
+                self._apply_analysis(jd, parsed_content, analysis)
+            await index_jd_skills(db, jd)
+            jd.processing_status = "completed"
+            await db.commit()
+            await remove_stored_file(orphaned_path)
+        except Exception as e:
+            await db.rollback()
+            jd.processing_status = "failed"
+            await db.commit()
+            event_broker.publish(owner_id, "jd.failed", {"jd_id": jd_id, "status": "failed", "detail": str(e)})
+            raise
+        event_broker.publish(owner_id, "jd.completed", {"jd_id": jd_id, "status": "completed"})
     
-    async def get_jd(self, jd_id: int, user_id: int, db: Session) -> JDResponse:
+    async def _save_upload(self, file: UploadFile) -> SavedUpload:
+        """Validate and stream an uploaded job description into file storage"""
+        # Validate file type
+        if not file.filename.lower().endswith(('.pdf', '.doc', '.docx', '.txt')):
+            raise HTTPException(status_code=400, detail="Only PDF, DOC, DOCX, and TXT files are allowed")
+        
+        return await save_upload_file(file, self.storage_namespace)
+    
+    def _apply_analysis(self, jd: JobDescription, parsed_content: str, analysis: JDAnalysis):
+        """Copy parsed text and AI analysis onto a job description record"""
+        jd.content = parsed_content
+        jd.title = analysis.title
+        jd.company = analysis.company
+        jd.location = analysis.location
+        jd.required_skills = json.dumps(analysis.required_skills)
+        jd.preferred_skills = json.dumps(analysis.preferred_skills)
+        jd.experience_required = analysis.experience_required
+        jd.education_required = analysis.education_required
+    
+    async def _reuse_duplicate(self, jd: JobDescription, user_id: int, db: AsyncSession) -> Tuple[bool, Optional[str]]:
+        """Copy content and analysis from an identical job description; returns (reused, orphaned file key)"""
+        duplicate = await find_duplicate(db, JobDescription, jd.content_hash, user_id, exclude_id=jd.id)
+        if duplicate is None:
+            return False, None
+        
+        jd.content = duplicate.content
+        jd.title = duplicate.title
+        jd.company = duplicate.company
+        jd.location = duplicate.location
+        jd.required_skills = duplicate.required_skills
+        jd.preferred_skills = duplicate.preferred_skills
+        jd.experience_required = duplicate.experience_required
+        jd.education_required = duplicate.education_required
+        return True, await link_stored_file(jd, duplicate)
+    
+    async def get_user_jds(
+        self, user_id: int, db: AsyncSession, limit: int = LIST_DEFAULT_LIMIT,
+        cursor: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> Tuple[List[JDSummary], Optional[int]]:
+        """Get a page of a user's job descriptions (newest first) and the cursor for the next page"""
+        statement = select(JobDescription).where(JobDescription.owner_id == user_id)
+        jds, next_cursor = await paginate(db, statement, JobDescription, limit, cursor, fields)
+        return serialize(jds, JDSummary, fields), next_cursor
+    
+    async def get_jd(self, jd_id: int, user_id: int, db: AsyncSession) -> JDResponse:
         """Get a specific job description"""
-        jd = db.query(JobDescription).filter(
+        jd = await db.scalar(select(JobDescription).options(joinedload(JobDescription.content_body)).where(
             JobDescription.id == jd_id,
             JobDescription.owner_id == user_id
-        ).first()
+        ))
         
         if not jd:
             raise HTTPException(status_code=404, detail="Job description not found")
         
         return JDResponse.from_orm(jd)
     
-    async def delete_jd(self, jd_id: int, user_id: int, db: Session) -> bool:
+    async def delete_jd(self, jd_id: int, user_id: int, db: AsyncSession) -> bool:
         """Delete a job description"""
-        jd = db.query(JobDescription).filter(
+        jd = await db.scalar(select(JobDescription).where(
             JobDescription.id == jd_id,
             JobDescription.owner_id == user_id
-        ).first()
+        ))
         
         if not jd:
             raise HTTPException(status_code=404, detail="Job description not found")
         
-        # Delete file
-        if os.path.exists(jd.file_path):
-            os.remove(jd.file_path)
+        # Delete file unless a deduplicated upload still points at it
+        file_path = jd.file_path
+        shared = await is_file_shared(db, JobDescription, file_path, jd.id)
         
         # Delete from database
-        db.delete(jd)
-        db.commit()
+        await remove_jd_skills(db, jd.id)
+        await db.delete(jd)
+        await db.commit()
+        event_broker.publish(user_id, "jd.deleted", {"jd_id": jd_id})
+        
+        if not shared:
+            await remove_stored_file(file_path)
         
         return True
 
 # Create service instance
 jd_service = JDService()
+ingestion_service.register_processor("jd", jd_service.process_pending_jd)
 
 
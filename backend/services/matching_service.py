@@ -1,28 +1,48 @@
+import os
 import json
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from dotenv import load_dotenv
+from database import open_session
 from models import Resume, JobDescription, Match
-from schemas import MatchResponse, MatchAnalysis
-from utils.ai_analyzer import match_resume_jd
+from schemas import MatchResponse, MatchSummary, MatchAnalysis, BatchMatchRequest, RankedResume
+from utils.ai_analyzer import match_key, score_match
+from utils.scoring_engine import scoring_engine
+from utils.pagination import LIST_DEFAULT_LIMIT, paginate, serialize
+from utils.events import event_broker
+
+load_dotenv()
+
+# Batch matching limits
+BATCH_MATCH_CONCURRENCY = int(os.getenv("BATCH_MATCH_CONCURRENCY", 8))
+BATCH_MATCH_MAX_RESUMES = int(os.getenv("BATCH_MATCH_MAX_RESUMES", 1000))
 
 class MatchingService:
     def __init__(self):
-        pass
+        # Saves of interrupted batches outlive their request; referenced here until they finish
+        self._background_saves = set()
     
-    async def create_match(self, resume_id: int, jd_id: int, user_id: int, db: Session) -> MatchResponse:
-        """Create a match between resume and job description"""
+    async def create_match(
+        self, resume_id: int, jd_id: int, user_id: int, db: AsyncSession, force: bool = False
+    ) -> MatchResponse:
+        """Create a match between resume and job description, reusing a memoized analysis unless forced.
+        A forced re-score replaces the stored analysis in place, so the match keeps its id."""
         try:
             # Get resume and JD
-            resume = db.query(Resume).filter(
+            resume = await db.scalar(select(Resume).where(
                 Resume.id == resume_id,
                 Resume.owner_id == user_id
-            ).first()
+            ))
             
-            jd = db.query(JobDescription).filter(
+            jd = await db.scalar(select(JobDescription).where(
                 JobDescription.id == jd_id,
                 JobDescription.owner_id == user_id
-            ).first()
+            ))
             
             if not resume:
                 raise HTTPException(status_code=404, detail="Resume not found")
@@ -30,27 +50,30 @@ class MatchingService:
             if not jd:
                 raise HTTPException(status_code=404, detail="Job description not found")
             
+            analysis_key = match_key(resume, jd)
+            if analysis_key and not force:
+                memoized = await self._memoized_matches(db, jd_id, user_id, {resume_id: analysis_key})
+                if resume_id in memoized:
+                    return MatchResponse.from_orm(memoized[resume_id])
+            
+            # Do not hold the pooled connection during the LLM call
+            await db.commit()
+            
             # Perform AI matching analysis
-            match_analysis = await match_resume_jd(resume, jd)
+            match_analysis, from_model = await score_match(resume, jd)
             
-            # Create match record
-            db_match = Match(
-                resume_id=resume_id,
-                jd_id=jd_id,
-                owner_id=user_id,
-                match_percentage=match_analysis.overall_match,
-                skills_match=match_analysis.skills_match,
-                experience_match=match_analysis.experience_match,
-                education_match=match_analysis.education_match,
-                overall_feedback=match_analysis.feedback,
-                strengths=json.dumps(match_analysis.strengths),
-                weaknesses=json.dumps(match_analysis.weaknesses),
-                recommendations=json.dumps(match_analysis.recommendations)
+            # Create (or, when forced, overwrite the memoized) match record
+            saved = await self._save_matches(
+                db, jd_id, user_id, [(resume_id, analysis_key if from_model else None, match_analysis)], overwrite=force
             )
-            
-            db.add(db_match)
-            db.commit()
-            db.refresh(db_match)
+            db_match = saved[resume_id]
+            await db.refresh(db_match, ["created_at"])
+            event_broker.publish(user_id, "match.created", {
+                "match_id": db_match.id,
+                "resume_id": resume_id,
+                "jd_id": jd_id,
+                "match_percentage": db_match.match_percentage
+            })
             
             return MatchResponse.from_orm(db_match)
             
@@ -59,35 +82,323 @@ class MatchingService:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error creating match: {str(e)}")
     
-    async def get_user_matches(self, user_id: int, db: Session) -> List[MatchResponse]:
-        """Get all matches for a user"""
-        matches = db.query(Match).filter(Match.owner_id == user_id).all()
-        return [MatchResponse.from_orm(match) for match in matches]
+    async def prepare_batch_match(
+        self, request: BatchMatchRequest, user_id: int, db: AsyncSession
+    ) -> Tuple[JobDescription, List[Resume], List[int]]:
+        """Load the JD and resumes for a batch match, returning (jd, resumes, missing_resume_ids)"""
+        jd = await db.scalar(select(JobDescription).options(joinedload(JobDescription.content_body)).where(
+            JobDescription.id == request.jd_id,
+            JobDescription.owner_id == user_id
+        ))
+        
+        if not jd:
+            raise HTTPException(status_code=404, detail="Job description not found")
+        
+        if request.shortlist_k is not None and request.shortlist_k <= 0:
+            raise HTTPException(status_code=400, detail="shortlist_k must be positive")
+        
+        statement = select(Resume).where(Resume.owner_id == user_id)
+        if request.all_resumes:
+            if not request.shortlist_k:
+                statement = statement.order_by(Resume.id).limit(BATCH_MATCH_MAX_RESUMES + 1)
+            resumes = (await db.scalars(statement)).all()
+            missing_ids = []
+        elif request.resume_ids:
+            requested_ids = list(dict.fromkeys(request.resume_ids))
+            if not request.shortlist_k and len(requested_ids) > BATCH_MATCH_MAX_RESUMES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"A batch can contain at most {BATCH_MATCH_MAX_RESUMES} resumes"
+                )
+            resumes = (await db.scalars(statement.where(Resume.id.in_(requested_ids)))).all()
+            found_ids = {resume.id for resume in resumes}
+            missing_ids = [resume_id for resume_id in requested_ids if resume_id not in found_ids]
+        else:
+            raise HTTPException(status_code=400, detail="Provide resume_ids or set all_resumes")
+        
+        # Pre-rank locally so LLM cost scales with K rather than N
+        if request.shortlist_k and resumes:
+            ranked = await self._rank(jd, user_id, db, request.shortlist_k, [resume.id for resume in resumes])
+            resumes_by_id = {resume.id: resume for resume in resumes}
+            resumes = [resumes_by_id[item["resume_id"]] for item in ranked]
+        
+        if len(resumes) > BATCH_MATCH_MAX_RESUMES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"A batch can contain at most {BATCH_MATCH_MAX_RESUMES} resumes"
+            )
+        
+        return jd, resumes, missing_ids
+    
+    async def stream_batch_matches(
+        self, jd: JobDescription, resumes: List[Resume], missing_ids: List[int], user_id: int, db: AsyncSession,
+        force: bool = False
+    ) -> AsyncIterator[str]:
+        """Score one JD against many resumes concurrently, yielding NDJSON lines as results finish.
+        Pairs with a memoized analysis are answered from the stored match unless force is set, in which case
+        the stored match is overwritten with the new analysis."""
+        jd_id = jd.id
+        for resume_id in missing_ids:
+            yield self._ndjson({"type": "error", "resume_id": resume_id, "detail": "Resume not found"})
+        
+        keys = {resume.id: match_key(resume, jd) for resume in resumes}
+        memoized = {} if force else await self._memoized_matches(db, jd_id, user_id, keys)
+        # Release the pooled connection (and, on SQLite, the read snapshot) while the LLM calls run;
+        # _save_matches starts a new transaction at the end
+        await db.commit()
+        match_ids = []
+        for resume_id, match in memoized.items():
+            match_ids.append(match.id)
+            yield self._ndjson({
+                "type": "result",
+                "resume_id": resume_id,
+                "jd_id": jd_id,
+                "match_id": match.id,
+                "cached": True,
+                **self._match_payload(match)
+            })
+        
+        semaphore = asyncio.Semaphore(BATCH_MATCH_CONCURRENCY)
+        
+        async def score(resume: Resume):
+            async with semaphore:
+                try:
+                    return resume.id, await score_match(resume, jd), None
+                except Exception as e:
+                    return resume.id, None, e
+        
+        tasks = [asyncio.create_task(score(resume)) for resume in resumes if resume.id not in memoized]
+        pending = []
+        failed = len(missing_ids)
+        finished_all = False
+        
+        try:
+            for finished in asyncio.as_completed(tasks):
+                resume_id, result, error = await finished
+                if error is not None:
+                    failed += 1
+                    yield self._ndjson({"type": "error", "resume_id": resume_id, "detail": str(error)})
+                    continue
+                
+                match_analysis, from_model = result
+                pending.append((resume_id, keys[resume_id] if from_model else None, match_analysis))
+                yield self._ndjson({
+                    "type": "result",
+                    "resume_id": resume_id,
+                    "jd_id": jd_id,
+                    "cached": False,
+                    **self._analysis_payload(match_analysis)
+                })
+            finished_all = True
+        finally:
+            # Stop outstanding LLM calls if the client disconnects mid-stream
+            for task in tasks:
+                task.cancel()
+            if not finished_all and pending:
+                # The request is being torn down; keep the results that were already paid for
+                task = asyncio.create_task(self._save_interrupted_batch(jd_id, user_id, pending, force))
+                self._background_saves.add(task)
+                task.add_done_callback(self._background_saves.discard)
+        
+        # Write every new match row in a single transaction
+        if pending:
+            try:
+                saved = await self._save_matches(db, jd_id, user_id, pending, overwrite=force)
+                match_ids.extend(saved[resume_id].id for resume_id, _, _ in pending)
+                yield self._ndjson({
+                    "type": "saved",
+                    "matches": [
+                        {"resume_id": resume_id, "match_id": saved[resume_id].id} for resume_id, _, _ in pending
+                    ]
+                })
+            except Exception as e:
+                await db.rollback()
+                yield self._ndjson({"type": "error", "detail": f"Error saving matches: {str(e)}"})
+                failed += len(pending)
+                pending = []
+        
+        summary = {
+            "jd_id": jd_id,
+            "total": len(resumes) + len(missing_ids),
+            "succeeded": len(memoized) + len(pending),
+            "failed": failed,
+            "match_ids": match_ids
+        }
+        event_broker.publish(user_id, "match.batch_completed", summary)
+        yield self._ndjson({"type": "summary", **summary})
+    
+    async def _save_interrupted_batch(
+        self, jd_id: int, user_id: int, pending: List[Tuple[int, Optional[str], MatchAnalysis]], force: bool
+    ):
+        """Store the results of a batch whose client went away, in a session of its own"""
+        db = open_session()
+        try:
+            saved = await self._save_matches(db, jd_id, user_id, pending, overwrite=force)
+        except Exception:
+            await db.rollback()
+            return
+        finally:
+            await db.close()
+        for resume_id, match in saved.items():
+            event_broker.publish(user_id, "match.created", {
+                "match_id": match.id,
+                "resume_id": resume_id,
+                "jd_id": jd_id,
+                "match_percentage": match.match_percentage
+            })
+    
+    async def rank_resumes(
+        self, jd_id: int, user_id: int, db: AsyncSession, top_k: int = 20
+    ) -> List[RankedResume]:
+        """Rank all of a user's resumes against a JD with the local scoring engine"""
+        jd = await db.scalar(select(JobDescription).options(joinedload(JobDescription.content_body)).where(
+            JobDescription.id == jd_id,
+            JobDescription.owner_id == user_id
+        ))
+        
+        if not jd:
+            raise HTTPException(status_code=404, detail="Job description not found")
+        
+        ranked = await self._rank(jd, user_id, db, top_k)
+        return [RankedResume(**item) for item in ranked]
+    
+    async def _rank(
+        self, jd: JobDescription, user_id: int, db: AsyncSession, top_k: int, resume_ids: Optional[List[int]] = None
+    ) -> List[dict]:
+        """Score a JD against the user's resume index, rebuilding the index if the resume set changed.
+        Only completed resumes are indexed; queued or failed ones have no skills or text to score yet."""
+        indexed = (Resume.owner_id == user_id, Resume.processing_status == "completed")
+        fingerprint = tuple((await db.execute(select(
+            func.count(Resume.id), func.max(Resume.id), func.max(Resume.updated_at)
+        ).where(*indexed))).one())
+        
+        index = scoring_engine.get_cached_index(user_id, fingerprint)
+        if index is None:
+            resumes = (await db.scalars(select(Resume).options(joinedload(Resume.content_body)).where(
+                *indexed
+            ).order_by(Resume.id))).all()
+            index = await asyncio.to_thread(scoring_engine.build_index, user_id, fingerprint, resumes)
+        
+        return await asyncio.to_thread(scoring_engine.rank, index, jd, top_k, resume_ids)
+    
+    async def _memoized_matches(
+        self, db: AsyncSession, jd_id: int, user_id: int, keys: Dict[int, Optional[str]]
+    ) -> Dict[int, Match]:
+        """Stored matches of this JD whose analysis key is still current, by resume id"""
+        keys = {resume_id: key for resume_id, key in keys.items() if key}
+        if not keys:
+            return {}
+        matches = (await db.scalars(select(Match).where(
+            Match.owner_id == user_id,
+            Match.jd_id == jd_id,
+            Match.resume_id.in_(list(keys)),
+            Match.analysis_key.in_(set(keys.values()))
+        ).execution_options(populate_existing=True))).all()
+        return {match.resume_id: match for match in matches if keys[match.resume_id] == match.analysis_key}
+    
+    async def _save_matches(
+        self, db: AsyncSession, jd_id: int, user_id: int,
+        results: List[Tuple[int, Optional[str], MatchAnalysis]], overwrite: bool = False
+    ) -> Dict[int, Match]:
+        """Persist (resume_id, analysis_key, analysis) results in one transaction, by resume id.
+        A result whose key is already stored (one match per key) returns that row instead of inserting a
+        duplicate; only with overwrite (forced re-scores) is the stored analysis replaced by the new one."""
+        for attempt in range(2):
+            keys = {resume_id: key for resume_id, key, _ in results}
+            existing = await self._memoized_matches(db, jd_id, user_id, keys)
+            saved = {}
+            for resume_id, analysis_key, match_analysis in results:
+                match = existing.get(resume_id)
+                if match is None:
+                    match = Match(resume_id=resume_id, jd_id=jd_id, owner_id=user_id, analysis_key=analysis_key)
+                    db.add(match)
+                    self._apply_analysis(match, match_analysis)
+                elif overwrite:
+                    self._apply_analysis(match, match_analysis)
+                saved[resume_id] = match
+            try:
+                await db.commit()
+                return saved
+            except IntegrityError:
+                # A concurrent request stored one of these keys first; the retry finds its row
+                await db.rollback()
+                if attempt:
+                    raise
+    
+    def _apply_analysis(self, match: Match, match_analysis: MatchAnalysis):
+        """Copy an analysis onto a Match row"""
+        match.match_percentage = match_analysis.overall_match
+        match.skills_match = match_analysis.skills_match
+        match.experience_match = match_analysis.experience_match
+        match.education_match = match_analysis.education_match
+        match.overall_feedback = match_analysis.feedback
+        match.strengths = json.dumps(match_analysis.strengths)
+        match.weaknesses = json.dumps(match_analysis.weaknesses)
+        match.recommendations = json.dumps(match_analysis.recommendations)
+    
+    def _analysis_payload(self, match_analysis: MatchAnalysis) -> dict:
+        """Serialize an analysis with the same field names as MatchResponse"""
+        return {
+            "match_percentage": match_analysis.overall_match,
+            "skills_match": match_analysis.skills_match,
+            "experience_match": match_analysis.experience_match,
+            "education_match": match_analysis.education_match,
+            "overall_feedback": match_analysis.feedback,
+            "strengths": json.dumps(match_analysis.strengths),
+            "weaknesses": json.dumps(match_analysis.weaknesses),
+            "recommendations": json.dumps(match_analysis.recommendations)
+        }
+    
+    def _match_payload(self, match: Match) -> dict:
+        """Serialize a stored match like _analysis_payload"""
+        return {
+            "match_percentage": match.match_percentage,
+            "skills_match": match.skills_match,
+            "experience_match": match.experience_match,
+            "education_match": match.education_match,
+            "overall_feedback": match.overall_feedback,
+            "strengths": match.strengths,
+            "weaknesses": match.weaknesses,
+            "recommendations": match.recommendations
+        }
+    
+    def _ndjson(self, payload: dict) -> str:
+        return json.dumps(payload) + "\n"
+    
+    async def get_user_matches(
+        self, user_id: int, db: AsyncSession, limit: int = LIST_DEFAULT_LIMIT,
+        cursor: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> Tuple[List[MatchSummary], Optional[int]]:
+        """Get a page of a user's matches (newest first) and the cursor for the next page"""
+        statement = select(Match).where(Match.owner_id == user_id)
+        matches, next_cursor = await paginate(db, statement, Match, limit, cursor, fields)
+        return serialize(matches, MatchSummary, fields), next_cursor
     
-    async def get_match(self, match_id: int, user_id: int, db: Session) -> MatchResponse:
+    async def get_match(self, match_id: int, user_id: int, db: AsyncSession) -> MatchResponse:
         """Get a specific match"""
-        match = db.query(Match).filter(
+        match = await db.scalar(select(Match).where(
             Match.id == match_id,
             Match.owner_id == user_id
-        ).first()
+        ))
         
         if not match:
             raise HTTPException(status_code=404, detail="Match not found")
         
         return MatchResponse.from_orm(match)
     
-    async def delete_match(self, match_id: int, user_id: int, db: Session) -> bool:
+    async def delete_match(self, match_id: int, user_id: int, db: AsyncSession) -> bool:
         """Delete a match"""
-        match = db.query(Match).filter(
+        match = await db.scalar(select(Match).where(
             Match.id == match_id,
             Match.owner_id == user_id
-        ).first()
+        ))
         
         if not match:
             raise HTTPException(status_code=404, detail="Match not found")
         
-        db.delete(match)
-        db.commit()
+        await db.delete(match)
+        await db.commit()
+        event_broker.publish(user_id, "match.deleted", {"match_id": match_id})
         
         return True
 
@@ -1,106 +1,393 @@
 import os
 import json
-import uuid
-from typing import List, Optional
+import asyncio
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from dotenv import load_dotenv
 from models import Resume
-from schemas import ResumeResponse, ResumeAnalysis
-from utils.file_parser import parse_resume_file
+from schemas import (
+    ResumeResponse, ResumeSummary, ResumeAnalysis, IngestionJobResponse, ArchiveUploadResponse, ArchiveFileResult
+)
+from utils.file_parser import parse_stored_resume_file
 from utils.ai_analyzer import analyze_resume_content
+from utils.upload_handler import save_upload_file, stage_upload_file, SavedUpload
+from utils.pagination import LIST_DEFAULT_LIMIT, paginate, serialize
+from utils.deduplication import (
+    UPLOAD_DEDUP_SCOPE, find_duplicate, find_duplicates, link_stored_file, is_file_shared, remove_file,
+    remove_stored_file
+)
+from utils.skills import (
+    index_resume_skills, index_new_resumes_skills, remove_resume_skills, normalize_skills, resumes_with_skills
+)
+from utils.archive import MAX_ARCHIVE_SIZE, extract_archive
+from utils.storage import file_storage
+from utils.events import event_broker
+from services.ingestion_service import ingestion_service
+
+load_dotenv()
+
+RESUME_EXTENSIONS = ('.pdf', '.doc', '.docx')
+
+# Archive uploads: members analyzed at once (leaves LLM capacity for other users) and rows per insert batch
+ARCHIVE_ANALYSIS_CONCURRENCY = int(os.getenv("ARCHIVE_ANALYSIS_CONCURRENCY", 4))
+ARCHIVE_INSERT_BATCH_SIZE = int(os.getenv("ARCHIVE_INSERT_BATCH_SIZE", 50))
 
 class ResumeService:
     def __init__(self):
-        self.upload_dir = "uploads/resumes"
-        os.makedirs(self.upload_dir, exist_ok=True)
+        self.storage_namespace = "resumes"
     
-    async def upload_resume(self, file: UploadFile, user_id: int, db: Session) -> ResumeResponse:
+    async def upload_resume(self, file: UploadFile, user_id: int, db: AsyncSession) -> ResumeResponse:
         """Upload and process a resume file"""
         try:
-            # Validate file type
-            if not file.filename.lower().endswith(('.pdf', '.doc', '.docx')):
-                raise HTTPException(status_code=400, detail="Only PDF, DOC, and DOCX files are allowed")
-            
-            # Generate unique filename
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(self.upload_dir, unique_filename)
-            
             # Save file
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            
-            # Parse file content
-            parsed_content = parse_resume_file(file_path)
-            
-            # Analyze content with AI
-            analysis = await analyze_resume_content(parsed_content)
+            upload = await self._save_upload(file)
             
             # Create database record
             db_resume = Resume(
-                filename=unique_filename,
+                filename=upload.filename,
                 original_filename=file.filename,
-                file_path=file_path,
-                file_size=len(content),
-                content=parsed_content,
-                summary=analysis.summary,
-                skills=json.dumps(analysis.skills),
-                experience_years=analysis.experience_years,
-                education=json.dumps(analysis.education),
+                file_path=upload.file_path,
+                file_size=upload.size,
+                content_hash=upload.sha256,
                 owner_id=user_id
             )
             
+            # Reuse parsed content and analysis from an identical earlier upload
+            reused, orphaned_path = await self._reuse_duplicate(db_resume, user_id, db)
+            if not reused:
+                # Parse file content
+                parsed_content = await parse_stored_resume_file(upload.file_path)
+                
+                # Analyze content with AI
+                analysis = await analyze_resume_content(parsed_content)
+                self._apply_analysis(db_resume, parsed_content, analysis)
+            
             db.add(db_resume)
-            db.commit()
-            db.refresh(db_resume)
+            await db.flush()
+            await index_resume_skills(db, db_resume)
+            await db.commit()
+            # Reload only the server-generated columns; a full refresh would drop the loaded content
+            await db.refresh(db_resume, ["created_at", "updated_at"])
+            await remove_stored_file(orphaned_path)
+            event_broker.publish(user_id, "resume.completed", {"resume_id": db_resume.id, "status": "completed"})
             
             return ResumeResponse.from_orm(db_resume)
             
+        except HTTPException:
+            raise
         except Exception as e:
             # Clean up file if database operation fails
-            if 'file_path' in locals() and os.path.exists(file_path):
-                os.remove(file_path)
+            if 'upload' in locals():
+                await remove_stored_file(upload.file_path)
             raise HTTPException(status_code=500, detail=f"Error processing resume: {str(e)}")
     
-    async def get_user_resumes(self, user_id: int, db: Session) -> List[ResumeResponse]:
-        """Get all resumes for a user"""
-        resumes = db.query(Resume).filter(Resume.owner_id == user_id).all()
-        return [ResumeResponse.from_orm(resume) for resume in resumes]
+    async def upload_archive(self, file: UploadFile, user_id: int, db: AsyncSession) -> ArchiveUploadResponse:
+        """Ingest a ZIP of resumes: members are parsed in parallel, analyzed with bounded concurrency
+        and inserted in batches; returns the outcome of every member"""
+        if not file.filename.lower().endswith(".zip"):
+            raise HTTPException(status_code=400, detail="Only ZIP archives are allowed")
+        
+        archive = await stage_upload_file(file, MAX_ARCHIVE_SIZE)
+        try:
+            members = await asyncio.to_thread(
+                extract_archive, archive.file_path, file_storage.staging_dir, RESUME_EXTENSIONS
+            )
+        finally:
+            remove_file(archive.file_path)
+        
+        results: List[Optional[ArchiveFileResult]] = [None] * len(members)
+        # Files referenced by committed rows; every other extracted file is removed at the end
+        kept_paths = set()
+        pending: List[Tuple[int, Resume, str]] = []
+        semaphore = asyncio.Semaphore(ARCHIVE_ANALYSIS_CONCURRENCY)
+        
+        def new_resume(member) -> Resume:
+            return Resume(
+                filename=member.filename,
+                original_filename=member.original_filename,
+                file_path=member.file_path,
+                file_size=member.size,
+                content_hash=member.sha256,
+                owner_id=user_id
+            )
+        
+        async def store(member):
+            """Move an extracted member into file storage (a rename for local storage)"""
+            key = file_storage.new_key(self.storage_namespace, os.path.splitext(member.file_path)[1])
+            try:
+                await file_storage.put_file(member.file_path, key)
+            except Exception as e:
+                remove_file(member.file_path)
+                member.file_path = None
+                member.rejected = ("failed", f"Error storing file: {e}")
+                return
+            member.filename = os.path.basename(key)
+            member.file_path = key
+        
+        def fail(index: int, detail: str):
+            results[index] = ArchiveFileResult(filename=members[index].original_filename, status="failed", detail=detail)
+        
+        async def process(index: int) -> Tuple[int, Optional[Resume], Optional[str]]:
+            try:
+                parsed_content = await parse_stored_resume_file(members[index].file_path)
+                async with semaphore:
+                    analysis = await analyze_resume_content(parsed_content)
+            except Exception as e:
+                return index, None, str(e)
+            resume = new_resume(members[index])
+            self._apply_analysis(resume, parsed_content, analysis)
+            return index, resume, None
+        
+        async def save_batch(batch: List[Tuple[int, Resume, str]]):
+            try:
+                db.add_all([resume for _, resume, _ in batch])
+                await db.flush()
+                await index_new_resumes_skills(db, [resume for _, resume, _ in batch])
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                for index, _, _ in batch:
+                    fail(index, f"Error saving resume: {e}")
+                return
+            for index, resume, status in batch:
+                kept_paths.add(resume.file_path)
+                results[index] = ArchiveFileResult(
+                    filename=resume.original_filename, status=status, resume_id=resume.id
+                )
+        
+        async def add(index: int, resume: Resume, status: str):
+            pending.append((index, resume, status))
+            if len(pending) >= ARCHIVE_INSERT_BATCH_SIZE:
+                batch = pending[:]
+                pending.clear()
+                await save_batch(batch)
+        
+        tasks = []
+        try:
+            await asyncio.gather(*(store(member) for member in members if member.file_path))
+            extracted = [index for index, member in enumerate(members) if member.rejected is None]
+            duplicates = await find_duplicates(db, Resume, [members[index].sha256 for index in extracted], user_id)
+            # Release the pooled connection while members are parsed and analyzed
+            await db.commit()
+            
+            # Identical members are processed once; the copies wait for the first one's analysis
+            copies = {}
+            for index, member in enumerate(members):
+                if member.rejected is not None:
+                    status, detail = member.rejected
+                    results[index] = ArchiveFileResult(filename=member.original_filename, status=status, detail=detail)
+                elif member.sha256 in duplicates:
+                    resume = new_resume(member)
+                    await self._copy_duplicate(resume, duplicates[member.sha256])
+                    await add(index, resume, "duplicate")
+                elif UPLOAD_DEDUP_SCOPE != "off" and member.sha256 in copies:
+                    copies[member.sha256].append(index)
+                else:
+                    copies[member.sha256] = []
+                    tasks.append(asyncio.create_task(process(index)))
+            
+            for next_done in asyncio.as_completed(tasks):
+                index, resume, error = await next_done
+                copy_indexes = copies.get(members[index].sha256, [])
+                if resume is None:
+                    for failed_index in [index, *copy_indexes]:
+                        fail(failed_index, f"Error processing resume: {error}")
+                    continue
+                await add(index, resume, "created")
+                for copy_index in copy_indexes:
+                    copy = new_resume(members[copy_index])
+                    await self._copy_duplicate(copy, resume)
+                    await add(copy_index, copy, "duplicate")
+            if pending:
+                await save_batch(pending[:])
+        finally:
+            for task in tasks:
+                task.cancel()
+            for member in members:
+                if member.file_path and member.file_path not in kept_paths:
+                    await remove_stored_file(member.file_path)
+        
+        counts = {status: sum(1 for result in results if result.status == status) for status in (
+            "created", "duplicate", "failed", "skipped"
+        )}
+        event_broker.publish(user_id, "resume.archive_completed", {"archive": file.filename, **counts})
+        return ArchiveUploadResponse(
+            archive=file.filename,
+            total=len(members),
+            created=counts["created"],
+            duplicates=counts["duplicate"],
+            failed=counts["failed"],
+            skipped=counts["skipped"],
+            files=results
+        )
+    
+    async def queue_resume_upload(self, file: UploadFile, user_id: int, db: AsyncSession) -> IngestionJobResponse:
+        """Save a resume and queue parsing/analysis for the background workers"""
+        try:
+            upload = await self._save_upload(file)
+            
+            # Placeholder record, filled in by process_pending_resume
+            db_resume = Resume(
+                filename=upload.filename,
+                original_filename=file.filename,
+                file_path=upload.file_path,
+                file_size=upload.size,
+                content_hash=upload.sha256,
+                content="",
+                processing_status="pending",
+                owner_id=user_id
+            )
+            db.add(db_resume)
+            await db.flush()
+            
+            job = ingestion_service.enqueue("resume", db_resume.id, user_id, db)
+            await db.commit()
+            await db.refresh(job)
+            ingestion_service.notify()
+            event_broker.publish(user_id, "resume.queued", {"resume_id": db_resume.id, "job_id": job.id, "status": "pending"})
+            
+            return IngestionJobResponse.from_orm(job)
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            await db.rollback()
+            if 'upload' in locals():
+                await remove_stored_file(upload.file_path)
+            raise HTTPException(status_code=500, detail=f"Error queueing resume: {str(e)}")
+    
+    async def process_pending_resume(self, resume_id: int, db: AsyncSession):
+        """Parse, analyze and persist a resume created by queue_resume_upload"""
+        resume = await db.get(Resume, resume_id, options=[joinedload(Resume.content_body)])
+        if not resume:
+            raise ValueError(f"Resume {resume_id} not found")
+        
+        owner_id = resume.owner_id
+        resume.processing_status = "processing"
+        await db.commit()
+        event_broker.publish(owner_id, "resume.processing", {"resume_id": resume_id, "status": "processing"})
+        
+        try:
+            reused, orphaned_path = await self._reuse_duplicate(resume, resume.owner_id, db)
+            if not reused:
+                parsed_content = await parse_stored_resume_file(resume.file_path)
+                analysis = await analyze_resume_content(parsed_content)
+                self._apply_analysis(resume, parsed_content, analysis)
+            await index_resume_skills(db, resume)
+            resume.processing_status = "completed"
+            await db.commit()
+            await remove_stored_file(orphaned_path)
+        except Exception as e:
+            await db.rollback()
+            resume.processing_status = "failed"
+            await db.commit()
+            event_broker.publish(owner_id, "resume.failed", {"resume_id": resume_id, "status": "failed", "detail": str(e)})
+            raise
+        event_broker.publish(owner_id, "resume.completed", {"resume_id": resume_id, "status": "completed"})
+    
+    async def _save_upload(self, file: UploadFile) -> SavedUpload:
+        """Validate and stream an uploaded resume into file storage"""
+        # Validate file type
+        if not file.filename.lower().endswith(RESUME_EXTENSIONS):
+            raise HTTPException(status_code=400, detail="Only PDF, DOC, and DOCX files are allowed")
+        
+        return await save_upload_file(file, self.storage_namespace)
+    
+    def _apply_analysis(self, resume: Resume, parsed_content: str, analysis: ResumeAnalysis):
+        """Copy parsed text and AI analysis onto a resume record"""
+        resume.content = parsed_content
+        resume.summary = analysis.summary
+        resume.skills = json.dumps(analysis.skills)
+        resume.experience_years = analysis.experience_years
+        resume.education = json.dumps(analysis.education)
     
-    async def get_resume(self, resume_id: int, user_id: int, db: Session) -> ResumeResponse:
+    async def _reuse_duplicate(self, resume: Resume, user_id: int, db: AsyncSession) -> Tuple[bool, Optional[str]]:
+        """Copy content and analysis from an identical resume; returns (reused, orphaned file key)"""
+        duplicate = await find_duplicate(db, Resume, resume.content_hash, user_id, exclude_id=resume.id)
+        if duplicate is None:
+            return False, None
+        return True, await self._copy_duplicate(resume, duplicate)
+    
+    async def _copy_duplicate(self, resume: Resume, duplicate: Resume) -> Optional[str]:
+        """Copy content and analysis from an identical resume; returns the orphaned file key"""
+        resume.content = duplicate.content
+        resume.summary = duplicate.summary
+        resume.skills = duplicate.skills
+        resume.experience_years = duplicate.experience_years
+        resume.education = duplicate.education
+        return await link_stored_file(resume, duplicate)
+    
+    async def get_user_resumes(
+        self, user_id: int, db: AsyncSession, limit: int = LIST_DEFAULT_LIMIT,
+        cursor: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> Tuple[List[ResumeSummary], Optional[int]]:
+        """Get a page of a user's resumes (newest first) and the cursor for the next page"""
+        statement = select(Resume).where(Resume.owner_id == user_id)
+        resumes, next_cursor = await paginate(db, statement, Resume, limit, cursor, fields)
+        return serialize(resumes, ResumeSummary, fields), next_cursor
+    
+    async def search_resumes(
+        self, user_id: int, db: AsyncSession, skills: List[str], match_all: bool = True,
+        min_experience: Optional[float] = None, max_experience: Optional[float] = None,
+        limit: int = LIST_DEFAULT_LIMIT, cursor: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> Tuple[List[ResumeSummary], Optional[int]]:
+        """Page through a user's resumes having all (or any) of the skills within an experience range"""
+        statement = select(Resume).where(Resume.owner_id == user_id)
+        names = normalize_skills(skills)
+        if names:
+            statement = statement.where(Resume.id.in_(resumes_with_skills(user_id, names, match_all)))
+        if min_experience is not None:
+            statement = statement.where(Resume.experience_years >= min_experience)
+        if max_experience is not None:
+            statement = statement.where(Resume.experience_years <= max_experience)
+        
+        resumes, next_cursor = await paginate(db, statement, Resume, limit, cursor, fields)
+        return serialize(resumes, ResumeSummary, fields), next_cursor
+    
+    async def get_resume(self, resume_id: int, user_id: int, db: AsyncSession) -> ResumeResponse:
         """Get a specific resume"""
-        resume = db.query(Resume).filter(
+        resume = await db.scalar(select(Resume).options(
+            joinedload(Resume.content_body), joinedload(Resume.jade_format_body)
+        ).where(
             Resume.id == resume_id,
             Resume.owner_id == user_id
-        ).first()
+        ))
         
         if not resume:
             raise HTTPException(status_code=404, detail="Resume not found")
         
         return ResumeResponse.from_orm(resume)
     
-    async def delete_resume(self, resume_id: int, user_id: int, db: Session) -> bool:
+    async def delete_resume(self, resume_id: int, user_id: int, db: AsyncSession) -> bool:
         """Delete a resume"""
-        resume = db.query(Resume).filter(
+        resume = await db.scalar(select(Resume).where(
             Resume.id == resume_id,
             Resume.owner_id == user_id
-        ).first()
+        ))
         
         if not resume:
             raise HTTPException(status_code=404, detail="Resume not found")
         
-        # Delete file
-        if os.path.exists(resume.file_path):
-            os.remove(resume.file_path)
+        # Delete file unless a deduplicated upload still points at it
+        file_path = resume.file_path
+        shared = await is_file_shared(db, Resume, file_path, resume.id)
         
         # Delete from database
-        db.delete(resume)
-        db.commit()
+        await remove_resume_skills(db, resume.id)
+        await db.delete(resume)
+        await db.commit()
+        event_broker.publish(user_id, "resume.deleted", {"resume_id": resume_id})
+        
+        if not shared:
+            await remove_stored_file(file_path)
         
         return True
 
 # Create service instance
 resume_service = ResumeService()
+ingestion_service.register_processor("resume", resume_service.process_pending_resume)
 
 
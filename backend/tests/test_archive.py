@@ -0,0 +1,61 @@
+import io
+import os
+import zipfile
+import pytest
+from utils.archive import extract_archive
+
+RESUME_TEXT = b"Jane Doe\nSenior engineer, 7 years of Python, AWS and Docker\n" * 200
+
+def build_archive(path: str, members: dict):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+def corrupt_member(path: str, name: str):
+    """Flip bytes in the middle of a member's deflate stream"""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name)
+    with open(path, "rb") as file:
+        data = bytearray(file.read())
+    # Local header: 30 fixed bytes, then the file name and extra field
+    name_length = int.from_bytes(data[info.header_offset + 26:info.header_offset + 28], "little")
+    extra_length = int.from_bytes(data[info.header_offset + 28:info.header_offset + 30], "little")
+    start = info.header_offset + 30 + name_length + extra_length
+    for offset in range(start + info.compress_size // 3, start + info.compress_size // 3 + 8):
+        data[offset] ^= 0xFF
+    with open(path, "wb") as file:
+        file.write(data)
+
+@pytest.fixture
+def staging_dir(tmp_path):
+    path = tmp_path / "staging"
+    path.mkdir()
+    return str(path)
+
+def test_corrupt_member_is_marked_failed(tmp_path, staging_dir):
+    archive_path = str(tmp_path / "resumes.zip")
+    build_archive(archive_path, {"good.txt": RESUME_TEXT, "broken.txt": RESUME_TEXT.upper()})
+    corrupt_member(archive_path, "broken.txt")
+
+    members = {member.original_filename: member for member in extract_archive(archive_path, staging_dir, (".txt",))}
+
+    assert members["good.txt"].rejected is None
+    with open(members["good.txt"].file_path, "rb") as file:
+        assert file.read() == RESUME_TEXT
+    status, detail = members["broken.txt"].rejected
+    assert status == "failed"
+    assert detail.startswith("Could not extract file")
+    assert members["broken.txt"].file_path is None
+    # Only the good member is left in staging
+    assert os.listdir(staging_dir) == [members["good.txt"].filename]
+
+def test_unsupported_members_are_skipped(tmp_path, staging_dir):
+    archive_path = str(tmp_path / "resumes.zip")
+    build_archive(archive_path, {"resume.txt": RESUME_TEXT, "photo.png": b"\x89PNG", "__MACOSX/._resume.txt": b""})
+
+    members = extract_archive(archive_path, staging_dir, (".txt",))
+
+    assert [(member.original_filename, member.rejected) for member in members] == [
+        ("resume.txt", None),
+        ("photo.png", ("skipped", "Unsupported file type")),
+    ]
@@ -1,26 +1,164 @@
+import asyncio
+import hashlib
 import json
+import random
 import re
-from typing import List, Dict, Any
-from openai import OpenAI
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from openai import APIConnectionError, RateLimitError, InternalServerError
 import os
 from dotenv import load_dotenv
 from models import Resume, JobDescription
 from schemas import ResumeAnalysis, JDAnalysis, MatchAnalysis
+from utils.analysis_cache import analysis_cache
+from utils.llm_backends import LLMBackend, LLM_DEFAULT_TIMEOUT, create_backend
+from utils.metrics import track_stage, llm_requests, llm_errors, llm_retries, llm_tokens, llm_fallbacks, llm_in_flight
+from utils.token_budget import count_tokens, get_token_budget, plan_chunks, truncate_to_budget, token_metrics
 
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Bump a version whenever its prompt changes so cached results are not reused
+PROMPT_VERSIONS = {
+    "resume_analysis": "1",
+    "jd_analysis": "1",
+    "match": "1",
+}
+
+# Maximum number of LLM calls in flight per worker
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+
+# Retry policy (exponential backoff with full jitter)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 8))
+
+# Per-operation request timeouts in seconds
+LLM_TIMEOUTS = {
+    "resume_analysis": float(os.getenv("LLM_TIMEOUT_RESUME", LLM_DEFAULT_TIMEOUT)),
+    "jd_analysis": float(os.getenv("LLM_TIMEOUT_JD", LLM_DEFAULT_TIMEOUT)),
+    "match": float(os.getenv("LLM_TIMEOUT_MATCH", LLM_DEFAULT_TIMEOUT)),
+    "jade_conversion": float(os.getenv("LLM_TIMEOUT_JADE", 90)),
+}
+
+# Errors worth retrying (APITimeoutError is a subclass of APIConnectionError)
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
 
 class AIAnalyzer:
-    def __init__(self):
-        self.client = client
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        self.backend = backend or create_backend()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Global limit on concurrent LLM calls, created lazily inside the running loop"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        return self._semaphore
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+    
+    async def _complete(self, prompt: str, operation: str) -> str:
+        """Run a chat completion with a concurrency limit, timeout and jittered retries"""
+        timeout = LLM_TIMEOUTS.get(operation, LLM_DEFAULT_TIMEOUT)
+        self._record_prompt(prompt, operation)
+        attempt = 0
+        with track_stage("llm"):
+            while True:
+                try:
+                    async with self.semaphore:
+                        llm_requests.labels(operation).inc()
+                        with llm_in_flight.track_inprogress():
+                            response_text = await self.backend.complete(prompt, operation, timeout)
+                    llm_tokens.labels(operation, "completion").inc(count_tokens(response_text or ""))
+                    return response_text
+                except Exception as e:
+                    llm_errors.labels(operation, type(e).__name__).inc()
+                    if not isinstance(e, RETRYABLE_ERRORS) or attempt >= LLM_MAX_RETRIES:
+                        raise
+                # Back off outside the semaphore so waiting calls can proceed
+                llm_retries.labels(operation).inc()
+                await asyncio.sleep(self._retry_delay(attempt))
+                attempt += 1
+    
+    async def _stream_complete(self, prompt: str, operation: str) -> AsyncIterator[str]:
+        """Stream a chat completion's text deltas; retries only until the first delta has been yielded"""
+        timeout = LLM_TIMEOUTS.get(operation, LLM_DEFAULT_TIMEOUT)
+        self._record_prompt(prompt, operation)
+        attempt = 0
+        with track_stage("llm"):
+            while True:
+                deltas = []
+                try:
+                    async with self.semaphore:
+                        llm_requests.labels(operation).inc()
+                        with llm_in_flight.track_inprogress():
+                            async for delta in self.backend.stream(prompt, operation, timeout):
+                                deltas.append(delta)
+                                yield delta
+                    llm_tokens.labels(operation, "completion").inc(count_tokens("".join(deltas)))
+                    return
+                except Exception as e:
+                    llm_errors.labels(operation, type(e).__name__).inc()
+                    if not isinstance(e, RETRYABLE_ERRORS) or deltas or attempt >= LLM_MAX_RETRIES:
+                        raise
+                llm_retries.labels(operation).inc()
+                await asyncio.sleep(self._retry_delay(attempt))
+                attempt += 1
+    
+    def _record_prompt(self, prompt: str, operation: str):
+        sent = count_tokens(prompt)
+        token_metrics.record(operation, sent=sent, calls=1)
+        llm_tokens.labels(operation, "prompt").inc(sent)
+    
+    async def aclose(self):
+        """Release the backend's connections"""
+        await self.backend.aclose()
     
     async def analyze_resume_content(self, content: str) -> ResumeAnalysis:
         """Analyze resume content and extract structured information"""
-        try:
-            prompt = f"""
+        cache_key = analysis_cache.make_key(
+            "resume_analysis", content, self.backend.identity, PROMPT_VERSIONS["resume_analysis"]
+        )
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            return ResumeAnalysis(**cached)
+        
+        # Map: analyze each chunk of a long resume in parallel
+        chunks = await self._plan_chunks(content, "resume_analysis")
+        results = await asyncio.gather(
+            *(self._analyze_resume_chunk(chunk, part, len(chunks)) for part, chunk in enumerate(chunks, 1)),
+            return_exceptions=True
+        )
+        partials = [result for result in results if isinstance(result, ResumeAnalysis)]
+        if not partials:
+            # Fallback analysis if AI fails (not cached, so the next upload retries the LLM)
+            return self._fallback_resume_analysis(content)
+        
+        # Reduce: merge the partial analyses
+        analysis = partials[0] if len(partials) == 1 else self._merge_resume_analyses(partials)
+        
+        # Only cache complete analyses
+        if len(partials) == len(chunks):
+            await analysis_cache.set(cache_key, "resume_analysis", analysis.model_dump())
+        return analysis
+    
+    async def _plan_chunks(self, content: str, operation: str) -> List[str]:
+        """Split a document to the operation's token budget, recording what had to be dropped"""
+        chunks, dropped = await asyncio.to_thread(plan_chunks, content, operation)
+        token_metrics.record(operation, truncated=dropped, chunks=len(chunks))
+        return chunks
+    
+    def _part_note(self, part: int, parts: int, document: str) -> str:
+        if parts == 1:
+            return ""
+        return f"This is part {part} of {parts} of a longer {document}; extract only what this part contains."
+    
+    async def _analyze_resume_chunk(self, content: str, part: int, parts: int) -> ResumeAnalysis:
+        """Analyze one chunk of a resume"""
+        prompt = f"""
             Analyze the following resume content and extract structured information:
+            {self._part_note(part, parts, "resume")}
             
             Resume Content:
             {content}
@@ -37,25 +175,71 @@ class AIAnalyzer:
             
             Extract skills from the resume, calculate total years of experience, identify education details, and create a professional summary.
             """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            return ResumeAnalysis(**result)
-            
-        except Exception as e:
-            # Fallback analysis if AI fails
-            return self._fallback_resume_analysis(content)
+        
+        response_text = await self._complete(prompt, "resume_analysis")
+        return ResumeAnalysis(**json.loads(response_text))
+    
+    def _merge_resume_analyses(self, partials: List[ResumeAnalysis]) -> ResumeAnalysis:
+        """Combine per-chunk resume analyses into one"""
+        education = []
+        seen_education = set()
+        for partial in partials:
+            for entry in partial.education:
+                key = json.dumps(entry, sort_keys=True).lower()
+                if key not in seen_education:
+                    seen_education.add(key)
+                    education.append(entry)
+        
+        return ResumeAnalysis(
+            skills=self._merge_lists(partial.skills for partial in partials),
+            # Each chunk only sees part of the work history, so take the widest span found
+            experience_years=max(partial.experience_years for partial in partials),
+            education=education,
+            # The profile summary sits at the top of a resume, i.e. in the first chunk
+            summary=partials[0].summary
+        )
+    
+    def _merge_lists(self, lists) -> List[str]:
+        """Concatenate lists, dropping case-insensitive duplicates and keeping first-seen order"""
+        merged = {}
+        for items in lists:
+            for item in items:
+                merged.setdefault(item.strip().lower(), item.strip())
+        return [item for item in merged.values() if item]
     
     async def analyze_jd_content(self, content: str) -> JDAnalysis:
         """Analyze job description content and extract structured information"""
-        try:
-            prompt = f"""
+        cache_key = analysis_cache.make_key(
+            "jd_analysis", content, self.backend.identity, PROMPT_VERSIONS["jd_analysis"]
+        )
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            return JDAnalysis(**cached)
+        
+        # Map: analyze each chunk of a long job description in parallel
+        chunks = await self._plan_chunks(content, "jd_analysis")
+        results = await asyncio.gather(
+            *(self._analyze_jd_chunk(chunk, part, len(chunks)) for part, chunk in enumerate(chunks, 1)),
+            return_exceptions=True
+        )
+        partials = [result for result in results if isinstance(result, JDAnalysis)]
+        if not partials:
+            # Fallback analysis if AI fails (not cached, so the next upload retries the LLM)
+            return self._fallback_jd_analysis(content)
+        
+        # Reduce: merge the partial analyses
+        analysis = partials[0] if len(partials) == 1 else self._merge_jd_analyses(partials)
+        
+        # Only cache complete analyses
+        if len(partials) == len(chunks):
+            await analysis_cache.set(cache_key, "jd_analysis", analysis.model_dump())
+        return analysis
+    
+    async def _analyze_jd_chunk(self, content: str, part: int, parts: int) -> JDAnalysis:
+        """Analyze one chunk of a job description"""
+        prompt = f"""
             Analyze the following job description and extract structured information:
+            {self._part_note(part, parts, "job description")}
             
             Job Description:
             {content}
@@ -73,22 +257,56 @@ class AIAnalyzer:
             
             Extract the job title, company, location, required and preferred skills, years of experience required, and education requirements.
             """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            return JDAnalysis(**result)
-            
-        except Exception as e:
-            # Fallback analysis if AI fails
-            return self._fallback_jd_analysis(content)
+        
+        response_text = await self._complete(prompt, "jd_analysis")
+        return JDAnalysis(**json.loads(response_text))
+    
+    def _merge_jd_analyses(self, partials: List[JDAnalysis]) -> JDAnalysis:
+        """Combine per-chunk job description analyses into one"""
+        def first(field: str) -> str:
+            # Later chunks often repeat placeholders such as "Unknown"; prefer the first real value
+            for partial in partials:
+                value = getattr(partial, field).strip()
+                if value and not value.lower().startswith(("unknown", "not specified", "n/a")):
+                    return value
+            return getattr(partials[0], field)
+        
+        required_skills = self._merge_lists(partial.required_skills for partial in partials)
+        required = {skill.lower() for skill in required_skills}
+        preferred_skills = [
+            skill for skill in self._merge_lists(partial.preferred_skills for partial in partials)
+            if skill.lower() not in required
+        ]
+        
+        return JDAnalysis(
+            title=first("title"),
+            company=first("company"),
+            location=first("location"),
+            required_skills=required_skills,
+            preferred_skills=preferred_skills,
+            experience_required=max(partial.experience_required for partial in partials),
+            education_required=first("education_required")
+        )
+    
+    def match_key(self, resume: Resume, jd: JobDescription) -> Optional[str]:
+        """Memoization key for a resume/JD pair: content hashes, model and prompt version.
+        None when either document has no content hash or has not finished processing."""
+        documents = (resume, jd)
+        if any(not doc.content_hash or doc.processing_status != "completed" for doc in documents):
+            return None
+        digest = hashlib.sha256()
+        for part in ("match", self.backend.identity, PROMPT_VERSIONS["match"], resume.content_hash, jd.content_hash):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
     
     async def match_resume_jd(self, resume: Resume, jd: JobDescription) -> MatchAnalysis:
         """Match resume against job description and provide analysis"""
+        analysis, _ = await self.score_match(resume, jd)
+        return analysis
+    
+    async def score_match(self, resume: Resume, jd: JobDescription) -> Tuple[MatchAnalysis, bool]:
+        """Match resume against job description, returning (analysis, True if the model produced it)"""
         try:
             resume_skills = json.loads(resume.skills) if resume.skills else []
             jd_required_skills = json.loads(jd.required_skills) if jd.required_skills else []
@@ -124,51 +342,116 @@ class AIAnalyzer:
             Calculate percentage matches for different aspects and provide constructive feedback.
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
+            response_text = await self._complete(prompt, "match")
             
-            result = json.loads(response.choices[0].message.content)
-            return MatchAnalysis(**result)
+            result = json.loads(response_text)
+            return MatchAnalysis(**result), True
             
         except Exception as e:
             # Fallback matching if AI fails
-            return self._fallback_match_analysis(resume, jd)
+            return self._fallback_match_analysis(resume, jd), False
     
     async def convert_to_jade_format(self, resume: Resume, jade_template: 'JadeTemplate') -> str:
         """Convert resume to Jade format using AI"""
         try:
-            prompt = f"""
+            # Convert the sections of a long resume in parallel and join them in order
+            prompts = await self._jade_prompts(resume, jade_template)
+            sections = await asyncio.gather(
+                *(self._complete(prompt, "jade_conversion") for prompt in prompts)
+            )
+            return "\n\n".join(section.strip() for section in sections)
+            
+        except Exception as e:
+            # Fallback conversion if AI fails
+            return self._fallback_jade_conversion(resume, jade_template)
+    
+    async def stream_jade_format(self, resume: Resume, jade_template: 'JadeTemplate') -> AsyncIterator[str]:
+        """Yield the Jade conversion of a resume as text deltas while the model generates it"""
+        yielded = False
+        try:
+            async for delta in self._stream_jade_sections(resume, jade_template):
+                yielded = True
+                yield delta
+        except Exception:
+            # Nothing sent yet: fall back like convert_to_jade_format; otherwise the partial text is unusable
+            if yielded:
+                raise
+            yield self._fallback_jade_conversion(resume, jade_template)
+    
+    async def _stream_jade_sections(self, resume: Resume, jade_template: 'JadeTemplate') -> AsyncIterator[str]:
+        prompts = await self._jade_prompts(resume, jade_template)
+        
+        # Every section generates concurrently; section 1 is relayed live while the rest buffer
+        queues = [asyncio.Queue() for _ in prompts]
+        done = object()
+        
+        async def generate(prompt: str, queue: asyncio.Queue):
+            try:
+                async for delta in self._stream_complete(prompt, "jade_conversion"):
+                    queue.put_nowait(delta)
+            except Exception as e:
+                queue.put_nowait(e)
+            else:
+                queue.put_nowait(done)
+        
+        tasks = [asyncio.create_task(generate(prompt, queue)) for prompt, queue in zip(prompts, queues)]
+        try:
+            for index, queue in enumerate(queues):
+                if index:
+                    yield "\n\n"
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _jade_prompts(self, resume: Resume, jade_template: 'JadeTemplate') -> List[str]:
+        """Build one conversion prompt per resume section, within the token budgets"""
+        template, template_dropped = truncate_to_budget(
+            jade_template.content, get_token_budget("jade_template")
+        )
+        token_metrics.record("jade_conversion", truncated=template_dropped)
+        
+        chunks = await self._plan_chunks(resume.content, "jade_conversion")
+        return [
+            self._jade_prompt(chunk, part, len(chunks), resume.summary, template)
+            for part, chunk in enumerate(chunks, 1)
+        ]
+    
+    def _jade_prompt(self, content: str, part: int, parts: int, summary: str, template: str) -> str:
+        """Conversion prompt for one section of a resume"""
+        continuation = ""
+        if parts > 1:
+            continuation = (
+                f"This is part {part} of {parts} of the resume. Convert only this part"
+                + (" and do not repeat the header sections." if part > 1 else ".")
+            )
+        
+        return f"""
             Convert the following resume to Jade format using the provided template:
+            {continuation}
             
             Resume Content:
-            {resume.content}
+            {content}
             
             Resume Summary:
-            {resume.summary}
+            {summary}
             
             Jade Template:
-            {jade_template.content}
+            {template}
             
             Please convert the resume content to match the Jade format structure while preserving all important information from the original resume.
             """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            # Fallback conversion if AI fails
-            return self._fallback_jade_conversion(resume, jade_template)
     
     def _fallback_resume_analysis(self, content: str) -> ResumeAnalysis:
         """Fallback resume analysis using regex patterns"""
+        llm_fallbacks.labels("resume_analysis").inc()
         # Extract skills using common patterns
         skills = []
         skill_patterns = [
@@ -207,6 +490,7 @@ class AIAnalyzer:
     
     def _fallback_jd_analysis(self, content: str) -> JDAnalysis:
         """Fallback JD analysis using regex patterns"""
+        llm_fallbacks.labels("jd_analysis").inc()
         # Extract job title
         title_pattern = r'(?:position|role|job):\s*([A-Za-z\s]+)'
         title_match = re.search(title_pattern, content, re.IGNORECASE)
@@ -250,6 +534,7 @@ class AIAnalyzer:
     
     def _fallback_match_analysis(self, resume: Resume, jd: JobDescription) -> MatchAnalysis:
         """Fallback matching analysis"""
+        llm_fallbacks.labels("match").inc()
         resume_skills = json.loads(resume.skills) if resume.skills else []
         jd_required_skills = json.loads(jd.required_skills) if jd.required_skills else []
         
@@ -276,6 +561,7 @@ class AIAnalyzer:
     
     def _fallback_jade_conversion(self, resume: Resume, jade_template: 'JadeTemplate') -> str:
         """Fallback Jade conversion"""
+        llm_fallbacks.labels("jade_conversion").inc()
         return f"""
 JADE FORMAT RESUME
 ==================
@@ -305,7 +591,19 @@ async def analyze_jd_content(content: str) -> JDAnalysis:
 async def match_resume_jd(resume: Resume, jd: JobDescription) -> MatchAnalysis:
     return await ai_analyzer.match_resume_jd(resume, jd)
 
+async def score_match(resume: Resume, jd: JobDescription) -> Tuple[MatchAnalysis, bool]:
+    return await ai_analyzer.score_match(resume, jd)
+
+def match_key(resume: Resume, jd: JobDescription) -> Optional[str]:
+    return ai_analyzer.match_key(resume, jd)
+
 async def convert_to_jade_format(resume: Resume, jade_template: 'JadeTemplate') -> str:
     return await ai_analyzer.convert_to_jade_format(resume, jade_template)
 
+def stream_jade_format(resume: Resume, jade_template: 'JadeTemplate') -> AsyncIterator[str]:
+    return ai_analyzer.stream_jade_format(resume, jade_template)
+
+async def close_ai_analyzer():
+    await ai_analyzer.aclose()
+
 
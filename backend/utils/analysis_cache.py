@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from database import SessionLocal
+from models import AnalysisCacheEntry
+
+load_dotenv()
+
+# Cache configuration
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "True").lower() == "true"
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 1024))
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+ANALYSIS_CACHE_PERSISTENT = os.getenv("ANALYSIS_CACHE_PERSISTENT", "True").lower() == "true"
+ANALYSIS_CACHE_PERSISTENT_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_PERSISTENT_MAX_ENTRIES", 100000))
+
+# Prune the persistent tier every N writes rather than on every write
+PERSISTENT_PRUNE_INTERVAL = 100
+
+class AnalysisCache:
+    """Two-tier (in-process LRU + database) cache for LLM analysis results"""
+
+    def __init__(
+        self,
+        enabled: bool = ANALYSIS_CACHE_ENABLED,
+        max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = ANALYSIS_CACHE_TTL_SECONDS,
+        persistent: bool = ANALYSIS_CACHE_PERSISTENT,
+        persistent_max_entries: int = ANALYSIS_CACHE_PERSISTENT_MAX_ENTRIES
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self.persistent_max_entries = persistent_max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self._stats = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def make_key(kind: str, text: str, model: str, prompt_version: str) -> str:
+        """Build a content-addressed key from the parsed text, model and prompt version"""
+        digest = hashlib.sha256()
+        for part in (kind, model, prompt_version, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached result, checking memory first and then the database"""
+        if not self.enabled:
+            return None
+
+        value = self._memory_get(key)
+        if value is not None:
+            self._incr("memory_hits")
+            return value
+
+        if self.persistent:
+            entry = await asyncio.to_thread(self._persistent_get, key)
+            if entry is not None:
+                expires_at, value = entry
+                self._memory_set(key, value, expires_at)
+                self._incr("persistent_hits")
+                return value
+
+        self._incr("misses")
+        return None
+
+    async def set(self, key: str, kind: str, value: Dict[str, Any]):
+        """Store a result in both tiers"""
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        self._memory_set(key, value, expires_at)
+        self._incr("sets")
+
+        if self.persistent:
+            await asyncio.to_thread(self._persistent_set, key, kind, value, expires_at)
+
+    def clear(self):
+        """Drop all in-process entries"""
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["persistent_hits"]) / lookups if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["persistent"] = self.persistent
+        return stats
+
+    def _incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def _memory_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._memory[key]
+                self._stats["expirations"] += 1
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: Dict[str, Any], expires_at: Optional[float]):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _persistent_get(self, key: str) -> Optional[tuple]:
+        db = SessionLocal()
+        try:
+            entry = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+            if entry is None:
+                return None
+            if entry.expires_at is not None and entry.expires_at <= time.time():
+                db.delete(entry)
+                db.commit()
+                self._incr("expirations")
+                return None
+            return entry.expires_at, json.loads(entry.result)
+        except (SQLAlchemyError, ValueError):
+            db.rollback()
+            self._incr("errors")
+            return None
+        finally:
+            db.close()
+
+    def _persistent_set(self, key: str, kind: str, value: Dict[str, Any], expires_at: Optional[float]):
+        db = SessionLocal()
+        try:
+            entry = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+            if entry is None:
+                entry = AnalysisCacheEntry(cache_key=key, kind=kind)
+                db.add(entry)
+            entry.result = json.dumps(value)
+            entry.created_at = time.time()
+            entry.expires_at = expires_at
+            db.commit()
+
+            with self._lock:
+                self._writes_since_prune += 1
+                should_prune = self._writes_since_prune >= PERSISTENT_PRUNE_INTERVAL
+                if should_prune:
+                    self._writes_since_prune = 0
+            if should_prune:
+                self._prune_persistent(db)
+        except SQLAlchemyError:
+            db.rollback()
+            self._incr("errors")
+        finally:
+            db.close()
+
+    def _prune_persistent(self, db):
+        """Remove expired rows and trim the table to its maximum size (oldest first)"""
+        expired = db.query(AnalysisCacheEntry).filter(
+            AnalysisCacheEntry.expires_at != None,
+            AnalysisCacheEntry.expires_at <= time.time()
+        ).delete(synchronize_session=False)
+
+        evicted = 0
+        overflow = db.query(AnalysisCacheEntry).count() - self.persistent_max_entries
+        if overflow > 0:
+            oldest_ids = select(AnalysisCacheEntry.id).order_by(
+                AnalysisCacheEntry.created_at.asc()
+            ).limit(overflow)
+            evicted = db.query(AnalysisCacheEntry).filter(
+                AnalysisCacheEntry.id.in_(oldest_ids)
+            ).delete(synchronize_session=False)
+
+        db.commit()
+        self._incr("expirations", expired)
+        self._incr("evictions", evicted)
+
+# Create cache instance
+analysis_cache = AnalysisCache()
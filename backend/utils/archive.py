@@ -0,0 +1,129 @@
+import hashlib
+import os
+import uuid
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from utils.metrics import track_stage
+from utils.upload_handler import UPLOAD_CHUNK_SIZE, MAX_UPLOAD_SIZE
+
+load_dotenv()
+
+# Limits for uploaded archives; sizes are checked against the bytes actually decompressed, not the headers
+MAX_ARCHIVE_SIZE = int(os.getenv("MAX_ARCHIVE_SIZE", 200 * 1024 * 1024))
+ARCHIVE_MAX_FILES = int(os.getenv("ARCHIVE_MAX_FILES", 500))
+ARCHIVE_MAX_TOTAL_SIZE = int(os.getenv("ARCHIVE_MAX_TOTAL_SIZE", 1024 * 1024 * 1024))
+ARCHIVE_MAX_MEMBER_SIZE = int(os.getenv("ARCHIVE_MAX_MEMBER_SIZE", MAX_UPLOAD_SIZE))
+ARCHIVE_MAX_COMPRESSION_RATIO = float(os.getenv("ARCHIVE_MAX_COMPRESSION_RATIO", 100))
+
+# Members smaller than this are never rejected for their compression ratio (tiny files compress well)
+RATIO_CHECK_MIN_SIZE = 1024 * 1024
+
+@dataclass
+class ExtractedMember:
+    original_filename: str
+    filename: Optional[str] = None
+    file_path: Optional[str] = None
+    size: int = 0
+    sha256: Optional[str] = None
+    # Set when the member was not extracted: (manifest status, reason)
+    rejected: Optional[Tuple[str, str]] = None
+
+class MemberTooLarge(Exception):
+    pass
+
+def _is_ignored(info: zipfile.ZipInfo) -> bool:
+    """Directories and OS metadata (macOS resource forks, hidden files) are not documents"""
+    name = info.filename.replace("\\", "/")
+    base = os.path.basename(name)
+    return info.is_dir() or name.startswith("__MACOSX/") or not base or base.startswith(".")
+
+def _copy_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, file_path: str, remaining: int) -> Tuple[int, str]:
+    """Decompress one member in chunks, enforcing the size and ratio limits as bytes arrive"""
+    limit = min(ARCHIVE_MAX_MEMBER_SIZE, remaining)
+    max_ratio_size = max(info.compress_size * ARCHIVE_MAX_COMPRESSION_RATIO, RATIO_CHECK_MIN_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with archive.open(info) as source, open(file_path, "wb") as buffer:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise MemberTooLarge("exceeds the archive size limits")
+                if size > max_ratio_size:
+                    raise MemberTooLarge(f"compression ratio above {ARCHIVE_MAX_COMPRESSION_RATIO:g}")
+                digest.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return size, digest.hexdigest()
+
+def extract_archive(archive_path: str, staging_dir: str, extensions: Tuple[str, ...]) -> List[ExtractedMember]:
+    """Extract the documents of a ZIP archive one member at a time under generated names
+
+    Member paths are never used on disk, so traversal entries ("../x") cannot escape staging_dir.
+    The caller moves the extracted files into file storage.
+    Raises HTTPException for archives that are invalid or exceed the limits as a whole.
+    """
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except (zipfile.BadZipFile, OSError):
+        raise HTTPException(status_code=400, detail="Not a valid ZIP archive")
+
+    members: List[ExtractedMember] = []
+    total = 0
+    with archive, track_stage("upload"):
+        infos = [info for info in archive.infolist() if not _is_ignored(info)]
+        if len(infos) > ARCHIVE_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"Archive contains more than {ARCHIVE_MAX_FILES} files")
+        # Headers can lie, but an archive declaring too much is rejected before any work
+        if sum(info.file_size for info in infos) > ARCHIVE_MAX_TOTAL_SIZE:
+            raise HTTPException(
+                status_code=413, detail=f"Archive expands beyond the maximum of {ARCHIVE_MAX_TOTAL_SIZE} bytes"
+            )
+
+        try:
+            for info in infos:
+                member = ExtractedMember(original_filename=os.path.basename(info.filename.replace("\\", "/")))
+                members.append(member)
+                extension = os.path.splitext(member.original_filename)[1].lower()
+                if extension not in extensions:
+                    member.rejected = ("skipped", "Unsupported file type")
+                    continue
+                if info.flag_bits & 0x1:
+                    member.rejected = ("skipped", "Encrypted file")
+                    continue
+
+                filename = f"{uuid.uuid4()}{extension}"
+                file_path = os.path.join(staging_dir, filename)
+                try:
+                    size, sha256 = _copy_member(archive, info, file_path, ARCHIVE_MAX_TOTAL_SIZE - total)
+                except MemberTooLarge as e:
+                    member.rejected = ("failed", f"File {e}")
+                    continue
+                except (
+                    zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, OSError, EOFError, zlib.error
+                ) as e:
+                    member.rejected = ("failed", f"Could not extract file: {e}")
+                    continue
+
+                total += size
+                member.filename = filename
+                member.file_path = file_path
+                member.size = size
+                member.sha256 = sha256
+        except BaseException:
+            # The caller never sees the member list, so nothing else would remove these
+            for member in members:
+                if member.file_path and os.path.exists(member.file_path):
+                    os.remove(member.file_path)
+            raise
+    return members
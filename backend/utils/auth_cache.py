@@ -0,0 +1,131 @@
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from jose import JWTError, jwt
+from models import User
+
+load_dotenv()
+
+# Cache configuration
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "True").lower() == "true"
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+# A user deactivated or changed on one node is invalidated there only: other workers and nodes keep
+# accepting that user's tokens until their entries expire, so the TTL bounds how long that can last
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+
+# User columns kept in the cache (never the password hash)
+CACHED_USER_FIELDS = ("id", "email", "username", "is_active", "created_at")
+
+class AuthCache:
+    """In-process TTL cache of verified tokens and the identity of the user they belong to"""
+
+    def __init__(
+        self,
+        enabled: bool = AUTH_CACHE_ENABLED,
+        max_entries: int = AUTH_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = AUTH_CACHE_TTL_SECONDS
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # (user_id, signature) -> (expires_at, signing_input, user fields)
+        self._entries: "OrderedDict[Tuple[int, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def _split_token(token: str) -> Optional[Tuple[int, str, str]]:
+        """Return (user_id, signing input, signature) without verifying the token"""
+        try:
+            user_id = int(jwt.get_unverified_claims(token)["sub"])
+        except (JWTError, KeyError, TypeError, ValueError):
+            return None
+        signing_input, _, signature = token.rpartition(".")
+        return user_id, signing_input, signature
+
+    def get(self, token: str) -> Optional[User]:
+        """Return a detached User for a token verified earlier, or None"""
+        if not self.enabled:
+            return None
+
+        parts = self._split_token(token)
+        if parts is None:
+            return None
+        user_id, signing_input, signature = parts
+
+        with self._lock:
+            entry = self._entries.get((user_id, signature))
+            # The header and claims must be exactly those that were verified with this signature
+            if entry is None or not hmac.compare_digest(entry[1], signing_input):
+                self._stats["misses"] += 1
+                return None
+            expires_at, _, fields = entry
+            if expires_at <= time.time():
+                del self._entries[(user_id, signature)]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end((user_id, signature))
+            self._stats["hits"] += 1
+
+        return User(**fields)
+
+    def set(self, token: str, user: User, token_expires_at: Optional[float] = None):
+        """Remember a verified token; the entry never outlives the token itself"""
+        if not self.enabled:
+            return
+
+        parts = self._split_token(token)
+        if parts is None:
+            return
+        user_id, signing_input, signature = parts
+
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        fields = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+
+        with self._lock:
+            self._entries[(user_id, signature)] = (expires_at, signing_input, fields)
+            self._entries.move_to_end((user_id, signature))
+            self._stats["sets"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user (deactivation, password change, deletion)"""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == user_id]
+            for key in keys:
+                del self._entries[key]
+            self._stats["invalidations"] += len(keys)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+# Create cache instance
+auth_cache = AuthCache()
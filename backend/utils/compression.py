@@ -0,0 +1,58 @@
+import os
+import zlib
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # Only zlib (and uncompressed) bodies can be written and read
+    zstandard = None
+
+load_dotenv()
+
+# Codec for newly written text bodies: "zlib", "zstd" (needs the zstandard package) or "none"
+TEXT_COMPRESSION = os.getenv("TEXT_COMPRESSION", "zlib").lower()
+TEXT_COMPRESSION_LEVEL = int(os.getenv("TEXT_COMPRESSION_LEVEL", 6))
+# Bodies smaller than this are stored as is; compression does not pay off for a few hundred bytes
+TEXT_COMPRESSION_MIN_SIZE = int(os.getenv("TEXT_COMPRESSION_MIN_SIZE", 256))
+
+# One-byte codec marker in front of every stored body, so bodies written with any setting stay readable
+RAW, ZLIB, ZSTD = b"r", b"z", b"s"
+
+if TEXT_COMPRESSION == "zstd" and zstandard is None:
+    raise RuntimeError("TEXT_COMPRESSION=zstd requires the zstandard package")
+if TEXT_COMPRESSION not in ("zlib", "zstd", "none"):
+    raise RuntimeError(f"Unknown TEXT_COMPRESSION: {TEXT_COMPRESSION}")
+
+def compress_text(text: str) -> bytes:
+    data = text.encode("utf-8")
+    if TEXT_COMPRESSION == "none" or len(data) < TEXT_COMPRESSION_MIN_SIZE:
+        return RAW + data
+    if TEXT_COMPRESSION == "zstd":
+        return ZSTD + zstandard.ZstdCompressor(level=TEXT_COMPRESSION_LEVEL).compress(data)
+    return ZLIB + zlib.compress(data, TEXT_COMPRESSION_LEVEL)
+
+def decompress_text(value: bytes) -> str:
+    codec, data = value[:1], value[1:]
+    if codec == ZLIB:
+        data = zlib.decompress(data)
+    elif codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Reading zstd-compressed text requires the zstandard package")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec != RAW:
+        raise ValueError(f"Unknown text codec marker: {codec!r}")
+    return data.decode("utf-8")
+
+class CompressedText(TypeDecorator):
+    """Text column stored as compressed bytes; compression happens on write, decompression on load"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[bytes]:
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value: Optional[bytes], dialect) -> Optional[str]:
+        return None if value is None else decompress_text(bytes(value))
@@ -0,0 +1,76 @@
+import os
+from typing import Dict, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from utils.storage import file_storage
+
+load_dotenv()
+
+# Deduplication scope: "owner" (only the uploader's own files), "global" or "off"
+UPLOAD_DEDUP_SCOPE = os.getenv("UPLOAD_DEDUP_SCOPE", "owner").lower()
+# Point duplicates at the already stored file instead of keeping a second copy
+UPLOAD_DEDUP_LINK_FILES = os.getenv("UPLOAD_DEDUP_LINK_FILES", "True").lower() == "true"
+
+async def find_duplicate(
+    db: AsyncSession, model, content_hash: Optional[str], user_id: int, exclude_id: Optional[int] = None
+):
+    """Find an already processed row of `model` (content loaded) with the same content hash"""
+    if UPLOAD_DEDUP_SCOPE == "off" or not content_hash:
+        return None
+
+    statement = select(model).options(joinedload(model.content_body)).where(model.content_hash == content_hash)
+    if UPLOAD_DEDUP_SCOPE != "global":
+        statement = statement.where(model.owner_id == user_id)
+    if exclude_id is not None:
+        statement = statement.where(model.id != exclude_id)
+    if hasattr(model, "processing_status"):
+        statement = statement.where(model.processing_status == "completed")
+
+    return (await db.scalars(statement.order_by(model.id).limit(1))).first()
+
+async def find_duplicates(db: AsyncSession, model, content_hashes: Iterable[str], user_id: int) -> Dict[str, object]:
+    """find_duplicate for many hashes in one query: {content hash: earliest processed row}"""
+    hashes = list(dict.fromkeys(filter(None, content_hashes)))
+    if UPLOAD_DEDUP_SCOPE == "off" or not hashes:
+        return {}
+
+    statement = select(model).options(joinedload(model.content_body)).where(model.content_hash.in_(hashes))
+    if UPLOAD_DEDUP_SCOPE != "global":
+        statement = statement.where(model.owner_id == user_id)
+    if hasattr(model, "processing_status"):
+        statement = statement.where(model.processing_status == "completed")
+
+    duplicates = {}
+    for row in (await db.scalars(statement.order_by(model.id))).all():
+        duplicates.setdefault(row.content_hash, row)
+    return duplicates
+
+async def link_stored_file(record, duplicate) -> Optional[str]:
+    """Point `record` at the duplicate's stored file; returns the now-orphaned key to delete after commit"""
+    if not UPLOAD_DEDUP_LINK_FILES or record.file_path == duplicate.file_path:
+        return None
+    if not await file_storage.exists(duplicate.file_path):
+        return None
+
+    orphaned_path = record.file_path
+    record.filename = duplicate.filename
+    record.file_path = duplicate.file_path
+    return orphaned_path
+
+async def is_file_shared(db: AsyncSession, model, file_path: str, exclude_id: int) -> bool:
+    """Whether another row of `model` still references the stored file"""
+    return await db.scalar(
+        select(model.id).where(model.file_path == file_path, model.id != exclude_id).limit(1)
+    ) is not None
+
+def remove_file(file_path: Optional[str]):
+    """Remove a local (staged) file"""
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+
+async def remove_stored_file(key: Optional[str]):
+    """Remove a file from file storage"""
+    if key:
+        await file_storage.delete(key)
@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+from dotenv import load_dotenv
+from utils.sse import format_event
+
+load_dotenv()
+
+# Events kept per user so a reconnecting client can catch up from its Last-Event-ID
+EVENT_STREAM_HISTORY = int(os.getenv("EVENT_STREAM_HISTORY", 100))
+# Undelivered events per connection before a slow client is disconnected (it reconnects and replays)
+EVENT_STREAM_QUEUE_SIZE = int(os.getenv("EVENT_STREAM_QUEUE_SIZE", 256))
+
+# (event id, event name, payload)
+Event = Tuple[int, str, Dict[str, Any]]
+
+class _Subscriber:
+    """One open event stream: a queue owned by the event loop that serves the connection"""
+
+    def __init__(self, queue_size: int):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, item: Optional[Event]):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(item)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._put, item)
+
+    def _put(self, item: Optional[Event]):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too far behind: end the stream; the client resumes from the history on reconnect
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+class EventBroker:
+    """In-process publish/subscribe of per-user lifecycle events
+
+    Events reach only the streams open in the publishing process. With several uvicorn workers or app
+    nodes, a background job claimed by one worker publishes there, and a client streaming from another
+    worker never sees those events, and nothing reports them missing. Deployments relying on /events
+    run a single process.
+    """
+
+    def __init__(self, history: int = EVENT_STREAM_HISTORY, queue_size: int = EVENT_STREAM_QUEUE_SIZE):
+        self.history = history
+        self.queue_size = queue_size
+        # Ids start from the clock so they keep increasing across restarts (clients resume by Last-Event-ID)
+        self._ids = itertools.count(int(time.time() * 1000))
+        self._subscribers: Dict[int, Set[_Subscriber]] = {}
+        self._history: Dict[int, Deque[Event]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "published": 0,
+            "delivered": 0,
+            "disconnected_slow": 0,
+        }
+
+    def publish(self, user_id: int, event: str, data: Dict[str, Any]):
+        """Send an event to every open stream of a user; never blocks the caller"""
+        with self._lock:
+            item = (next(self._ids), event, data)
+            self._history.setdefault(user_id, deque(maxlen=self.history)).append(item)
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self._stats["published"] += 1
+            self._stats["delivered"] += len(subscribers)
+        for subscriber in subscribers:
+            subscriber.deliver(item)
+
+    async def subscribe(self, user_id: int, last_event_id: Optional[int] = None) -> AsyncIterator[Event]:
+        """Yield a user's events as they are published, after replaying those newer than last_event_id"""
+        subscriber = _Subscriber(self.queue_size)
+        with self._lock:
+            # Register and snapshot together so no event is missed or repeated
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+            missed = [
+                item for item in self._history.get(user_id, ())
+                if last_event_id is not None and item[0] > last_event_id
+            ]
+        try:
+            for item in missed:
+                yield item
+            while True:
+                item = await subscriber.queue.get()
+                if item is None:
+                    with self._lock:
+                        self._stats["disconnected_slow"] += 1
+                    return
+                yield item
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[user_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["connected_users"] = len(self._subscribers)
+            stats["open_streams"] = sum(len(subscribers) for subscribers in self._subscribers.values())
+        return stats
+
+async def stream_user_events(user_id: int, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """A user's events encoded as Server-Sent Events, resuming after the Last-Event-ID header value"""
+    try:
+        resume_after = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_after = None
+    async for event_id, event, data in event_broker.subscribe(user_id, resume_after):
+        yield format_event(event, data, str(event_id))
+
+# Create broker instance
+event_broker = EventBroker()
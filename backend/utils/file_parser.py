@@ -1,7 +1,21 @@
 import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Optional
 import PyPDF2
 import docx
-from typing import str
+from dotenv import load_dotenv
+from utils.metrics import track_stage
+from utils.storage import file_storage
+
+load_dotenv()
+
+# Parsing limits and worker pool size (0 workers = parse in a thread instead of a process pool)
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", os.cpu_count() or 1))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", 50))
+MAX_DOCUMENT_CHARS = int(os.getenv("MAX_DOCUMENT_CHARS", 200000))
+
+_parser_executor: Optional[ProcessPoolExecutor] = None
 
 def parse_resume_file(file_path: str) -> str:
     """Parse resume file and extract text content"""
@@ -35,24 +49,69 @@ def parse_jd_file(file_path: str) -> str:
 
 def parse_pdf(file_path: str) -> str:
     """Extract text from PDF file"""
-    text = ""
     with open(file_path, 'rb') as file:
         pdf_reader = PyPDF2.PdfReader(file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    return text.strip()
+        pages = pdf_reader.pages[:MAX_PDF_PAGES]
+        return _join_chunks(page.extract_text() for page in pages)
 
 def parse_docx(file_path: str) -> str:
     """Extract text from DOCX file"""
     doc = docx.Document(file_path)
-    text = ""
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
-    return text.strip()
+    return _join_chunks(paragraph.text for paragraph in doc.paragraphs)
 
 def parse_txt(file_path: str) -> str:
     """Extract text from TXT file"""
     with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read().strip()
+        return file.read(MAX_DOCUMENT_CHARS).strip()
+
+def _join_chunks(chunks: Iterable[str], max_chars: int = MAX_DOCUMENT_CHARS) -> str:
+    """Join text chunks with newlines in linear time, stopping once max_chars is reached"""
+    collected = []
+    total = 0
+    for chunk in chunks:
+        if total + len(chunk) >= max_chars:
+            collected.append(chunk[:max_chars - total])
+            break
+        collected.append(chunk)
+        total += len(chunk) + 1
+    return "\n".join(collected).strip()
+
+def get_parser_executor() -> Optional[ProcessPoolExecutor]:
+    """Return the shared parsing process pool, creating it on first use"""
+    global _parser_executor
+    if _parser_executor is None and PARSER_WORKERS > 0:
+        _parser_executor = ProcessPoolExecutor(max_workers=PARSER_WORKERS)
+    return _parser_executor
+
+def shutdown_parser_executor():
+    """Stop the parsing process pool"""
+    global _parser_executor
+    if _parser_executor is not None:
+        _parser_executor.shutdown(wait=False, cancel_futures=True)
+        _parser_executor = None
+
+async def _run_parser(parser: Callable[[str], str], file_path: str) -> str:
+    executor = get_parser_executor()
+    with track_stage("parse"):
+        if executor is None:
+            return await asyncio.to_thread(parser, file_path)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, parser, file_path)
+
+async def parse_resume_file_async(file_path: str) -> str:
+    """Parse a resume off the event loop"""
+    return await _run_parser(parse_resume_file, file_path)
+
+async def parse_jd_file_async(file_path: str) -> str:
+    """Parse a job description off the event loop"""
+    return await _run_parser(parse_jd_file, file_path)
 
+async def parse_stored_resume_file(key: str) -> str:
+    """Parse a resume kept in file storage (remote files are fetched to a local copy first)"""
+    async with file_storage.local_path(key) as file_path:
+        return await parse_resume_file_async(file_path)
 
+async def parse_stored_jd_file(key: str) -> str:
+    """Parse a job description kept in file storage"""
+    async with file_storage.local_path(key) as file_path:
+        return await parse_jd_file_async(file_path)
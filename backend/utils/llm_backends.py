@@ -0,0 +1,177 @@
+import abc
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+import httpx
+from openai import AsyncOpenAI, APITimeoutError, InternalServerError, RateLimitError
+from dotenv import load_dotenv
+from utils.llm_stub import StubLLM
+
+load_dotenv()
+
+# Which backend serves completions: "openai" (any OpenAI-compatible API) or "stub" (in-process, no network)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+
+# OpenAI-compatible endpoint (unset: api.openai.com); e.g. a vLLM/Ollama server or llm_stub_server.py
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL") or None
+LLM_API_KEY = os.getenv("LLM_API_KEY") or os.getenv("OPENAI_API_KEY")
+LLM_MODEL = os.getenv("LLM_MODEL") or os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+# Connection pool configuration for the LLM API
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 30))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+
+# Header naming the operation; ignored by real APIs, used by the stub server to pick the response schema
+OPERATION_HEADER = "X-LLM-Operation"
+
+class LLMBackend(abc.ABC):
+    """A chat-completion provider. Errors use the openai exception types so retry handling is shared."""
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def identity(self) -> str:
+        """What produced a result, for cache keys: results from different backends never mix"""
+        return self.model
+
+    @abc.abstractmethod
+    async def complete(self, prompt: str, operation: str, timeout: float) -> str:
+        """Return the full completion text"""
+
+    @abc.abstractmethod
+    def stream(self, prompt: str, operation: str, timeout: float) -> AsyncIterator[str]:
+        """Yield text deltas; with streaming the timeout bounds the gap between chunks"""
+
+    async def aclose(self):
+        pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {"backend": self.name, "model": self.model}
+
+class OpenAICompatibleBackend(LLMBackend):
+    """OpenAI or any server speaking its chat completions API"""
+
+    name = "openai"
+
+    def __init__(self, model: str = LLM_MODEL, base_url: Optional[str] = LLM_BASE_URL, api_key: Optional[str] = LLM_API_KEY):
+        super().__init__(model)
+        self.base_url = base_url
+        # Shared keep-alive connection pool used by every LLM call in this process
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LLM_DEFAULT_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        # Retries are handled by AIAnalyzer
+        self.client = AsyncOpenAI(
+            api_key=api_key or "not-needed",
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+
+    @property
+    def identity(self) -> str:
+        return f"{self.model}@{self.base_url}" if self.base_url else self.model
+
+    async def complete(self, prompt: str, operation: str, timeout: float) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            timeout=timeout,
+            extra_headers={OPERATION_HEADER: operation}
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, prompt: str, operation: str, timeout: float) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            timeout=timeout,
+            stream=True,
+            extra_headers={OPERATION_HEADER: operation}
+        )
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.response.aclose()
+
+    async def aclose(self):
+        """Close the shared HTTP connection pool"""
+        await self.http_client.aclose()
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "base_url": self.base_url or "https://api.openai.com/v1"}
+
+class StubBackend(LLMBackend):
+    """In-process stand-in for load testing without a network: simulated latency, errors and valid JSON"""
+
+    name = "stub"
+
+    def __init__(self, stub: Optional[StubLLM] = None):
+        super().__init__("stub")
+        self.stub = stub or StubLLM()
+
+    async def _wait(self, operation: str, timeout: float) -> Optional[str]:
+        """Sleep for the simulated latency, raising the simulated failure if one is drawn"""
+        error = self.stub.sample_error()
+        if error == "timeout":
+            await asyncio.sleep(timeout)
+            raise APITimeoutError(request=self._request())
+        await asyncio.sleep(min(self.stub.sample_latency(), timeout))
+        if error in ("rate_limit", "server_error"):
+            status, error_class = (429, RateLimitError) if error == "rate_limit" else (500, InternalServerError)
+            response = httpx.Response(status, request=self._request())
+            raise error_class(f"LLM stub simulated {error}", response=response, body=None)
+        return error
+
+    def _request(self) -> httpx.Request:
+        return httpx.Request("POST", "http://llm-stub/v1/chat/completions")
+
+    async def complete(self, prompt: str, operation: str, timeout: float) -> str:
+        error = await self._wait(operation, timeout)
+        return self.stub.respond(prompt, operation, error)
+
+    async def stream(self, prompt: str, operation: str, timeout: float) -> AsyncIterator[str]:
+        error = await self._wait(operation, timeout)
+        for delta in self.stub.stream_chunks(self.stub.respond(prompt, operation, error)):
+            await asyncio.sleep(self.stub.stream_chunk_ms / 1000)
+            yield delta
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **super().describe(),
+            "latency_median_ms": self.stub.latency_median_ms,
+            "latency_p95_ms": self.stub.latency_p95_ms,
+            "error_rate": self.stub.error_rate,
+            "error_mix": self.stub.error_mix,
+        }
+
+LLM_BACKENDS = {
+    "openai": OpenAICompatibleBackend,
+    "stub": StubBackend,
+}
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    """Instantiate the configured backend"""
+    try:
+        backend_class = LLM_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM_BACKEND {name!r}; expected one of {', '.join(LLM_BACKENDS)}")
+    return backend_class()
@@ -0,0 +1,179 @@
+import ast
+import hashlib
+import json
+import math
+import os
+import random
+import re
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Simulated model latency: lognormal with this median and 95th percentile (milliseconds)
+LLM_STUB_LATENCY_MEDIAN_MS = float(os.getenv("LLM_STUB_LATENCY_MEDIAN_MS", 800))
+LLM_STUB_LATENCY_P95_MS = float(os.getenv("LLM_STUB_LATENCY_P95_MS", 2500))
+# Delay between streamed chunks (milliseconds)
+LLM_STUB_STREAM_CHUNK_MS = float(os.getenv("LLM_STUB_STREAM_CHUNK_MS", 15))
+
+# Fraction of calls that fail, and how failures are distributed across kinds
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", 0))
+LLM_STUB_ERROR_MIX = os.getenv("LLM_STUB_ERROR_MIX", "rate_limit:0.5,server_error:0.3,timeout:0.1,invalid_json:0.1")
+
+# Seed for reproducible latency/error sequences (unset: random)
+LLM_STUB_SEED = os.getenv("LLM_STUB_SEED")
+
+ERROR_KINDS = ("rate_limit", "server_error", "timeout", "invalid_json")
+
+# z-score of the 95th percentile of a standard normal
+Z_95 = 1.6449
+
+# Skills the stub recognizes in documents
+STUB_SKILLS = [
+    "Python", "Java", "JavaScript", "TypeScript", "Go", "Rust", "C++", "C#", "Ruby", "PHP", "Kotlin", "Swift",
+    "SQL", "PostgreSQL", "MySQL", "MongoDB", "Redis", "React", "Angular", "Vue", "Node.js", "Django", "Flask",
+    "FastAPI", "Spring", "AWS", "Azure", "GCP", "Docker", "Kubernetes", "Terraform", "Linux", "Git",
+    "Machine Learning", "Data Science", "Analytics", "Leadership", "Communication", "Project Management",
+]
+
+_SKILL_PATTERNS = [
+    (skill, re.compile(r"(?<![\w+#.])" + re.escape(skill) + r"(?![\w+#])", re.IGNORECASE)) for skill in STUB_SKILLS
+]
+_YEARS = re.compile(r"(\d+(?:\.\d+)?)\s*\+?\s*years?", re.IGNORECASE)
+_DEGREE = re.compile(r"\b(Bachelor|Master|PhD|MBA)\b", re.IGNORECASE)
+
+def parse_error_mix(spec: str) -> Dict[str, float]:
+    """Parse "kind:weight,..." into normalized weights over ERROR_KINDS"""
+    weights = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        kind, _, weight = item.partition(":")
+        kind = kind.strip()
+        if kind not in ERROR_KINDS:
+            raise ValueError(f"Unknown LLM stub error kind: {kind}")
+        weights[kind] = float(weight or 1)
+    total = sum(weights.values())
+    return {kind: weight / total for kind, weight in weights.items()} if total else {}
+
+class StubLLM:
+    """Generates schema-valid responses for each AIAnalyzer operation, with simulated latency and errors"""
+
+    def __init__(
+        self,
+        latency_median_ms: float = LLM_STUB_LATENCY_MEDIAN_MS,
+        latency_p95_ms: float = LLM_STUB_LATENCY_P95_MS,
+        stream_chunk_ms: float = LLM_STUB_STREAM_CHUNK_MS,
+        error_rate: float = LLM_STUB_ERROR_RATE,
+        error_mix: str = LLM_STUB_ERROR_MIX,
+        seed: Optional[str] = LLM_STUB_SEED
+    ):
+        self.latency_median_ms = latency_median_ms
+        self.latency_p95_ms = max(latency_p95_ms, latency_median_ms)
+        self.stream_chunk_ms = stream_chunk_ms
+        self.error_rate = error_rate
+        self.error_mix = parse_error_mix(error_mix)
+        self._random = random.Random(seed)
+
+    def sample_latency(self) -> float:
+        """Seconds before the (first token of the) response"""
+        if self.latency_median_ms <= 0:
+            return 0.0
+        sigma = math.log(self.latency_p95_ms / self.latency_median_ms) / Z_95
+        return self._random.lognormvariate(math.log(self.latency_median_ms), sigma) / 1000
+
+    def sample_error(self) -> Optional[str]:
+        """Failure kind for this call, or None"""
+        if not self.error_mix or self._random.random() >= self.error_rate:
+            return None
+        return self._random.choices(list(self.error_mix), weights=list(self.error_mix.values()))[0]
+
+    def detect_operation(self, prompt: str) -> str:
+        """Infer the operation from the prompt when the caller did not name it"""
+        if "overall_match" in prompt:
+            return "match"
+        if "required_skills" in prompt:
+            return "jd_analysis"
+        if "experience_years" in prompt:
+            return "resume_analysis"
+        return "jade_conversion"
+
+    def respond(self, prompt: str, operation: Optional[str] = None, error: Optional[str] = None) -> str:
+        """Response text for a prompt; invalid_json returns prose the caller cannot parse"""
+        if error == "invalid_json":
+            return "I'm sorry, I can't produce that analysis right now."
+        operation = operation or self.detect_operation(prompt)
+        # Only the document part of the prompt, not the JSON example that follows it
+        document = prompt.split("Please provide a JSON response")[0]
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+
+        if operation == "resume_analysis":
+            return json.dumps({
+                "skills": self._skills(document),
+                "experience_years": self._years(document),
+                "education": [
+                    {"degree": degree, "field": "Computer Science", "institution": "Stub University", "year": "2020"}
+                    for degree in dict.fromkeys(match.title() for match in _DEGREE.findall(document))
+                ],
+                "summary": f"Candidate with {len(self._skills(document))} listed skills (generated by the LLM stub)."
+            })
+        if operation == "jd_analysis":
+            skills = self._skills(document)
+            split = (len(skills) + 1) // 2
+            return json.dumps({
+                "title": "Software Engineer",
+                "company": "Stub Corp",
+                "location": "Remote",
+                "required_skills": skills[:split],
+                "preferred_skills": skills[split:],
+                "experience_required": self._years(document),
+                "education_required": "Bachelor's degree"
+            })
+        if operation == "match":
+            return json.dumps(self._match(prompt, rng))
+        return self._jade(document)
+
+    def stream_chunks(self, text: str) -> List[str]:
+        """Split a response into word-sized deltas like a streaming model"""
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def _skills(self, text: str) -> List[str]:
+        return [skill for skill, pattern in _SKILL_PATTERNS if pattern.search(text)]
+
+    def _years(self, text: str) -> float:
+        years = [float(value) for value in _YEARS.findall(text)]
+        return max(years) if years else 0.0
+
+    def _list_after(self, label: str, prompt: str) -> List[str]:
+        match = re.search(re.escape(label) + r"\s*(\[.*?\])", prompt)
+        if not match:
+            return []
+        try:
+            values = ast.literal_eval(match.group(1))
+        except (ValueError, SyntaxError):
+            return []
+        return [str(value).lower() for value in values]
+
+    def _match(self, prompt: str, rng: random.Random) -> Dict:
+        resume_skills = set(self._list_after("Resume Skills:", prompt))
+        required = self._list_after("Required Skills:", prompt)
+        covered = [skill for skill in required if skill in resume_skills]
+        skills_match = 100.0 * len(covered) / len(required) if required else 50.0
+        experience_match = round(rng.uniform(50, 100), 1)
+        education_match = round(rng.uniform(60, 100), 1)
+        return {
+            "overall_match": round(0.5 * skills_match + 0.3 * experience_match + 0.2 * education_match, 1),
+            "skills_match": round(skills_match, 1),
+            "experience_match": experience_match,
+            "education_match": education_match,
+            "strengths": [f"Has {skill}" for skill in covered[:3]] or ["Relevant background"],
+            "weaknesses": [f"Missing {skill}" for skill in required if skill not in resume_skills][:3],
+            "recommendations": ["Highlight measurable achievements"],
+            "feedback": f"Covers {len(covered)} of {len(required)} required skills (generated by the LLM stub)."
+        }
+
+    def _jade(self, document: str) -> str:
+        content = document.split("Resume Content:")[-1].split("Resume Summary:")[0]
+        lines = [line.strip() for line in content.splitlines() if line.strip()][:40]
+        body = "\n".join(f"- {line}" for line in lines)
+        return f"JADE FORMAT RESUME\n==================\n\nSKILLS: {', '.join(self._skills(content))}\n\n{body}\n"
@@ -0,0 +1,99 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from prometheus_client import Counter, Gauge, Histogram
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Serve Prometheus metrics on /metrics and time every request
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+# When set, scrapers must send "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+
+# Seconds; spans fast API calls up to slow multi-chunk LLM conversions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Pipeline stages timed by track_stage / observe_stage
+STAGES = ("upload", "parse", "llm", "persist")
+
+http_requests = Counter(
+    "jade_http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+http_request_duration = Histogram(
+    "jade_http_request_duration_seconds", "Time until the last byte of the response was sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+http_requests_in_flight = Gauge(
+    "jade_http_requests_in_flight", "Requests (including open streams) being served"
+)
+
+stage_duration = Histogram(
+    "jade_stage_duration_seconds", "Time spent in each document pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+stage_in_flight = Gauge("jade_stage_in_flight", "Operations currently in each pipeline stage", ["stage"])
+
+llm_requests = Counter("jade_llm_requests_total", "LLM API attempts, including retries", ["operation"])
+llm_errors = Counter("jade_llm_errors_total", "Failed LLM API attempts by exception type", ["operation", "error"])
+llm_retries = Counter("jade_llm_retries_total", "LLM API attempts retried after a transient error", ["operation"])
+llm_tokens = Counter("jade_llm_tokens_total", "Prompt and completion tokens", ["operation", "kind"])
+llm_fallbacks = Counter(
+    "jade_llm_fallbacks_total", "Results produced by the heuristic fallback instead of the model", ["operation"]
+)
+llm_in_flight = Gauge("jade_llm_requests_in_flight", "LLM API calls holding a concurrency slot")
+
+db_pool_checked_out = Gauge("jade_db_pool_checked_out", "Database connections in use", ["pool"])
+event_streams_open = Gauge("jade_event_streams_open", "Open /events Server-Sent Event streams")
+
+for _stage in STAGES:
+    # Export every stage from the start so dashboards do not show gaps before first use
+    stage_duration.labels(_stage)
+    stage_in_flight.labels(_stage)
+
+def observe_stage(stage: str, seconds: float):
+    stage_duration.labels(stage).observe(seconds)
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time a block (sync or async code) as one pass through a pipeline stage"""
+    gauge = stage_in_flight.labels(stage)
+    gauge.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+        gauge.dec()
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and concurrency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route in the scope; templates keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, path).observe(time.perf_counter() - start)
+            http_requests.labels(method, path, str(status)).inc()
@@ -0,0 +1,50 @@
+import os
+from typing import Any, List, Optional, Tuple, Type
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Page size limits for list endpoints
+LIST_DEFAULT_LIMIT = int(os.getenv("LIST_DEFAULT_LIMIT", 100))
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", 500))
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """Parse a comma-separated `fields=` projection, validated against the response schema"""
+    if not fields:
+        return None
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in schema.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # The id is always returned so clients can page and fetch details
+    return list(dict.fromkeys(["id"] + requested))
+
+async def paginate(
+    db: AsyncSession, statement: Select, model: Any, limit: int, cursor: Optional[int],
+    fields: Optional[List[str]] = None
+) -> Tuple[list, Optional[int]]:
+    """Keyset-paginate a select statement newest first, returning (rows, next_cursor)"""
+    if fields:
+        columns = [getattr(model, field) for field in fields if field in model.__table__.columns]
+        statement = statement.options(load_only(*columns))
+    if cursor is not None:
+        statement = statement.where(model.id < cursor)
+
+    rows = (await db.scalars(statement.order_by(model.id.desc()).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+def serialize(rows: list, schema: Type[BaseModel], fields: Optional[List[str]] = None) -> list:
+    """Serialize rows, restricted to the projected fields when given"""
+    if fields is None:
+        return [schema.from_orm(row) for row in rows]
+    return [schema(**{field: getattr(row, field) for field in fields}) for row in rows]
@@ -0,0 +1,318 @@
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Profile a random fraction of requests (PROFILING_ENABLED) and keep those slower than the threshold
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.01))
+PROFILING_SLOW_THRESHOLD_MS = float(os.getenv("PROFILING_SLOW_THRESHOLD_MS", 0))
+
+# Requests sending "X-Profile-Request: <token>" are always profiled and kept, even when disabled
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN") or None
+PROFILING_HEADER = b"x-profile-request"
+
+# Dumps are written here; the oldest are deleted beyond PROFILING_MAX_PROFILES
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", 200))
+
+# Profiling stops after this long; the dump of a longer request covers only its beginning
+PROFILING_MAX_DURATION_SECONDS = float(os.getenv("PROFILING_MAX_DURATION_SECONDS", 60))
+
+# Streamed responses (event streams, NDJSON fan-outs) can stay open for hours and are never profiled
+STREAMING_CONTENT_TYPES = (b"text/event-stream", b"application/x-ndjson")
+
+# Stack sampling interval for the collapsed-stack dump (covers worker threads cProfile cannot see)
+PROFILING_STACK_INTERVAL_MS = float(os.getenv("PROFILING_STACK_INTERVAL_MS", 5))
+
+# Innermost frames of threads that are idle (waiting for work or I/O); their samples are dropped
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+# Functions listed per profile in the worst-offenders report
+PROFILING_TOP_FUNCTIONS = 10
+
+# Dump files per profile: cProfile stats (pstats/snakeviz) and collapsed stacks (flamegraph.pl/speedscope)
+PROFILE_KINDS = {"prof": ".prof", "collapsed": ".collapsed"}
+
+class StackSampler(threading.Thread):
+    """Counts the call stacks of every other thread at a fixed interval, keyed by collapsed stack"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="profiling-stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                if thread_id not in names:
+                    names[thread_id] = next(
+                        (thread.name for thread in threading.enumerate() if thread.ident == thread_id), str(thread_id)
+                    )
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names[thread_id])
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class RequestProfiler:
+    """Decides which requests to profile and stores, rotates and summarizes their dumps"""
+
+    def __init__(
+        self,
+        enabled: bool = PROFILING_ENABLED,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        slow_threshold_ms: float = PROFILING_SLOW_THRESHOLD_MS,
+        directory: str = PROFILING_DIR,
+        max_profiles: int = PROFILING_MAX_PROFILES
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.directory = directory
+        self.max_profiles = max_profiles
+        # cProfile hooks the whole event loop thread, so only one request is profiled at a time
+        self._active = threading.Lock()
+        self._files_lock = threading.Lock()
+        self._stats = {
+            "profiled": 0,
+            "saved": 0,
+            "discarded_fast": 0,
+            "skipped_busy": 0,
+            "skipped_streaming": 0,
+            "truncated": 0,
+        }
+
+    def should_profile(self, forced: bool) -> bool:
+        return forced or (self.enabled and random.random() < self.sample_rate)
+
+    def is_forced(self, headers: List[tuple]) -> bool:
+        """Whether the request carries the privileged profiling header"""
+        if PROFILING_TOKEN is None:
+            return False
+        for name, value in headers:
+            if name == PROFILING_HEADER:
+                return secrets.compare_digest(value, PROFILING_TOKEN.encode())
+        return False
+
+    def start(self) -> Optional[Dict[str, Any]]:
+        """Begin profiling the current request; None when another request holds the profiler"""
+        if not self._active.acquire(blocking=False):
+            self._stats["skipped_busy"] += 1
+            return None
+        profiler = cProfile.Profile()
+        sampler = StackSampler(PROFILING_STACK_INTERVAL_MS / 1000)
+        sampler.start()
+        profiler.enable()
+        return {"profiler": profiler, "sampler": sampler}
+
+    def stop(self, session: Dict[str, Any]):
+        """End a session; later calls for the same session do nothing"""
+        if self._end(session):
+            self._stats["profiled"] += 1
+
+    def discard_streaming(self, session: Dict[str, Any]):
+        """End a session whose response turned out to be a stream, without keeping it"""
+        self._end(session)
+        self._stats["skipped_streaming"] += 1
+
+    def truncate(self, session: Dict[str, Any]):
+        """End a session that reached PROFILING_MAX_DURATION_SECONDS; what was collected is kept"""
+        if self._end(session):
+            session["truncated"] = True
+            self._stats["profiled"] += 1
+            self._stats["truncated"] += 1
+
+    def _end(self, session: Dict[str, Any]) -> bool:
+        if session.get("stopped"):
+            return False
+        session["stopped"] = True
+        session["profiler"].disable()
+        session["sampler"].stop()
+        self._active.release()
+        return True
+
+    def keep(self, duration_ms: float, forced: bool) -> bool:
+        if forced or duration_ms >= self.slow_threshold_ms:
+            return True
+        self._stats["discarded_fast"] += 1
+        return False
+
+    def save(self, session: Dict[str, Any], request: Dict[str, Any]) -> str:
+        """Write the dumps and a JSON summary, then rotate old profiles; returns the profile id"""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        base = os.path.join(self.directory, profile_id)
+
+        session["profiler"].dump_stats(base + PROFILE_KINDS["prof"])
+        with open(base + PROFILE_KINDS["collapsed"], "w") as file:
+            for stack, count in session["sampler"].stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        summary = {
+            "id": profile_id,
+            "created_at": datetime.utcnow().isoformat(),
+            **request,
+            "top_functions": self._top_functions(session["profiler"]),
+        }
+        with open(base + ".json", "w") as file:
+            json.dump(summary, file)
+
+        self._stats["saved"] += 1
+        self._rotate()
+        return profile_id
+
+    def _top_functions(self, profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILING_TOP_FUNCTIONS]
+        return [
+            {
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+        ]
+
+    def _summaries(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        summaries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    summaries.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+    def _rotate(self):
+        with self._files_lock:
+            summaries = sorted(self._summaries(), key=lambda summary: summary["id"])
+            for summary in summaries[:max(len(summaries) - self.max_profiles, 0)]:
+                for extension in (*PROFILE_KINDS.values(), ".json"):
+                    path = os.path.join(self.directory, summary["id"] + extension)
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def worst_offenders(self, limit: int = 20, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Saved profiles, slowest first"""
+        summaries = [
+            summary for summary in self._summaries() if route is None or summary.get("route") == route
+        ]
+        summaries.sort(key=lambda summary: summary["duration_ms"], reverse=True)
+        return summaries[:limit]
+
+    def dump_path(self, profile_id: str, kind: str) -> Optional[str]:
+        """Path of a saved dump, or None for an unknown id or kind"""
+        extension = PROFILE_KINDS.get(kind)
+        # Ids are generated here; anything else (e.g. path separators) is rejected
+        if extension is None or not profile_id.replace("-", "").isalnum():
+            return None
+        path = os.path.join(self.directory, profile_id + extension)
+        return path if os.path.exists(path) else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "max_profiles": self.max_profiles,
+            **self._stats,
+        }
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled or explicitly requested requests
+
+    The cProfile dump covers the event loop thread (and therefore every request interleaved with the
+    profiled one); the collapsed stacks also cover worker threads such as threaded database sessions.
+    """
+
+    def __init__(self, app, profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        forced = self.profiler.is_forced(scope["headers"])
+        session = self.profiler.start() if self.profiler.should_profile(forced) else None
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        streaming = False
+        start = time.perf_counter()
+        # Runs on the event loop thread, where cProfile has to be disabled
+        deadline = asyncio.get_running_loop().call_later(
+            PROFILING_MAX_DURATION_SECONDS, self.profiler.truncate, session
+        )
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if content_type.split(b";")[0].strip() in STREAMING_CONTENT_TYPES:
+                    streaming = True
+                    self.profiler.discard_streaming(session)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            deadline.cancel()
+            self.profiler.stop(session)
+            duration_ms = (time.perf_counter() - start) * 1000
+            if not streaming and self.profiler.keep(duration_ms, forced):
+                route = scope.get("route")
+                request = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "duration_ms": round(duration_ms, 3),
+                    "forced": forced,
+                    "truncated": session.get("truncated", False),
+                }
+                # Serializing stats takes a while; keep it off the event loop
+                await asyncio.to_thread(self.profiler.save, session, request)
+
+# Create profiler instance
+request_profiler = RequestProfiler()
@@ -0,0 +1,231 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import MultiLabelBinarizer
+from models import Resume, JobDescription
+from utils.skills import normalize_skills, parse_skill_list
+
+load_dotenv()
+
+# Number of per-user resume indexes kept in memory
+SCORING_INDEX_CACHE_SIZE = int(os.getenv("SCORING_INDEX_CACHE_SIZE", 64))
+
+# Weights of each component in the overall score
+SCORING_WEIGHTS = {
+    "skills": 0.45,
+    "experience": 0.25,
+    "text": 0.2,
+    "education": 0.1,
+}
+
+# Share of the skills score given to required (vs preferred) skills
+REQUIRED_SKILLS_WEIGHT = 0.8
+
+# Degree levels, checked from highest to lowest
+EDUCATION_LEVELS = [
+    (4, r'ph\.?\s?d|doctor(?:ate|al)?'),
+    (3, r'master|m\.\s?s\b|m\.\s?sc|\bmsc\b|\bmba\b|m\.\s?tech|m\.\s?eng'),
+    (2, r'bachelor|b\.\s?s\b|b\.\s?sc|\bbsc\b|\bb\.?\s?a\b|b\.\s?tech|b\.\s?e\b|undergraduate'),
+    (1, r'associate|diploma'),
+]
+
+def skill_names(raw: Optional[str]) -> List[str]:
+    """Decode a JSON skill list column into canonical, de-duplicated names (as in the skill index)"""
+    return normalize_skills(parse_skill_list(raw))
+
+def education_level(text: Optional[str]) -> int:
+    """Map free-form education text to a degree level (0 = unknown/none)"""
+    if not text:
+        return 0
+    lowered = text.lower()
+    for level, pattern in EDUCATION_LEVELS:
+        if re.search(pattern, lowered):
+            return level
+    return 0
+
+class ResumeIndex:
+    """Sparse skill and TF-IDF matrices over one user's resumes"""
+
+    def __init__(self, resumes: Sequence[Resume]):
+        self.resume_ids = np.array([resume.id for resume in resumes], dtype=np.int64)
+        self.filenames = [resume.original_filename for resume in resumes]
+        self.row_by_id = {resume_id: row for row, resume_id in enumerate(self.resume_ids.tolist())}
+
+        # Binary resume x skill matrix
+        skill_lists = [skill_names(resume.skills) for resume in resumes]
+        self.skill_binarizer = MultiLabelBinarizer(sparse_output=True)
+        self.skill_matrix = self.skill_binarizer.fit_transform(skill_lists).tocsc()
+        self.skill_columns = {skill: column for column, skill in enumerate(self.skill_binarizer.classes_)}
+
+        self.experience = np.array(
+            [resume.experience_years or 0.0 for resume in resumes], dtype=np.float64
+        )
+        self.education = np.array(
+            [education_level(resume.education) for resume in resumes], dtype=np.float64
+        )
+
+        # L2-normalized TF-IDF rows, so a dot product is the cosine similarity
+        self.vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True, max_features=50000)
+        try:
+            self.text_matrix = self.vectorizer.fit_transform([resume.content or "" for resume in resumes])
+        except ValueError:
+            # Empty vocabulary (no usable text in any resume)
+            self.vectorizer = None
+            self.text_matrix = None
+
+    def __len__(self) -> int:
+        return len(self.resume_ids)
+
+    def skill_hits(self, skills: Iterable[str]) -> Tuple[np.ndarray, int]:
+        """Per-resume count of the given skills present, and the number of skills asked for"""
+        skills = list(dict.fromkeys(skills))
+        columns = [self.skill_columns[skill] for skill in skills if skill in self.skill_columns]
+        if not columns:
+            return np.zeros(len(self)), len(skills)
+        hits = np.asarray(self.skill_matrix[:, columns].sum(axis=1)).ravel()
+        return hits, len(skills)
+
+    def text_similarity(self, text: str) -> np.ndarray:
+        """Cosine similarity between every resume and the given text"""
+        if self.vectorizer is None or not text:
+            return np.zeros(len(self))
+        query = self.vectorizer.transform([text])
+        return np.asarray((self.text_matrix @ query.T).todense()).ravel()
+
+class ScoringEngine:
+    """Local, vectorized resume ranking used to shortlist candidates before LLM matching"""
+
+    def __init__(self, cache_size: int = SCORING_INDEX_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._indexes: "OrderedDict[int, Tuple[Any, ResumeIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_cached_index(self, user_id: int, fingerprint: Any) -> Optional[ResumeIndex]:
+        """Return the cached index for a user if it was built from the same set of resumes"""
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is None or entry[0] != fingerprint:
+                return None
+            self._indexes.move_to_end(user_id)
+            return entry[1]
+
+    def build_index(self, user_id: int, fingerprint: Any, resumes: Sequence[Resume]) -> ResumeIndex:
+        """Build and cache the index for a user's resumes"""
+        index = ResumeIndex(resumes)
+        with self._lock:
+            self._indexes[user_id] = (fingerprint, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def score(self, index: ResumeIndex, jd: JobDescription) -> Dict[str, np.ndarray]:
+        """Score every resume in the index against a JD in a handful of matrix operations"""
+        n = len(index)
+        if n == 0:
+            return {key: np.zeros(0) for key in ("overall", "skills", "experience", "education", "text")}
+
+        required = skill_names(jd.required_skills)
+        preferred = [skill for skill in skill_names(jd.preferred_skills) if skill not in required]
+
+        # Skill overlap
+        required_hits, required_total = index.skill_hits(required)
+        preferred_hits, preferred_total = index.skill_hits(preferred)
+        required_score = required_hits / required_total * 100 if required_total else np.full(n, 100.0)
+        if preferred_total:
+            preferred_score = preferred_hits / preferred_total * 100
+            skills = REQUIRED_SKILLS_WEIGHT * required_score + (1 - REQUIRED_SKILLS_WEIGHT) * preferred_score
+        else:
+            skills = required_score
+
+        # Experience gap (full marks when the requirement is met)
+        experience_required = jd.experience_required or 0.0
+        if experience_required > 0:
+            experience = np.clip(index.experience / experience_required, 0.0, 1.0) * 100
+        else:
+            experience = np.full(n, 100.0)
+
+        # Education level against the required level
+        required_level = education_level(jd.education_required)
+        if required_level > 0:
+            education = np.clip(index.education / required_level, 0.0, 1.0) * 100
+        else:
+            education = np.full(n, 100.0)
+
+        # Free-text similarity
+        text = index.text_similarity(jd.content) * 100
+
+        overall = (
+            SCORING_WEIGHTS["skills"] * skills
+            + SCORING_WEIGHTS["experience"] * experience
+            + SCORING_WEIGHTS["text"] * text
+            + SCORING_WEIGHTS["education"] * education
+        )
+        return {
+            "overall": overall,
+            "skills": skills,
+            "experience": experience,
+            "education": education,
+            "text": text,
+        }
+
+    def rank(
+        self, index: ResumeIndex, jd: JobDescription, top_k: int, resume_ids: Optional[Iterable[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the top K resumes for a JD, optionally restricted to a subset of resume ids"""
+        scores = self.score(index, jd)
+        overall = scores["overall"]
+
+        if resume_ids is not None:
+            rows = np.array(
+                [index.row_by_id[resume_id] for resume_id in resume_ids if resume_id in index.row_by_id],
+                dtype=np.int64
+            )
+        else:
+            rows = np.arange(len(index))
+
+        if top_k <= 0 or rows.size == 0:
+            return []
+
+        # Partial sort: O(N) selection, then sort only the K winners
+        if rows.size > top_k:
+            candidates = rows[np.argpartition(-overall[rows], top_k - 1)[:top_k]]
+        else:
+            candidates = rows
+        ranked = candidates[np.argsort(-overall[candidates], kind="stable")]
+
+        required = skill_names(jd.required_skills)
+        required_columns = [index.skill_columns[skill] for skill in required if skill in index.skill_columns]
+
+        results = []
+        for row in ranked.tolist():
+            matched_skills = []
+            if required_columns:
+                present = index.skill_matrix[row, required_columns].toarray().ravel()
+                matched_skills = [
+                    index.skill_binarizer.classes_[column]
+                    for column, hit in zip(required_columns, present) if hit
+                ]
+            results.append({
+                "resume_id": int(index.resume_ids[row]),
+                "original_filename": index.filenames[row],
+                "score": round(float(overall[row]), 2),
+                "skills_match": round(float(scores["skills"][row]), 2),
+                "experience_match": round(float(scores["experience"][row]), 2),
+                "education_match": round(float(scores["education"][row]), 2),
+                "text_similarity": round(float(scores["text"][row]), 2),
+                "matched_skills": matched_skills,
+            })
+        return results
+
+# Create engine instance
+scoring_engine = ScoringEngine()
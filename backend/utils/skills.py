@@ -0,0 +1,157 @@
+import json
+import re
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import Select, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import engine
+from models import JobDescription, JobDescriptionSkill, Resume, ResumeSkill, Skill
+
+# Longest normalized skill name that is indexed (longer entries are model noise, not skills)
+SKILL_NAME_MAX_LENGTH = 100
+
+# Spellings folded into one canonical (lowercase) skill name
+SKILL_ALIASES = {
+    "js": "javascript",
+    "ecmascript": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "python3": "python",
+    "golang": "go",
+    "c sharp": "c#",
+    "csharp": "c#",
+    "cpp": "c++",
+    "nodejs": "node.js",
+    "node": "node.js",
+    "reactjs": "react",
+    "react.js": "react",
+    "vuejs": "vue",
+    "vue.js": "vue",
+    "angularjs": "angular",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "mongo": "mongodb",
+    "k8s": "kubernetes",
+    "amazon web services": "aws",
+    "google cloud": "gcp",
+    "google cloud platform": "gcp",
+    "microsoft azure": "azure",
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "nlp": "natural language processing",
+    "sklearn": "scikit-learn",
+    "ci/cd": "ci-cd",
+    "rest": "rest api",
+    "restful": "rest api",
+    "restful api": "rest api",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_skill(name) -> Optional[str]:
+    """Canonical form of a skill name: lowercase, collapsed whitespace, aliases resolved"""
+    if not isinstance(name, str):
+        return None
+    key = _WHITESPACE.sub(" ", name).strip().lower().rstrip(".,;:").strip()
+    if not key or len(key) > SKILL_NAME_MAX_LENGTH:
+        return None
+    return SKILL_ALIASES.get(key, key)
+
+def normalize_skills(names: Iterable) -> List[str]:
+    """Normalize and deduplicate skill names, keeping their order"""
+    return list(dict.fromkeys(filter(None, (normalize_skill(name) for name in names))))
+
+def parse_skill_list(value: Optional[str]) -> list:
+    """Decode a JSON-encoded skill column, tolerating legacy or malformed values"""
+    if not value:
+        return []
+    try:
+        skills = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return skills if isinstance(skills, list) else []
+
+def _insert_ignoring_duplicates(table):
+    """INSERT that skips rows violating a unique constraint (a concurrent ingestion may add the same skill)"""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing()
+
+async def get_skill_ids(db: AsyncSession, names: List[str]) -> Dict[str, int]:
+    """Look up (creating where missing) the ids of normalized skill names"""
+    if not names:
+        return {}
+    ids = dict((await db.execute(select(Skill.name, Skill.id).where(Skill.name.in_(names)))).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        await db.execute(_insert_ignoring_duplicates(Skill), [{"name": name} for name in missing])
+        ids.update((await db.execute(select(Skill.name, Skill.id).where(Skill.name.in_(missing)))).all())
+    return ids
+
+async def index_resume_skills(db: AsyncSession, resume: Resume):
+    """Replace a resume's skill links with the skills in its analysis (the resume must have an id)"""
+    names = normalize_skills(parse_skill_list(resume.skills))
+    await remove_resume_skills(db, resume.id)
+    ids = await get_skill_ids(db, names)
+    if ids:
+        await db.execute(insert(ResumeSkill), [
+            {"resume_id": resume.id, "skill_id": ids[name], "owner_id": resume.owner_id} for name in names
+        ])
+
+async def index_new_resumes_skills(db: AsyncSession, resumes: List[Resume]):
+    """Link the skills of resumes inserted in this transaction (no links to replace) with one lookup and insert"""
+    names_by_resume = [(resume, normalize_skills(parse_skill_list(resume.skills))) for resume in resumes]
+    ids = await get_skill_ids(db, list(dict.fromkeys(name for _, names in names_by_resume for name in names)))
+    links = [
+        {"resume_id": resume.id, "skill_id": ids[name], "owner_id": resume.owner_id}
+        for resume, names in names_by_resume for name in names
+    ]
+    if links:
+        await db.execute(insert(ResumeSkill), links)
+
+async def index_jd_skills(db: AsyncSession, jd: JobDescription):
+    """Replace a job description's skill links; a skill both required and preferred counts as required"""
+    required = normalize_skills(parse_skill_list(jd.required_skills))
+    preferred = [name for name in normalize_skills(parse_skill_list(jd.preferred_skills)) if name not in required]
+    await remove_jd_skills(db, jd.id)
+    ids = await get_skill_ids(db, required + preferred)
+    if ids:
+        await db.execute(insert(JobDescriptionSkill), [
+            {"jd_id": jd.id, "skill_id": ids[name], "required": name in required} for name in required + preferred
+        ])
+
+async def index_new_jds_skills(db: AsyncSession, jds: List[JobDescription]):
+    """index_new_resumes_skills for job descriptions inserted in this transaction"""
+    names_by_jd = []
+    for jd in jds:
+        required = normalize_skills(parse_skill_list(jd.required_skills))
+        preferred = [name for name in normalize_skills(parse_skill_list(jd.preferred_skills)) if name not in required]
+        names_by_jd.append((jd, required, preferred))
+    ids = await get_skill_ids(db, list(dict.fromkeys(
+        name for _, required, preferred in names_by_jd for name in required + preferred
+    )))
+    links = [
+        {"jd_id": jd.id, "skill_id": ids[name], "required": name in required}
+        for jd, required, preferred in names_by_jd for name in required + preferred
+    ]
+    if links:
+        await db.execute(insert(JobDescriptionSkill), links)
+
+async def remove_resume_skills(db: AsyncSession, resume_id: int):
+    await db.execute(delete(ResumeSkill).where(ResumeSkill.resume_id == resume_id))
+
+async def remove_jd_skills(db: AsyncSession, jd_id: int):
+    await db.execute(delete(JobDescriptionSkill).where(JobDescriptionSkill.jd_id == jd_id))
+
+def resumes_with_skills(user_id: int, names: List[str], match_all: bool = True) -> Select:
+    """Ids of a user's resumes having all (or any) of the normalized skills, answered from the skill index"""
+    statement = select(ResumeSkill.resume_id).join(Skill, Skill.id == ResumeSkill.skill_id).where(
+        ResumeSkill.owner_id == user_id,
+        Skill.name.in_(names)
+    )
+    if match_all:
+        statement = statement.group_by(ResumeSkill.resume_id).having(func.count() == len(names))
+    return statement
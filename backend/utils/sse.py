@@ -0,0 +1,59 @@
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds of silence after which a comment line is sent so proxies keep the stream open
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", 15))
+
+# Headers that stop proxies (nginx in particular) from buffering an event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def format_event(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    """Encode one Server-Sent Event; data is JSON so multi-line text stays on one data line"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+async def with_keepalive(
+    source: AsyncIterator[str], interval: float = SSE_KEEPALIVE_SECONDS
+) -> AsyncIterator[str]:
+    """Relay an event stream, inserting a keep-alive comment whenever it is idle for `interval` seconds"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+    done = object()
+
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(done)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=interval)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Client disconnected or the stream ended: stop the producer
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,392 @@
+import abc
+import asyncio
+import errno
+import hashlib
+import hmac
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+from xml.etree import ElementTree
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Where uploaded files are kept: "local" (sharded directory tree) or "s3" (any S3-compatible object store)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+
+# Keys look like "resumes/3f/a2/<uuid>.pdf": directory levels of two hex characters (256 entries each)
+# taken from a hash of the file name, so no directory (or listing prefix) grows without bound
+STORAGE_SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", 2))
+
+# Local backend root; a key is a path below it
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "uploads")
+
+# Scratch space for uploads in transit and for local copies of remote files handed to the parsers.
+# Under the local root by default, so storing a staged file there is a rename rather than a copy.
+STORAGE_STAGING_DIR = os.getenv("STORAGE_STAGING_DIR") or os.path.join(STORAGE_LOCAL_ROOT, ".staging")
+
+# S3 backend (AWS S3, MinIO, Ceph or s3_stub_server.py): path-style requests signed with Signature V4
+STORAGE_S3_ENDPOINT_URL = os.getenv("STORAGE_S3_ENDPOINT_URL", "https://s3.amazonaws.com")
+STORAGE_S3_BUCKET = os.getenv("STORAGE_S3_BUCKET", "jade-ai-uploads")
+STORAGE_S3_REGION = os.getenv("STORAGE_S3_REGION", "us-east-1")
+STORAGE_S3_ACCESS_KEY = os.getenv("STORAGE_S3_ACCESS_KEY", "")
+STORAGE_S3_SECRET_KEY = os.getenv("STORAGE_S3_SECRET_KEY", "")
+# Prepended to every key, so several deployments can share a bucket
+STORAGE_S3_PREFIX = os.getenv("STORAGE_S3_PREFIX", "")
+# Streaming writes larger than one part become multipart uploads (S3 requires parts of at least 5 MiB)
+STORAGE_S3_PART_SIZE = max(int(os.getenv("STORAGE_S3_PART_SIZE", 8 * 1024 * 1024)), 5 * 1024 * 1024)
+STORAGE_S3_MAX_CONNECTIONS = int(os.getenv("STORAGE_S3_MAX_CONNECTIONS", 20))
+STORAGE_S3_TIMEOUT = float(os.getenv("STORAGE_S3_TIMEOUT", 60))
+
+# Read size for streaming reads and copies
+STORAGE_CHUNK_SIZE = 1024 * 1024
+
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+class StorageError(Exception):
+    pass
+
+def shard_key(namespace: str, filename: str, depth: int = STORAGE_SHARD_DEPTH) -> str:
+    """Key of filename in namespace, below `depth` directory levels derived from a hash of the name"""
+    digest = hashlib.sha256(filename.encode()).hexdigest()
+    return "/".join([namespace, *(digest[2 * level:2 * level + 2] for level in range(depth)), filename])
+
+async def read_local_file(path: str, chunk_size: int = STORAGE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield a local file's bytes, reading in a worker thread so the event loop never waits on the disk"""
+    file = await asyncio.to_thread(open, path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(file.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+async def write_local_file(path: str, chunks: AsyncIterable[bytes]):
+    """Write streamed bytes to a local file, in a worker thread like read_local_file"""
+    file = await asyncio.to_thread(open, path, "wb")
+    try:
+        async for chunk in chunks:
+            await asyncio.to_thread(file.write, chunk)
+    finally:
+        file.close()
+
+def _remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class FileStorage(abc.ABC):
+    """Where uploaded documents live. Files are addressed by key and always streamed, never held in memory."""
+
+    name = "base"
+
+    def __init__(self, shard_depth: int = STORAGE_SHARD_DEPTH, staging_dir: str = STORAGE_STAGING_DIR):
+        self.shard_depth = shard_depth
+        self.staging_dir = staging_dir
+
+    def new_key(self, namespace: str, extension: str) -> str:
+        """A fresh key for a file of the given extension (the client's file name is never used)"""
+        return shard_key(namespace, f"{uuid.uuid4()}{extension.lower()}", self.shard_depth)
+
+    def is_sharded(self, key: str) -> bool:
+        """Whether key follows the current layout (keys from before sharding sit directly in the namespace)"""
+        return len(key.split("/")) == self.shard_depth + 2
+
+    def staging_path(self, extension: str = "") -> str:
+        """A new local scratch file path; the caller removes the file"""
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return os.path.join(self.staging_dir, f"{uuid.uuid4()}{extension.lower()}")
+
+    @abc.abstractmethod
+    async def write(self, key: str, chunks: AsyncIterable[bytes]):
+        """Store the streamed bytes under key. If the stream raises, nothing is stored."""
+
+    @abc.abstractmethod
+    def read(self, key: str, chunk_size: int = STORAGE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yield the bytes stored under key; raises FileNotFoundError for a missing key"""
+
+    @abc.abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Whether anything is stored under key"""
+
+    @abc.abstractmethod
+    async def delete(self, key: str):
+        """Remove key; a missing key is not an error"""
+
+    async def put_file(self, local_path: str, key: str):
+        """Store a local (staged) file under key and remove the local copy"""
+        await self.write(key, read_local_file(local_path))
+        await asyncio.to_thread(os.remove, local_path)
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[str]:
+        """A local file with the contents of key, for code that needs a real path (the document parsers)"""
+        path = self.staging_path(os.path.splitext(key)[1])
+        try:
+            await write_local_file(path, self.read(key))
+            yield path
+        finally:
+            # Runs while the request is being cancelled too, where awaiting again is not safe
+            _remove_if_exists(path)
+
+    async def aclose(self):
+        pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {"backend": self.name, "shard_depth": self.shard_depth}
+
+class LocalFileStorage(FileStorage):
+    """Files in a directory tree on this node's disk (or a shared mount)"""
+
+    name = "local"
+
+    def __init__(self, root: str = STORAGE_LOCAL_ROOT, **kwargs):
+        super().__init__(**kwargs)
+        self.root = root
+
+    def path(self, key: str) -> str:
+        parts = key.split("/")
+        # Keys are generated here, but they come back from the database: never leave the root
+        if not key or key.startswith("/") or "\\" in key or any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return os.path.join(self.root, *parts)
+
+    async def write(self, key: str, chunks: AsyncIterable[bytes]):
+        path = self.path(key)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+        # Written under a temporary name and renamed, so readers never see a partial file
+        partial_path = f"{path}.{uuid.uuid4().hex[:8]}.partial"
+        try:
+            await write_local_file(partial_path, chunks)
+            await asyncio.to_thread(os.replace, partial_path, path)
+        except BaseException:
+            _remove_if_exists(partial_path)
+            raise
+
+    async def read(self, key: str, chunk_size: int = STORAGE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async for chunk in read_local_file(self.path(key), chunk_size):
+            yield chunk
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self.path(key))
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(_remove_if_exists, self.path(key))
+
+    async def put_file(self, local_path: str, key: str):
+        path = self.path(key)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+        try:
+            await asyncio.to_thread(os.replace, local_path, path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Staging directory on another filesystem: copy instead of renaming
+            await super().put_file(local_path, key)
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[str]:
+        path = self.path(key)
+        if not await asyncio.to_thread(os.path.exists, path):
+            raise FileNotFoundError(f"No stored file {key!r}")
+        yield path
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "root": self.root}
+
+def sign_v4(
+    method: str, host: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+    access_key: str, secret_key: str, region: str, now: datetime, payload_hash: str = UNSIGNED_PAYLOAD
+) -> Dict[str, str]:
+    """Headers for an AWS Signature Version 4 signed S3 request (path must already be URI-encoded)"""
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+    headers = {name.lower(): str(value).strip() for name, value in headers.items()}
+    headers.update({"host": host, "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash})
+
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join([
+        method,
+        path,
+        canonical_query(query),
+        "".join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+        signed_headers,
+        payload_hash,
+    ])
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+    ])
+
+    signing_key = f"AWS4{secret_key}".encode()
+    for part in (date, region, "s3", "aws4_request"):
+        signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    headers["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    # The HTTP client sends Host itself
+    del headers["host"]
+    return headers
+
+def canonical_query(query: Dict[str, str]) -> str:
+    return "&".join(
+        f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted(query.items())
+    )
+
+class S3FileStorage(FileStorage):
+    """Objects in an S3-compatible bucket, shared by every app node"""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        endpoint_url: str = STORAGE_S3_ENDPOINT_URL,
+        bucket: str = STORAGE_S3_BUCKET,
+        region: str = STORAGE_S3_REGION,
+        access_key: str = STORAGE_S3_ACCESS_KEY,
+        secret_key: str = STORAGE_S3_SECRET_KEY,
+        prefix: str = STORAGE_S3_PREFIX,
+        part_size: int = STORAGE_S3_PART_SIZE,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.prefix = prefix
+        self.part_size = part_size
+        self.host = httpx.URL(self.endpoint_url).netloc.decode("ascii")
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=STORAGE_S3_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(STORAGE_S3_TIMEOUT),
+        )
+
+    def _path(self, key: str) -> str:
+        return quote(f"/{self.bucket}/{self.prefix}{key}", safe="/-_.~")
+
+    async def _send(
+        self, method: str, key: str, query: Optional[Dict[str, str]] = None,
+        content: Optional[bytes] = None, stream: bool = False
+    ) -> httpx.Response:
+        query = query or {}
+        path = self._path(key)
+        headers = sign_v4(
+            method, self.host, path, query, {}, self.access_key, self.secret_key, self.region,
+            datetime.now(timezone.utc)
+        )
+        url = f"{self.endpoint_url}{path}"
+        if query:
+            url += f"?{canonical_query(query)}"
+        request = self.client.build_request(method, url, headers=headers, content=content)
+        return await self.client.send(request, stream=stream)
+
+    async def _check(self, response: httpx.Response, key: str) -> httpx.Response:
+        if response.status_code == 404:
+            await response.aclose()
+            raise FileNotFoundError(f"No stored file {key!r}")
+        if response.status_code >= 300:
+            body = (await response.aread()).decode(errors="replace")
+            raise StorageError(f"S3 {response.request.method} {key!r} failed with {response.status_code}: {body[:200]}")
+        return response
+
+    async def write(self, key: str, chunks: AsyncIterable[bytes]):
+        buffer = bytearray()
+        upload_id = None
+        parts: List[str] = []
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload_id = await self._create_multipart_upload(key)
+                    parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer[:self.part_size])))
+                    del buffer[:self.part_size]
+
+            if upload_id is None:
+                # Small file: a single PUT
+                await self._check(await self._send("PUT", key, content=bytes(buffer)), key)
+                return
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await self._complete_multipart_upload(key, upload_id, parts)
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await self._send("DELETE", key, {"uploadId": upload_id})
+                except Exception:
+                    # Unfinished uploads are also removed by the bucket's lifecycle rules
+                    pass
+            raise
+
+    async def _create_multipart_upload(self, key: str) -> str:
+        response = await self._check(await self._send("POST", key, {"uploads": ""}), key)
+        for element in ElementTree.fromstring(response.content).iter():
+            if element.tag.endswith("UploadId"):
+                return element.text
+        raise StorageError(f"S3 returned no upload id for {key!r}")
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> str:
+        response = await self._send("PUT", key, {"partNumber": str(number), "uploadId": upload_id}, content=data)
+        return (await self._check(response, key)).headers["ETag"]
+
+    async def _complete_multipart_upload(self, key: str, upload_id: str, etags: List[str]):
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in enumerate(etags, start=1)
+        ) + "</CompleteMultipartUpload>"
+        response = await self._check(await self._send("POST", key, {"uploadId": upload_id}, content=body.encode()), key)
+        # S3 may report a failed completion with status 200 and an error document
+        if b"<Error>" in response.content:
+            raise StorageError(f"S3 could not complete the upload of {key!r}: {response.text[:200]}")
+
+    async def read(self, key: str, chunk_size: int = STORAGE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        response = await self._check(await self._send("GET", key, stream=True), key)
+        try:
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def exists(self, key: str) -> bool:
+        response = await self._send("HEAD", key)
+        if response.status_code == 404:
+            return False
+        await self._check(response, key)
+        return True
+
+    async def delete(self, key: str):
+        await self._check(await self._send("DELETE", key), key)
+
+    async def aclose(self):
+        """Close the HTTP connection pool"""
+        await self.client.aclose()
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "endpoint_url": self.endpoint_url, "bucket": self.bucket, "prefix": self.prefix}
+
+STORAGE_BACKENDS = {
+    "local": LocalFileStorage,
+    "s3": S3FileStorage,
+}
+
+def create_file_storage(name: str = STORAGE_BACKEND) -> FileStorage:
+    """Instantiate the configured backend"""
+    try:
+        storage_class = STORAGE_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; expected one of {', '.join(STORAGE_BACKENDS)}")
+    return storage_class()
+
+# Create storage instance
+file_storage = create_file_storage()
@@ -0,0 +1,144 @@
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character-based estimate
+    tiktoken = None
+
+load_dotenv()
+
+# Tokenizer used for counting (cl100k_base matches the gpt-3.5/gpt-4 family)
+LLM_TOKENIZER_ENCODING = os.getenv("LLM_TOKENIZER_ENCODING", "cl100k_base")
+
+# Average characters per token, used when tiktoken or its encoding file is unavailable
+CHARS_PER_TOKEN = 4
+
+# Document tokens allowed in a single prompt, per operation; longer documents are chunked
+LLM_DEFAULT_TOKEN_BUDGET = int(os.getenv("LLM_TOKEN_BUDGET", 3000))
+LLM_TOKEN_BUDGETS = {
+    "resume_analysis": int(os.getenv("LLM_TOKEN_BUDGET_RESUME", LLM_DEFAULT_TOKEN_BUDGET)),
+    "jd_analysis": int(os.getenv("LLM_TOKEN_BUDGET_JD", LLM_DEFAULT_TOKEN_BUDGET)),
+    "jade_conversion": int(os.getenv("LLM_TOKEN_BUDGET_JADE", 4000)),
+    "jade_template": int(os.getenv("LLM_TOKEN_BUDGET_JADE_TEMPLATE", 2000)),
+}
+
+# Chunks analyzed per document; text beyond this is dropped so latency stays bounded
+LLM_MAX_CHUNKS = int(os.getenv("LLM_MAX_CHUNKS", 8))
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """Load the tokenizer once; None when tiktoken or its encoding file is unavailable"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                if tiktoken is not None:
+                    try:
+                        _encoding = tiktoken.get_encoding(LLM_TOKENIZER_ENCODING)
+                    except Exception:
+                        # The encoding is downloaded on first use, which fails offline
+                        _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (estimated when no tokenizer is available)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def get_token_budget(operation: str) -> int:
+    return LLM_TOKEN_BUDGETS.get(operation, LLM_DEFAULT_TOKEN_BUDGET)
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Hard-split a single paragraph that does not fit in the budget"""
+    encoding = _get_encoding()
+    if encoding is None:
+        size = max_tokens * CHARS_PER_TOKEN
+        return [text[start:start + size] for start in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[start:start + max_tokens]) for start in range(0, len(tokens), max_tokens)]
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split text into chunks of at most max_tokens, breaking on line boundaries where possible"""
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in text.split("\n"):
+        line_tokens = count_tokens(line) + 1
+        if line_tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(line, max_tokens))
+            continue
+        if current_tokens + line_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def plan_chunks(text: str, operation: str, max_chunks: int = LLM_MAX_CHUNKS) -> Tuple[List[str], int]:
+    """Chunk a document for an operation, returning (chunks, tokens dropped beyond max_chunks)"""
+    budget = get_token_budget(operation)
+    if count_tokens(text) <= budget:
+        return [text], 0
+
+    chunks = split_into_chunks(text, budget)
+    dropped = sum(count_tokens(chunk) for chunk in chunks[max_chunks:])
+    return chunks[:max_chunks], dropped
+
+def truncate_to_budget(text: str, max_tokens: int) -> Tuple[str, int]:
+    """Cut text to max_tokens, returning (text, tokens removed)"""
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text, 0
+    return _split_oversized(text, max_tokens)[0], total - max_tokens
+
+class TokenMetrics:
+    """Per-operation counters of prompt tokens sent and document tokens truncated"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations: Dict[str, Dict[str, int]] = {}
+
+    def record(self, operation: str, sent: int = 0, truncated: int = 0, chunks: int = 0, calls: int = 0):
+        with self._lock:
+            stats = self._operations.setdefault(operation, {
+                "calls": 0,
+                "tokens_sent": 0,
+                "tokens_truncated": 0,
+                "chunked_documents": 0,
+                "chunks": 0,
+            })
+            stats["calls"] += calls
+            stats["tokens_sent"] += sent
+            stats["tokens_truncated"] += truncated
+            if chunks > 1:
+                stats["chunked_documents"] += 1
+                stats["chunks"] += chunks
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {operation: dict(stats) for operation, stats in self._operations.items()}
+        return {
+            "tokenizer": LLM_TOKENIZER_ENCODING if _get_encoding() is not None else "estimate",
+            "budgets": dict(LLM_TOKEN_BUDGETS),
+            "max_chunks": LLM_MAX_CHUNKS,
+            "operations": operations,
+        }
+
+# Create metrics instance
+token_metrics = TokenMetrics()
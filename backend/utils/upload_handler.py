@@ -0,0 +1,68 @@
+import os
+import hashlib
+from dataclasses import dataclass
+from typing import AsyncIterator
+from fastapi import HTTPException, UploadFile
+from dotenv import load_dotenv
+from utils.metrics import track_stage
+from utils.storage import file_storage, write_local_file
+
+load_dotenv()
+
+# Upload streaming configuration
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 20 * 1024 * 1024))
+
+@dataclass
+class SavedUpload:
+    filename: str
+    file_path: str
+    size: int
+    sha256: str
+
+async def _read_upload(file: UploadFile, upload: SavedUpload, max_size: int) -> AsyncIterator[bytes]:
+    """Yield an upload in fixed-size chunks, hashing and counting bytes into upload as they arrive"""
+    digest = hashlib.sha256()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        upload.size += len(chunk)
+        if upload.size > max_size:
+            raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {max_size} bytes")
+        digest.update(chunk)
+        yield chunk
+    upload.sha256 = digest.hexdigest()
+
+def _check_declared_size(file: UploadFile, max_size: int):
+    # Reject early when the client declared the size up front
+    if file.size is not None and file.size > max_size:
+        raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {max_size} bytes")
+
+async def save_upload_file(file: UploadFile, namespace: str, max_size: int = MAX_UPLOAD_SIZE) -> SavedUpload:
+    """Stream an upload into file storage under a new key in namespace; file_path of the result is that key"""
+    _check_declared_size(file, max_size)
+
+    key = file_storage.new_key(namespace, os.path.splitext(file.filename)[1])
+    upload = SavedUpload(filename=os.path.basename(key), file_path=key, size=0, sha256="")
+    # A rejected or interrupted upload leaves nothing in storage
+    with track_stage("upload"):
+        await file_storage.write(key, _read_upload(file, upload, max_size))
+    return upload
+
+async def stage_upload_file(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE) -> SavedUpload:
+    """Stream an upload to a local staging file (for archives, which are unpacked rather than stored)"""
+    _check_declared_size(file, max_size)
+
+    file_path = file_storage.staging_path(os.path.splitext(file.filename)[1])
+    upload = SavedUpload(filename=os.path.basename(file_path), file_path=file_path, size=0, sha256="")
+    try:
+        with track_stage("upload"):
+            # Written from a worker thread, like local file storage
+            await write_local_file(file_path, _read_upload(file, upload, max_size))
+    except BaseException:
+        # Never leave partial files behind
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return upload
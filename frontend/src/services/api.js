@@ -35,6 +35,20 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints return one page at a time (newest first) with the next page's cursor in X-Next-Cursor.
+// Follow it until every page is loaded; resolves to the first response with all items as data
+const getAllPages = async (url) => {
+  const first = await api.get(url);
+  let items = first.data;
+  let cursor = first.headers['x-next-cursor'];
+  while (cursor) {
+    const page = await api.get(url, { params: { cursor } });
+    items = items.concat(page.data);
+    cursor = page.headers['x-next-cursor'];
+  }
+  return { ...first, data: items };
+};
+
 // API service functions
 export const authAPI = {
   login: (email, password) => api.post('/auth/login', { email, password }),
@@ -49,7 +63,7 @@ export const resumeAPI = {
       headers: { 'Content-Type': 'multipart/form-data' },
     });
   },
-  getAll: () => api.get('/resumes'),
+  getAll: () => getAllPages('/resumes'),
   getById: (id) => api.get(`/resumes/${id}`),
   delete: (id) => api.delete(`/resumes/${id}`),
 };
@@ -62,7 +76,7 @@ export const jdAPI = {
       headers: { 'Content-Type': 'multipart/form-data' },
     });
   },
-  getAll: () => api.get('/jds'),
+  getAll: () => getAllPages('/jds'),
   getById: (id) => api.get(`/jds/${id}`),
   delete: (id) => api.delete(`/jds/${id}`),
 };
@@ -76,7 +90,7 @@ export const matchAPI = {
       headers: { 'Content-Type': 'multipart/form-data' },
     });
   },
-  getAll: () => api.get('/matches'),
+  getAll: () => getAllPages('/matches'),
   getById: (id) => api.get(`/matches/${id}`),
   delete: (id) => api.delete(`/matches/${id}`),
 };
@@ -95,4 +109,63 @@ export const jadeAPI = {
   deleteTemplate: (templateId) => api.delete(`/jade/templates/${templateId}`),
 };
 
+export const eventsAPI = {
+  // Live resume/JD/match/Jade lifecycle events. The stream is opened with a short-lived stream token
+  // (EventSource cannot send the Authorization header); each reconnect fetches a new one and replays
+  // the events missed since the last one received
+  subscribe: (onEvent) => {
+    const names = [
+      'resume.queued', 'resume.processing', 'resume.completed', 'resume.failed', 'resume.deleted',
+      'resume.archive_completed',
+      'jd.queued', 'jd.processing', 'jd.completed', 'jd.failed', 'jd.deleted',
+      'match.created', 'match.batch_completed', 'match.deleted',
+      'jade.started', 'jade.completed', 'jade.failed',
+    ];
+    let source = null;
+    let lastEventId = null;
+    let closed = false;
+
+    const reconnect = () => {
+      if (!closed) {
+        setTimeout(open, 3000);
+      }
+    };
 
+    const open = async () => {
+      let streamToken;
+      try {
+        streamToken = (await api.post('/events/token')).data.stream_token;
+      } catch (error) {
+        reconnect();
+        return;
+      }
+      if (closed) {
+        return;
+      }
+      const params = new URLSearchParams({ stream_token: streamToken });
+      if (lastEventId) {
+        params.set('last_event_id', lastEventId);
+      }
+      source = new EventSource(`${API_BASE_URL}/events?${params}`);
+      names.forEach((name) => {
+        source.addEventListener(name, (event) => {
+          lastEventId = event.lastEventId || lastEventId;
+          onEvent(name, JSON.parse(event.data));
+        });
+      });
+      // The browser retries with the same URL, whose token has expired by then; reconnect with a new one
+      source.onerror = () => {
+        source.close();
+        reconnect();
+      };
+    };
+
+    open();
+    return () => {
+      closed = true;
+      if (source) {
+        source.close();
+      }
+    };
+  },
+};